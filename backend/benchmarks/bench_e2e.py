@@ -0,0 +1,311 @@
+"""Offline end-to-end benchmark: upload throughput, /chat latency and peak RSS
+
+Drives the FastAPI app in-process over ASGI with the "fake" embedding backend
+and a fake chat model in place of Groq, both with configurable latency, so
+results depend only on this code and the machine. Every run works in a fresh
+temporary directory (sessions, document store and caches start cold).
+
+Corpora are the bundled Chat-with-PDF.pdf ("real"), generated PDFs of N pages
+("synthetic-N") or any PDF path. Chat requests go to the session of the
+largest corpus from N concurrent clients.
+
+Usage (from backend/):
+
+    python -m benchmarks.bench_e2e --corpus real --corpus synthetic-50 --clients 8 \\
+        --requests 20 --embed-latency 0.05 --llm-latency 0.3 --output bench_e2e.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REAL_PDF = os.path.join(os.path.dirname(BACKEND_DIR), "Chat-with-PDF.pdf")
+sys.path.insert(0, BACKEND_DIR)
+
+# The app reads its configuration at import time, so nothing from core or
+# main is imported at module level (worker processes re-import this module)
+FILLER = (
+    "the valve assembly must be inspected before installation and the operator shall record "
+    "torque values pressure limits maintenance intervals and safety notes for each component"
+).split()
+TOPICS = [
+    "maintenance", "inspection", "warranty", "calibration", "pressure", "safety",
+    "installation", "lubrication", "storage", "shutdown", "startup", "alarms",
+]
+
+
+def make_synthetic_pdf(path: Path, pages: int, seed: int) -> None:
+    """Write a PDF of numbered sections, each page holding a few paragraphs"""
+    from fpdf import FPDF
+
+    rng = random.Random(seed)
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=10)
+    for page in range(pages):
+        pdf.add_page()
+        for paragraph in range(4):
+            topic = rng.choice(TOPICS)
+            words = " ".join(rng.choice(FILLER) for _ in range(90))
+            text = (
+                f"Section {page + 1}.{paragraph + 1} {topic}: part PN-{rng.randint(10000, 99999)} "
+                f"requires {rng.randint(5, 90)} Nm; {words}."
+            )
+            pdf.multi_cell(0, 5, text)
+            pdf.ln(2)
+    pdf.output(str(path))
+
+
+def resolve_corpus(spec: str, workdir: Path, seed: int) -> Path:
+    if spec == "real":
+        return Path(REAL_PDF)
+    if spec.startswith("synthetic-"):
+        pages = int(spec.split("-", 1)[1])
+        path = workdir / "corpora" / f"synthetic-{pages}.pdf"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        make_synthetic_pdf(path, pages, seed + pages)
+        return path
+    return Path(spec).resolve()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb(pid="self") -> float:
+    """Peak RSS of one process, read from the kernel's high-water mark
+
+    RUSAGE_CHILDREN is no use here: a child inherits its parent's max RSS at
+    fork, so it reports the parent's peak rather than the workers' own.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid != "self":
+        return 0.0
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def child_pids() -> list:
+    """Live child processes of this one (the PDF extraction workers)"""
+    pids = []
+    for stat_path in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # The parent pid follows the parenthesised command name
+            fields = stat_path.read_text().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == os.getpid():
+            pids.append(int(stat_path.parent.name))
+    return pids
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+async def upload(client, path: Path, poll_interval: float) -> dict:
+    started = time.perf_counter()
+    with open(path, "rb") as pdf_file:
+        response = await client.post("/upload", files=[("files", (path.name, pdf_file, "application/pdf"))])
+    response.raise_for_status()
+    session_id = response.json()["session_id"]
+
+    while True:
+        status = (await client.get(f"/upload/{session_id}/status")).json()
+        job = status["job"] or {}
+        if status["processed"] or job.get("status") == "failed":
+            break
+        await asyncio.sleep(poll_interval)
+    seconds = time.perf_counter() - started
+
+    if job.get("status") == "failed":
+        raise RuntimeError(f"Ingestion of {path.name} failed: {job.get('error')}")
+    pages = job["stages"]["extract"]["total"] or 0
+    chunks = job["stages"]["split"]["total"] or 0
+    return {
+        "session_id": session_id,
+        "file": path.name,
+        "bytes": path.stat().st_size,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": seconds,
+        "pages_per_s": pages / seconds,
+        "chunks_per_s": chunks / seconds,
+    }
+
+
+async def chat_load(client, session_id: str, clients: int, requests: int, args) -> dict:
+    latencies, errors, context_tokens = [], 0, []
+
+    async def run_client(client_id: int) -> None:
+        nonlocal errors
+        rng = random.Random(args.seed * 1000 + client_id)
+        for request_id in range(requests):
+            question = (
+                f"What are the {rng.choice(TOPICS)} requirements for {rng.choice(FILLER)} "
+                f"{rng.choice(FILLER)} (client {client_id}, request {request_id})?"
+            )
+            started = time.perf_counter()
+            response = await client.post(f"/chat/{session_id}", json={
+                "question": question,
+                "model_name": args.model,
+                "use_chat_history": not args.no_history,
+                "use_cache": args.answer_cache,
+            })
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+            else:
+                context_tokens.append(response.json().get("context_tokens", 0))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(client_id) for client_id in range(clients)))
+    wall_seconds = time.perf_counter() - started
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "wall_seconds": wall_seconds,
+        "requests_per_s": len(latencies) / wall_seconds,
+        "latency_ms_p50": percentile(latencies, 50),
+        "latency_ms_p95": percentile(latencies, 95),
+        "latency_ms_p99": percentile(latencies, 99),
+        "latency_ms_mean": statistics.fmean(latencies),
+        "context_tokens_mean": statistics.fmean(context_tokens) if context_tokens else 0,
+    }
+
+
+async def run(args, workdir: Path) -> dict:
+    import httpx
+    import main as app_module
+    import core.chat_processor
+    from core.fakes import FakeChatModel
+
+    llm = FakeChatModel(
+        answer_tokens=args.answer_tokens,
+        first_token_latency=args.llm_latency,
+        token_latency=args.token_latency
+    )
+    core.chat_processor.get_llm = lambda model_name: llm
+
+    corpora = [(spec, resolve_corpus(spec, workdir, args.seed)) for spec in args.corpus]
+
+    await app_module.startup_event()
+    transport = httpx.ASGITransport(app=app_module.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            uploads = []
+            for spec, path in corpora:
+                result = await upload(client, path, args.poll_interval)
+                result["corpus"] = spec
+                uploads.append(result)
+
+            target = max(uploads, key=lambda result: result["pages"])
+            chat = []
+            for clients in args.clients:
+                chat.append(await chat_load(client, target["session_id"], clients, args.requests, args))
+        # Read before the extraction pool is shut down and before any helper process is spawned
+        peak_rss = {
+            "self": peak_rss_mb(),
+            "extract_workers": max((peak_rss_mb(pid) for pid in child_pids()), default=0.0),
+        }
+    finally:
+        await app_module.shutdown_event()
+
+    for result in uploads:
+        del result["session_id"]
+    return {"uploads": uploads, "chat_corpus": target["corpus"], "chat": chat, "peak_rss_mb": peak_rss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", action="append", help="real, synthetic-N or a PDF path (repeatable)")
+    parser.add_argument("--clients", type=int, action="append", help="concurrent chat clients (repeatable)")
+    parser.add_argument("--requests", type=int, default=10, help="chat requests per client")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per later token")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--model", default="llama3-70b-8192")
+    parser.add_argument("--no-history", action="store_true", help="disable chat history retrieval")
+    parser.add_argument("--answer-cache", action="store_true", help="allow answer cache hits")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    args.corpus = args.corpus or ["real", "synthetic-20", "synthetic-100"]
+    args.clients = args.clients or [1, 8]
+
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_e2e_"))
+    # Configure the app before it is imported
+    os.environ.update({
+        "EMBEDDING_BACKEND": "fake",
+        "FAKE_EMBEDDING_LATENCY": str(args.embed_latency),
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "offline"),
+        "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "offline"),
+        "SESSION_GC_INTERVAL": "0",
+    })
+    os.chdir(workdir)
+
+    started = time.perf_counter()
+    results = asyncio.run(run(args, workdir))
+
+    report = {
+        "benchmark": "e2e",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "embed_latency": args.embed_latency,
+            "llm_latency": args.llm_latency,
+            "token_latency": args.token_latency,
+            "answer_tokens": args.answer_tokens,
+            "requests_per_client": args.requests,
+            "chat_history": not args.no_history,
+            "answer_cache": args.answer_cache,
+            "model": args.model,
+        },
+        **results,
+        "total_seconds": time.perf_counter() - started,
+    }
+
+    if not args.keep_workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
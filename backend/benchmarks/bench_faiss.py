@@ -0,0 +1,176 @@
+"""FAISS index type benchmark: recall vs latency, build time, size and load RSS
+
+Generates clustered random vectors (standing in for chunk embeddings), finds
+exact neighbours with a flat index, and for each index type reports build
+time, recall@k against the exact neighbours and per-query latency while
+sweeping the search-time knob (nprobe for IVF, efSearch for HNSW). Each index
+is saved, then reloaded with and without memory mapping to compare the RSS
+it adds to the process.
+
+Usage (from backend/):
+
+    python -m benchmarks.bench_faiss --vectors 100000 --dimension 256 --queries 500 --output bench_faiss.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from core.vector_index import _MMAP_FLAGS, build_index
+
+
+def make_vectors(num_vectors: int, dimension: int, num_clusters: int, seed: int) -> np.ndarray:
+    """Points scattered around random centres, like embeddings of related chunks"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(num_clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, size=num_vectors)
+    vectors = centres[labels] + 0.35 * rng.normal(size=(num_vectors, dimension)).astype(np.float32)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        resident_pages = int(statm.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def set_search_param(index: faiss.Index, value: int) -> None:
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = value
+    else:
+        faiss.extract_index_ivf(index).nprobe = value
+
+
+def measure_search(index: faiss.Index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        _, found = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(set(found[0].tolist()) & set(expected.tolist()))
+    return {
+        f"recall_at_{k}": hits / (len(queries) * k),
+        "latency_ms_p50": statistics.median(latencies),
+        "latency_ms_p95": percentile(latencies, 95),
+        "latency_ms_mean": statistics.fmean(latencies),
+    }
+
+
+def _load_and_search(path: str, flags: int, queries: np.ndarray, k: int) -> dict:
+    before = current_rss_mb()
+    started = time.perf_counter()
+    index = faiss.read_index(path, flags)
+    load_ms = (time.perf_counter() - started) * 1000
+    after_load = current_rss_mb()
+    index.search(queries, k)
+    return {
+        "load_ms": load_ms,
+        "rss_mb_after_load": after_load - before,
+        "rss_mb_after_search": current_rss_mb() - before,
+    }
+
+
+def measure_load(path: str, queries: np.ndarray, k: int) -> dict:
+    """RSS added by loading an index, right after the load and after searching it
+
+    Each load runs in a fresh process so freed memory from earlier indexes
+    does not hide the cost.
+    """
+    context = multiprocessing.get_context("spawn")
+    loads = {}
+    for mode, flags in (("in_memory", 0), ("mmap", _MMAP_FLAGS)):
+        with context.Pool(1) as pool:
+            loads[mode] = pool.apply(_load_and_search, (path, flags, queries, k))
+    return loads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default="flat,hnsw,ivf,ivfpq")
+    parser.add_argument("--nprobe", default="1,4,16,64", help="IVF nprobe values to sweep")
+    parser.add_argument("--ef-search", default="16,64,256", help="HNSW efSearch values to sweep")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dimension, args.clusters, args.seed)
+    # Queries are perturbed corpus points, so every one has close neighbours
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = np.ascontiguousarray(queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32))
+
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    sweeps = {
+        "hnsw": [int(value) for value in args.ef_search.split(",")],
+        "ivf": [int(value) for value in args.nprobe.split(",")],
+        "ivfpq": [int(value) for value in args.nprobe.split(",")],
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_faiss_") as workdir:
+        for index_type in args.types.split(","):
+            started = time.perf_counter()
+            index = build_index(vectors, index_type)
+            build_seconds = time.perf_counter() - started
+
+            path = os.path.join(workdir, f"{index_type}.faiss")
+            faiss.write_index(index, path)
+
+            searches = []
+            for value in sweeps.get(index_type, [None]):
+                if value is not None:
+                    set_search_param(index, value)
+                search = measure_search(index, queries, truth, args.k)
+                if value is not None:
+                    search["ef_search" if index_type == "hnsw" else "nprobe"] = value
+                searches.append(search)
+            del index
+
+            results[index_type] = {
+                "build_seconds": build_seconds,
+                "index_bytes": os.path.getsize(path),
+                "search": searches,
+                "load": measure_load(path, queries, args.k),
+            }
+
+    report = {
+        "benchmark": "faiss",
+        "vectors": args.vectors,
+        "dimension": args.dimension,
+        "clusters": args.clusters,
+        "queries": args.queries,
+        "k": args.k,
+        "faiss_threads": faiss.omp_get_max_threads(),
+        "index_types": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Ingestion peak memory: streaming pipeline vs buffering every stage
+
+Generates a large synthetic PDF and ingests it into an empty document store
+with the "fake" embedding backend, once per mode, each in a fresh process:
+
+- streaming: store_pdf_files, where extraction, splitting, embedding and
+  index insertion are connected by bounded queues;
+- buffered: every page, then every chunk, then every vector is collected
+  before the next stage starts (get_pdf_text, get_text_chunks, then
+  BatchEmbedder.embed_batches drained into one array before the index is
+  built).
+
+Reports peak RSS of the ingesting process above its RSS after imports, and
+wall time. Streaming runs are repeated for each --batch-size to show that
+peak memory follows the batch size rather than the document size.
+
+Usage (from backend/):
+
+    python -m benchmarks.bench_ingest_memory --pages 2000 --batch-size 50 --batch-size 200 \\
+        --embed-latency 0.01 --output bench_ingest_memory.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_e2e import make_synthetic_pdf, peak_rss_mb
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        resident_pages = int(statm.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _ingest(mode: str, pdf_path: str, workdir: str, env: dict) -> dict:
+    """Ingest one PDF in this (fresh) process and measure it"""
+    # The app reads its configuration at import time
+    os.environ.update(env)
+    os.chdir(workdir)
+    import numpy as np
+    from langchain_core.documents import Document
+    from core import ingest
+    from core.document_store import document_store, fingerprint_file
+    from core.embedding_pipeline import BatchEmbedder
+    from core.embeddings import get_embeddings
+    from core.metrics import ingest_timer
+    from core.vector_index import build_vector_store
+
+    baseline_mb = peak_rss_mb()
+    timer = ingest_timer()
+    started = time.perf_counter()
+    if mode == "streaming":
+        documents = ingest.store_pdf_files([pdf_path], timer=timer)
+        chunks = document_store.load(documents[0]["fingerprint"]).index.ntotal
+    else:
+        _, file_page_mapping = ingest.get_pdf_text([pdf_path])
+        text_chunks = ingest.get_text_chunks(file_page_mapping)
+        embedder = BatchEmbedder(get_embeddings())
+        batches = (
+            (text_chunks[start:start + embedder.batch_size], None)
+            for start in range(0, len(text_chunks), embedder.batch_size)
+        )
+        vectors = np.concatenate([vectors for _, vectors in embedder.embed_batches(batches, lambda chunk: chunk["text"])])
+        documents = [
+            Document(page_content=chunk["text"], metadata={"file": chunk["file"], "page": chunk["page"]})
+            for chunk in text_chunks
+        ]
+        vector_store = build_vector_store(documents, vectors, get_embeddings(), "flat")
+        document_store.save(fingerprint_file(pdf_path), vector_store)
+        chunks = len(text_chunks)
+    seconds = time.perf_counter() - started
+
+    peak_mb = peak_rss_mb()
+    return {
+        "mode": mode,
+        "batch_size": int(env["EMBED_BATCH_SIZE"]),
+        "chunks": chunks,
+        "seconds": seconds,
+        "baseline_rss_mb": baseline_mb,
+        "peak_rss_mb": peak_mb,
+        "peak_rss_increase_mb": peak_mb - baseline_mb,
+        "rss_after_mb": current_rss_mb(),
+        "timings_ms": timer.as_ms(),
+    }
+
+
+def run_mode(mode: str, pdf_path: Path, batch_size: int, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_memory_")
+    env = {
+        "EMBEDDING_BACKEND": "fake",
+        "FAKE_EMBEDDING_LATENCY": str(args.embed_latency),
+        "HASHING_EMBEDDING_SIZE": str(args.dimension),
+        "EMBED_BATCH_SIZE": str(batch_size),
+        "PDF_EXTRACT_WORKERS": str(args.extract_workers),
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "offline"),
+    }
+    try:
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            return pool.apply(_ingest, (mode, str(pdf_path), workdir, env))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--pdf", help="ingest this PDF instead of a generated one")
+    parser.add_argument("--batch-size", type=int, action="append", help="embedding batch size (repeatable)")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embedding call")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    args.batch_size = args.batch_size or [100]
+
+    with tempfile.TemporaryDirectory(prefix="bench_ingest_pdf_") as pdf_dir:
+        if args.pdf:
+            pdf_path = Path(args.pdf).resolve()
+        else:
+            pdf_path = Path(pdf_dir) / f"synthetic-{args.pages}.pdf"
+            make_synthetic_pdf(pdf_path, args.pages, args.seed)
+
+        runs = [run_mode("buffered", pdf_path, args.batch_size[0], args)]
+        for batch_size in args.batch_size:
+            runs.append(run_mode("streaming", pdf_path, batch_size, args))
+        pdf_bytes = pdf_path.stat().st_size
+
+    report = {
+        "benchmark": "ingest_memory",
+        "pdf": args.pdf or f"synthetic-{args.pages}",
+        "pdf_bytes": pdf_bytes,
+        "dimension": args.dimension,
+        "embed_latency": args.embed_latency,
+        "extract_workers": args.extract_workers,
+        "runs": runs,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Per-request LLM client overhead: fresh clients and chains vs the shared registry
+
+Measures, without calling Groq:
+
+- setup: building a ChatGroq client, parsing the prompt template and
+  compiling the stuff-documents chain on every request (the old path) vs
+  get_conversational_chain served from the chain cache;
+- http: requests to a local keep-alive HTTP server through a new
+  httpx client per request vs the shared pooled client. Plain HTTP on
+  localhost, so the saving excludes the DNS lookup and TLS handshake a
+  real provider connection also pays.
+
+Usage (from backend/):
+
+    python -m benchmarks.bench_llm_clients --requests 500 --output bench_llm_clients.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GROQ_API_KEY", "offline")
+
+import httpx
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_groq import ChatGroq
+
+from core.models import DEFAULT_SYSTEM_PROMPT
+from core.chat_processor import get_conversational_chain
+from core.llm_clients import chain_cache, shared_http_clients
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; with Nagle they wait for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def summarize(latencies_ms):
+    return {
+        "latency_ms_p50": statistics.median(latencies_ms),
+        "latency_ms_p95": percentile(latencies_ms, 95),
+        "latency_ms_mean": statistics.fmean(latencies_ms),
+    }
+
+
+def time_calls(fn, requests: int):
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return summarize(latencies)
+
+
+def fresh_chain(model_name: str):
+    llm = ChatGroq(groq_api_key=os.environ["GROQ_API_KEY"], model_name=model_name)
+    return create_stuff_documents_chain(llm, ChatPromptTemplate.from_template(DEFAULT_SYSTEM_PROMPT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--model", default="llama3-70b-8192")
+    parser.add_argument("--payload-bytes", type=int, default=4096, help="request body size for the http test")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    setup = {
+        "fresh": time_calls(lambda: fresh_chain(args.model), args.requests),
+        "cached": time_calls(lambda: get_conversational_chain(args.model, DEFAULT_SYSTEM_PROMPT), args.requests),
+        "chain_cache": chain_cache.stats(),
+    }
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions"
+    payload = b"x" * args.payload_bytes
+
+    def new_client_request():
+        with httpx.Client() as client:
+            client.post(url, content=payload)
+
+    shared_client, _ = shared_http_clients()
+    http = {
+        "new_client": time_calls(new_client_request, args.requests),
+        "shared_client": time_calls(lambda: shared_client.post(url, content=payload), args.requests),
+    }
+    server.shutdown()
+
+    report = {
+        "benchmark": "llm_clients",
+        "requests": args.requests,
+        "model": args.model,
+        "setup": setup,
+        "http": http,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Retrieval quality and latency benchmark: dense vs BM25 vs hybrid
+
+Builds a synthetic corpus in which every chunk carries a unique part number
+and clause id, then asks identifier lookups ("torque for PN-48213-K?") and
+reports recall@k and per-query search latency for each retrieval mode.
+
+Usage (from backend/):
+
+    python -m benchmarks.bench_retrieval --chunks 20000 --queries 500 --output bench_retrieval.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from core.embeddings import get_embeddings
+from core.sparse_index import BM25Index
+from core.chat_processor import search_documents
+
+
+FILLER = (
+    "the valve assembly must be inspected before installation and the operator shall record "
+    "torque values pressure limits maintenance intervals and safety notes for each component"
+).split()
+
+
+def make_corpus(num_chunks: int, seed: int):
+    rng = random.Random(seed)
+    chunks, identifiers = [], []
+    for index in range(num_chunks):
+        part_number = f"PN-{rng.randint(10000, 99999)}-{chr(65 + index % 26)}{index}"
+        clause = f"{rng.randint(1, 30)}.{rng.randint(1, 20)}.{index}"
+        words = rng.sample(FILLER, 12)
+        text = f"Clause {clause}: {' '.join(words)}. Part {part_number} torque {rng.randint(5, 90)} Nm."
+        chunks.append(text)
+        identifiers.append(part_number)
+    return chunks, identifiers
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--backend", default=os.getenv("EMBEDDING_BACKEND", "hashing"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    embeddings = get_embeddings(args.backend)
+    chunks, identifiers = make_corpus(args.chunks, args.seed)
+
+    started = time.perf_counter()
+    vectors = embeddings.embed_documents(chunks)
+    embed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vector_store = FAISS.from_embeddings(
+        list(zip(chunks, vectors)), embeddings, metadatas=[{"id": i} for i in range(len(chunks))]
+    )
+    dense_build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sparse_index = BM25Index.build(chunks)
+    sparse_build_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed + 1)
+    targets = rng.sample(range(args.chunks), min(args.queries, args.chunks))
+    questions = [f"What torque applies to part {identifiers[target]}?" for target in targets]
+    query_vectors = embeddings.embed_documents(questions)
+
+    results = {}
+    for mode in ("dense", "sparse", "hybrid"):
+        latencies, hits = [], 0
+        for target, question, query_vector in zip(targets, questions, query_vectors):
+            started = time.perf_counter()
+            docs = search_documents(vector_store, sparse_index, question, query_vector, args.k, mode=mode)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += any(doc.metadata["id"] == target for doc in docs)
+        results[mode] = {
+            f"recall_at_{args.k}": hits / len(targets),
+            "latency_ms_p50": statistics.median(latencies),
+            "latency_ms_p95": percentile(latencies, 95),
+            "latency_ms_mean": statistics.fmean(latencies),
+        }
+
+    # Raw index lookups without document materialisation
+    query_matrix = np.asarray(query_vectors, dtype=np.float32)
+    started = time.perf_counter()
+    for row in query_matrix:
+        vector_store.index.search(row[None, :], args.k * 4)
+    dense_lookup_ms = (time.perf_counter() - started) * 1000 / len(questions)
+    started = time.perf_counter()
+    for question in questions:
+        sparse_index.search(question, args.k * 4)
+    sparse_lookup_ms = (time.perf_counter() - started) * 1000 / len(questions)
+
+    report = {
+        "benchmark": "retrieval",
+        "backend": args.backend,
+        "chunks": args.chunks,
+        "queries": len(questions),
+        "k": args.k,
+        "embed_seconds": embed_seconds,
+        "dense_build_seconds": dense_build_seconds,
+        "sparse_build_seconds": sparse_build_seconds,
+        "sparse_index_bytes": sparse_index.nbytes(),
+        "dense_lookup_ms": dense_lookup_ms,
+        "sparse_lookup_ms": sparse_lookup_ms,
+        "modes": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from .models import (
     ChatMessage,
     ChatResponse,
+    BatchChatMessage,
+    BatchChatResult,
+    BatchChatResponse,
     ProcessResponse,
     ChatHistory,
     SystemPromptUpdate,
@@ -9,27 +12,114 @@ from .models import (
 )
 
 from .ingest import (
+    save_uploads,
     get_pdf_text,
     get_text_chunks,
-    get_vector_store,
-    process_pdf_files
+    iter_pdf_pages,
+    iter_text_chunks,
+    find_reused_files,
+    process_pdf_files,
+    add_pdf_files,
+    remove_session_document
+)
+
+from .document_store import (
+    DocumentStore,
+    document_store,
+    fingerprint_file,
+    read_session_manifest,
+    session_docset_fingerprint,
+    session_documents,
+    session_embedding_backend,
+    write_session_manifest
 )
 
 from .chat_manager import ChatHistoryManager
 
 from .chat_processor import (
+    get_llm,
     get_conversational_chain,
-    process_question
+    search_documents,
+    search_documents_batch,
+    retrieve_context,
+    aretrieve_context,
+    pack_retrieved_context,
+    process_question,
+    aprocess_question,
+    astream_question,
+    aprocess_question_batch,
+    apreview_chat_context,
+    BATCH_MAX_QUESTIONS
 )
 
-from .report_generator import generate_pdf_report
+from .executors import ingest_executor, io_executor, run_blocking, shutdown_executors
+
+from .report_generator import (
+    generate_pdf_report,
+    export_chat_history,
+    open_chat_history_report,
+    invalidate_reports,
+    iter_report
+)
 
 from .session_manager import SessionManager, session_manager
 
+from .session_store import SessionStore, MemorySessionStore, SQLiteSessionStore, create_session_store
+
+from .index_cache import IndexCache, index_cache
+
+from .jobs import IngestJob, submit_ingest_job, retry_ingest_job, fail_interrupted_jobs
+
+from .embedding_pipeline import BatchEmbedder, is_retryable_error
+
+from .sparse_index import BM25Index, reciprocal_rank_fusion
+
+from .fakes import FakeChatModel, FakeEmbeddings, FakeRateLimitError
+
+from .embedding_cache import EmbeddingCache
+
+from .local_embeddings import HashingEmbeddings
+
+from .embeddings import (
+    EMBEDDING_BACKEND,
+    CachedEmbeddings,
+    get_embeddings,
+    register_embedding_backend,
+    embedding_cache_stats
+)
+
+from .context_packing import (
+    MODEL_CONTEXT_WINDOWS,
+    PackedContext,
+    context_window,
+    estimate_tokens,
+    pack_context
+)
+
+from .metrics import MetricsRegistry, StageTimer, metrics_registry
+
+from .answer_cache import AnswerCache, answer_cache, answer_scope, normalize_question
+
+from .vector_index import (
+    FAISS_INDEX_TYPE,
+    choose_index_type,
+    build_index,
+    build_vector_store,
+    load_vector_store,
+    save_vector_store
+)
+
+from .chunk_store import ChunkStore, PositionIds
+
+from .llm_clients import ChainCache, chain_cache, close_llm_clients, create_llm
+
 __all__ = [
     # Models
     'ChatMessage',
     'ChatResponse',
+    'BatchChatMessage',
+    'BatchChatResult',
+    'BatchChatResponse',
     'ProcessResponse',
     'ChatHistory',
     'SystemPromptUpdate',
@@ -37,22 +127,130 @@ __all__ = [
     'DEFAULT_SYSTEM_PROMPT',
     
     # Ingest
+    'save_uploads',
     'get_pdf_text',
     'get_text_chunks',
-    'get_vector_store',
+    'iter_pdf_pages',
+    'iter_text_chunks',
+    'find_reused_files',
     'process_pdf_files',
+    'add_pdf_files',
+    'remove_session_document',
+    
+    # Document Store
+    'DocumentStore',
+    'document_store',
+    'fingerprint_file',
+    'read_session_manifest',
+    'session_docset_fingerprint',
+    'session_documents',
+    'session_embedding_backend',
+    'write_session_manifest',
     
     # Chat Management
     'ChatHistoryManager',
     
     # Chat Processing
+    'get_llm',
     'get_conversational_chain',
+    'search_documents',
+    'search_documents_batch',
+    'retrieve_context',
+    'aretrieve_context',
+    'pack_retrieved_context',
     'process_question',
+    'aprocess_question',
+    'astream_question',
+    'aprocess_question_batch',
+    'BATCH_MAX_QUESTIONS',
+    'apreview_chat_context',
+    
+    # Executors
+    'ingest_executor',
+    'io_executor',
+    'run_blocking',
+    'shutdown_executors',
     
     # Report Generation
     'generate_pdf_report',
+    'export_chat_history',
+    'open_chat_history_report',
+    'invalidate_reports',
+    'iter_report',
     
     # Session Management
     'SessionManager',
-    'session_manager'
+    'session_manager',
+    'SessionStore',
+    'MemorySessionStore',
+    'SQLiteSessionStore',
+    'create_session_store',
+    
+    # Index Cache
+    'IndexCache',
+    'index_cache',
+    
+    # Ingestion Jobs
+    'IngestJob',
+    'submit_ingest_job',
+    'retry_ingest_job',
+    'fail_interrupted_jobs',
+    
+    # Embedding Pipeline
+    'BatchEmbedder',
+    'is_retryable_error',
+    
+    # Sparse Retrieval
+    'BM25Index',
+    'reciprocal_rank_fusion',
+    
+    # Fakes
+    'FakeChatModel',
+    'FakeEmbeddings',
+    'FakeRateLimitError',
+    
+    # Embeddings
+    'EmbeddingCache',
+    'EMBEDDING_BACKEND',
+    'HashingEmbeddings',
+    'CachedEmbeddings',
+    'get_embeddings',
+    'register_embedding_backend',
+    'embedding_cache_stats',
+    
+    # Context Packing
+    'MODEL_CONTEXT_WINDOWS',
+    'PackedContext',
+    'context_window',
+    'estimate_tokens',
+    'pack_context',
+    
+    # Metrics
+    'MetricsRegistry',
+    'StageTimer',
+    'metrics_registry',
+    
+    # Answer Cache
+    'AnswerCache',
+    'answer_cache',
+    'answer_scope',
+    'normalize_question',
+    
+    # Vector Index
+    'FAISS_INDEX_TYPE',
+    'choose_index_type',
+    'build_index',
+    'build_vector_store',
+    'load_vector_store',
+    'save_vector_store',
+    
+    # Chunk Store
+    'ChunkStore',
+    'PositionIds',
+    
+    # LLM Clients
+    'ChainCache',
+    'chain_cache',
+    'close_llm_clients',
+    'create_llm'
 ]
\ No newline at end of file
@@ -0,0 +1,155 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .models import DEFAULT_SYSTEM_PROMPT
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question, without trailing punctuation"""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+
+def answer_scope(docset_fingerprint: str, model_name: str, system_prompt: Optional[str]) -> Tuple[str, str, str]:
+    """Everything besides the question that determines an answer"""
+    prompt = system_prompt if system_prompt is not None else DEFAULT_SYSTEM_PROMPT
+    return docset_fingerprint, model_name, hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """LRU + TTL cache of answers keyed by (document set, model, system prompt, question)
+
+    In "exact" mode only normalized questions match. In "semantic" mode a miss
+    falls back to comparing the question's embedding with cached questions in
+    the same scope and reuses an answer whose cosine similarity reaches
+    similarity_threshold.
+    """
+
+    def __init__(
+        self,
+        mode: str = "semantic",
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.95
+    ):
+        self.mode = mode
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and self.max_entries > 0
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def get(self, scope: Tuple, question: str, query_embedding: Optional[Sequence[float]] = None) -> Optional[Dict]:
+        """Look up an answer; pass query_embedding to allow near-duplicate matches"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        key = scope + (normalize_question(question),)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["response"]
+
+            if self.mode == "semantic" and query_embedding is not None:
+                match = self._nearest(scope, query_embedding, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return self._entries[match]["response"]
+
+            self.misses += 1
+            return None
+
+    def _nearest(self, scope: Tuple, query_embedding: Sequence[float], now: float) -> Optional[Tuple]:
+        candidates = [
+            (key, entry) for key, entry in self._entries.items()
+            if key[:3] == scope and entry["vector"] is not None and not self._expired(entry, now)
+        ]
+        if not candidates:
+            return None
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        similarities = np.stack([entry["vector"] for _, entry in candidates]) @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return candidates[best][0]
+        return None
+
+    def put(
+        self,
+        scope: Tuple,
+        question: str,
+        response: Dict,
+        query_embedding: Optional[Sequence[float]] = None
+    ) -> None:
+        """Store an answer for a question"""
+        if not self.enabled:
+            return
+
+        vector = None
+        if query_embedding is not None:
+            vector = np.asarray(query_embedding, dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+
+        key = scope + (normalize_question(question),)
+        with self._lock:
+            self._entries[key] = {"response": response, "vector": vector, "created_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, docset_fingerprint: Optional[str] = None) -> None:
+        """Drop answers for one document set, or everything"""
+        with self._lock:
+            if docset_fingerprint is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == docset_fingerprint]:
+                del self._entries[key]
+
+    def stats(self) -> Dict:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Global answer cache instance
+answer_cache = AnswerCache(
+    mode=os.getenv("ANSWER_CACHE_MODE", "semantic"),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+)
@@ -1,30 +1,283 @@
 import os
+import json
+import uuid
 import shutil
 import datetime
-from typing import List, Optional, Tuple
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from .executors import io_executor, run_blocking
+from .embeddings import get_embeddings
+from .document_store import session_embedding_backend
+from .index_cache import estimate_index_bytes, index_cache
+from .vector_index import add_to_vector_store, build_vector_store, load_vector_store, save_vector_store
+
+try:
+    import fcntl
+except ImportError:  # Windows: history files are only locked within the process
+    fcntl = None
+
+
+# Number of logged turns after which the snapshot is rewritten in the background
+COMPACT_EVERY = int(os.getenv("CHAT_HISTORY_COMPACT_EVERY", "50"))
+# Separates previous conversations in the chat history prompt block
+CHAT_TURN_SEPARATOR = "\n\n---\n\n"
+
+_path_locks: Dict[str, threading.RLock] = defaultdict(threading.RLock)
+_path_locks_guard = threading.Lock()
+
+
+def _lock_for(path: Path) -> threading.RLock:
+    with _path_locks_guard:
+        return _path_locks[str(path)]
+
+
+@contextmanager
+def _file_lock(path: Path, shared: bool = False) -> Iterator[None]:
+    """Hold the lock that orders history reads and writes across worker processes
+
+    The lock file sits next to the history directory, so clearing the
+    history does not delete it from under a waiting worker.
+    """
+    lock_path = path.with_name(f"{path.name}.lock")
+    if fcntl is None or (shared and not lock_path.parent.exists()):
+        yield
+        return
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class LiveChatHistory:
+    """In-memory chat history index kept in sync with its snapshot and append-only log
+
+    On disk the history lives in ``chat_history_index/``:
+
+    - ``CURRENT``: JSON pointer to the active generation
+    - ``snapshot-<gen>/``: FAISS index and chunk store of every turn logged before ``gen``
+    - ``log-<gen>.jsonl``: turns (text, embedding, metadata) appended since the snapshot
+
+    Reads hold a shared file lock and writes an exclusive one, so worker
+    processes never append to a log that another one is retiring.
+    """
+
+    def __init__(self, path: Path, embeddings, lock: Optional[threading.RLock] = None):
+        self.path = path
+        self.embeddings = embeddings
+        self.lock = lock or _lock_for(path)
+        self.generation = 0
+        self.store: Optional[FAISS] = None
+        self.log_offset = 0
+        self.logged_turns = 0
+        self.compacting = False
+
+    @property
+    def log_path(self) -> Path:
+        return self.path / f"log-{self.generation}.jsonl"
+
+    def nbytes(self) -> int:
+        return estimate_index_bytes(self.store) if self.store is not None else 0
+
+    @contextmanager
+    def _locked(self, shared: bool = False) -> Iterator[None]:
+        with self.lock, _file_lock(self.path, shared):
+            yield
+
+    def _read_generation(self) -> int:
+        current = self.path / "CURRENT"
+        if not current.exists():
+            return 0
+        return json.loads(current.read_text())["generation"]
+
+    def load(self) -> "LiveChatHistory":
+        """Load the snapshot and replay the log on top of it"""
+        with self._locked(shared=True):
+            self._load()
+        return self
+
+    def _load(self) -> None:
+        self.generation = self._read_generation()
+        snapshot = self.path / f"snapshot-{self.generation}"
+        self.store = None
+        if snapshot.exists():
+            try:
+                # Turns are appended to the index, so it is loaded into memory rather than mapped
+                self.store = load_vector_store(snapshot, self.embeddings, mmap=False)
+            except FileNotFoundError as e:
+                # Snapshot without its documents; only logged turns are searchable
+                print(f"Skipping chat history snapshot: {str(e)}")
+        self.log_offset = 0
+        self.logged_turns = 0
+        self._replay_log()
+
+    def refresh(self) -> None:
+        """Pick up turns appended to the log since the last read"""
+        with self._locked(shared=True):
+            self._refresh()
+
+    def _refresh(self) -> None:
+        log_size = self.log_path.stat().st_size if self.log_path.exists() else 0
+        if self._read_generation() != self.generation or log_size < self.log_offset:
+            # Compacted or cleared elsewhere; start over from disk
+            self._load()
+        else:
+            self._replay_log()
+
+    def _replay_log(self) -> None:
+        if not self.log_path.exists():
+            return
+
+        with open(self.log_path, "rb") as log:
+            log.seek(self.log_offset)
+            data = log.read()
+
+        # Ignore a trailing partial line; it is picked up once fully written
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return
+
+        entries = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        documents = [Document(page_content=entry["text"], metadata=entry["metadata"]) for entry in entries]
+        vectors = [entry["embedding"] for entry in entries]
+        if self.store is None:
+            self.store = build_vector_store(documents, vectors, self.embeddings, "flat")
+        else:
+            add_to_vector_store(self.store, documents, vectors)
+
+        self.log_offset += end
+        self.logged_turns += len(entries)
+
+    def append(self, text: str, embedding: List[float], metadata: Dict) -> None:
+        """Append a turn to the log and apply it to the in-memory index"""
+        line = json.dumps({"text": text, "embedding": embedding, "metadata": metadata})
+        with self._locked():
+            # Another worker may have compacted since the last read; append to the live log
+            self._refresh()
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as log:
+                log.write(line + "\n")
+            self._replay_log()
+            should_compact = self.logged_turns >= COMPACT_EVERY and not self.compacting
+            if should_compact:
+                self.compacting = True
+
+        if should_compact:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self) -> None:
+        """Fold the log into a new snapshot generation
+
+        The snapshot is built from disk by a private copy and saved without
+        holding any lock, so appends carry on meanwhile. Only the switch to
+        the new generation is locked; turns appended during the save are
+        carried over into the new generation's log.
+        """
+        snapshot_tmp = None
+        try:
+            if not self.path.exists():
+                return
+            copy = LiveChatHistory(self.path, self.embeddings, lock=threading.RLock()).load()
+            if copy.store is None:
+                return
+            new_generation = copy.generation + 1
+            snapshot_tmp = self.path / f".snapshot-{new_generation}-{uuid.uuid4().hex}.tmp"
+            save_vector_store(copy.store, snapshot_tmp)
+
+            with self._locked():
+                if self._read_generation() != copy.generation:
+                    # Compacted or cleared by another worker meanwhile
+                    return
+                self._refresh()
+
+                old_log = self.path / f"log-{copy.generation}.jsonl"
+                carried = b""
+                if old_log.exists():
+                    with open(old_log, "rb") as log:
+                        log.seek(copy.log_offset)
+                        carried = log.read()
+                    carried = carried[:carried.rfind(b"\n") + 1]
+
+                snapshot = self.path / f"snapshot-{new_generation}"
+                # Left over from an interrupted compaction
+                shutil.rmtree(snapshot, ignore_errors=True)
+                os.replace(snapshot_tmp, snapshot)
+                snapshot_tmp = None
+                (self.path / f"log-{new_generation}.jsonl").write_bytes(carried)
+                current_tmp = self.path / "CURRENT.tmp"
+                current_tmp.write_text(json.dumps({"generation": new_generation}))
+                os.replace(current_tmp, self.path / "CURRENT")
+
+                # The in-memory index already holds the snapshot and the carried turns
+                self.generation = new_generation
+                self.log_offset = len(carried)
+                self.logged_turns = sum(1 for line in carried.splitlines() if line.strip())
+
+                shutil.rmtree(self.path / f"snapshot-{copy.generation}", ignore_errors=True)
+                old_log.unlink(missing_ok=True)
+        except Exception as e:
+            print(f"Error compacting chat history: {str(e)}")
+        finally:
+            if snapshot_tmp is not None:
+                shutil.rmtree(snapshot_tmp, ignore_errors=True)
+            self.compacting = False
+
+    def search(self, embedding: List[float], k: int):
+        """Search the live index by vector"""
+        with self.lock:
+            if self.store is None:
+                return []
+            return self.store.similarity_search_by_vector(embedding, k=k)
+
+    def search_many(self, embeddings: List[List[float]], k: int) -> List[List[Document]]:
+        """Search the live index for several vectors with one FAISS query"""
+        with self.lock:
+            if self.store is None or not embeddings:
+                return [[] for _ in embeddings]
+            _, positions = self.store.index.search(np.asarray(embeddings, dtype=np.float32), k)
+            return [
+                [self.store.docstore.search(self.store.index_to_docstore_id[int(position)]) for position in row if position >= 0]
+                for row in positions
+            ]
 
 
 class ChatHistoryManager:
     """Manages chat history vector store for context preservation"""
-    
+
     def __init__(self, session_id: str):
         self.session_id = session_id
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+        self.embeddings = get_embeddings(session_embedding_backend(session_id))
         self.session_dir = Path(f"sessions/{session_id}")
         self.chat_history_path = self.session_dir / "chat_history_index"
-        
-    def add_to_history(self, user_question: str, assistant_answer: str, sources: List[str] = None):
-        """Add a conversation pair to the chat history vector store"""
+
+    def _live(self) -> LiveChatHistory:
+        """Get the live chat history index through the index cache"""
+        live = index_cache.get(
+            self.chat_history_path,
+            lambda: LiveChatHistory(self.chat_history_path, self.embeddings).load()
+        )
+        live.refresh()
+        index_cache.resize(self.chat_history_path)
+        return live
+
+    def _build_turn(self, user_question: str, assistant_answer: str, sources: List[str] = None) -> Tuple[str, Dict]:
+        """Build the indexed text and metadata for a conversation pair"""
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
+
         # Create conversation context with metadata
         conversation_text = f"User Question: {user_question}\nAssistant Answer: {assistant_answer}"
         if sources:
             conversation_text += f"\nSources: {', '.join(sources)}"
-        
+
         metadata = {
             "type": "conversation",
             "timestamp": timestamp,
@@ -32,79 +285,164 @@ class ChatHistoryManager:
             "assistant_answer": assistant_answer,
             "sources": sources or []
         }
-        
+        return conversation_text, metadata
+
+    def _append_turn(self, conversation_text: str, embedding: List[float], metadata: Dict) -> None:
+        self._append_turns([(conversation_text, metadata)], [embedding])
+
+    def _append_turns(self, turns: List[Tuple[str, Dict]], embeddings: List[List[float]]) -> None:
+        live = self._live()
+        for (conversation_text, metadata), embedding in zip(turns, embeddings):
+            live.append(conversation_text, list(embedding), metadata)
+        index_cache.resize(self.chat_history_path)
+
+    def add_to_history(self, user_question: str, assistant_answer: str, sources: List[str] = None):
+        """Add a conversation pair to the chat history vector store"""
+        conversation_text, metadata = self._build_turn(user_question, assistant_answer, sources)
         try:
-            # Try to load existing vector store
-            if self.chat_history_path.exists():
-                chat_history_store = FAISS.load_local(
-                    str(self.chat_history_path), 
-                    self.embeddings, 
-                    allow_dangerous_deserialization=True
-                )
-                # Add new conversation
-                chat_history_store.add_texts([conversation_text], metadatas=[metadata])
-            else:
-                # Create new vector store
-                chat_history_store = FAISS.from_texts(
-                    [conversation_text], 
-                    embedding=self.embeddings, 
-                    metadatas=[metadata]
-                )
-            
-            # Save updated vector store
-            self.session_dir.mkdir(parents=True, exist_ok=True)
-            chat_history_store.save_local(str(self.chat_history_path))
-            
+            embedding = self.embeddings.embed_documents([conversation_text])[0]
+            self._append_turn(conversation_text, embedding, metadata)
         except Exception as e:
             print(f"Error adding to chat history: {str(e)}")
-    
-    def get_relevant_context(self, current_question: str, max_results: int = 3) -> Tuple[str, List[str]]:
-        """Retrieve relevant chat history context for the current question"""
-        if not self.chat_history_path.exists():
-            return "", []
-        
+
+    async def aadd_to_history(self, user_question: str, assistant_answer: str, sources: List[str] = None):
+        """Async variant of add_to_history; the log append runs on the index I/O pool"""
+        conversation_text, metadata = self._build_turn(user_question, assistant_answer, sources)
+        try:
+            embedding = (await self.embeddings.aembed_documents([conversation_text]))[0]
+            await run_blocking(io_executor, self._append_turn, conversation_text, embedding, metadata)
+        except Exception as e:
+            print(f"Error adding to chat history: {str(e)}")
+
+    async def aadd_turns_to_history(self, turns: List[Tuple[str, str, List[str]]]):
+        """Add (question, answer, sources) conversation pairs in order, embedding them in one batched call"""
+        if not turns:
+            return
+        built = [self._build_turn(*turn) for turn in turns]
+        try:
+            embeddings = await self.embeddings.aembed_documents([conversation_text for conversation_text, _ in built])
+            await run_blocking(io_executor, self._append_turns, built, embeddings)
+        except Exception as e:
+            print(f"Error adding to chat history: {str(e)}")
+
+    @staticmethod
+    def _format_turns(relevant_docs) -> Tuple[List[str], List[str]]:
+        """Format retrieved conversations into one prompt block and source label each"""
+        turns = []
+        context_sources = []
+
+        for doc in relevant_docs:
+            metadata = doc.metadata
+            context_parts = []
+
+            if 'user_question' in metadata and 'assistant_answer' in metadata:
+                context_parts.append(f"Previous Q: {metadata['user_question']}")
+                context_parts.append(f"Previous A: {metadata['assistant_answer']}")
+
+                if metadata.get('sources'):
+                    context_parts.append(f"Sources: {', '.join(metadata['sources'])}")
+
+                context_sources.append(f"Previous conversation from {metadata.get('timestamp', 'unknown time')}")
+
+            if context_parts:
+                turns.append('\n'.join(context_parts))
+
+        return turns, context_sources
+
+    def _search(self, query_embedding: List[float], max_results: int):
+        return self._live().search(query_embedding, max_results)
+
+    def has_history(self) -> bool:
+        """Check if any conversation has been indexed for this session"""
+        return self.chat_history_path.exists()
+
+    def get_relevant_turns(
+        self,
+        current_question: str,
+        max_results: int = 3,
+        query_embedding: Optional[List[float]] = None
+    ) -> Tuple[List[str], List[str]]:
+        """Retrieve relevant previous conversations as separate prompt blocks
+
+        A query_embedding already computed for the question (with the
+        session's embedding backend) is used instead of embedding it again.
+        """
+        if not self.has_history():
+            return [], []
+
         try:
-            chat_history_store = FAISS.load_local(
-                str(self.chat_history_path), 
-                self.embeddings, 
-                allow_dangerous_deserialization=True
-            )
-            
             # Search for relevant previous conversations
-            retriever = chat_history_store.as_retriever(search_kwargs={"k": max_results})
-            relevant_docs = retriever.get_relevant_documents(current_question)
-            
-            if not relevant_docs:
-                return "", []
-            
-            # Format the context
-            chat_context_parts = []
-            context_sources = []
-            
-            for doc in relevant_docs:
-                metadata = doc.metadata
-                context_parts = []
-                
-                if 'user_question' in metadata and 'assistant_answer' in metadata:
-                    context_parts.append(f"Previous Q: {metadata['user_question']}")
-                    context_parts.append(f"Previous A: {metadata['assistant_answer']}")
-                    
-                    if metadata.get('sources'):
-                        context_parts.append(f"Sources: {', '.join(metadata['sources'])}")
-                    
-                    context_sources.append(f"Previous conversation from {metadata.get('timestamp', 'unknown time')}")
-                
-                if context_parts:
-                    chat_context_parts.append('\n'.join(context_parts))
-            
-            chat_context = '\n\n---\n\n'.join(chat_context_parts) if chat_context_parts else ""
-            return chat_context, context_sources
-            
+            if query_embedding is None:
+                query_embedding = self.embeddings.embed_query(current_question)
+            relevant_docs = self._search(query_embedding, max_results)
+            return self._format_turns(relevant_docs)
+
+        except Exception as e:
+            print(f"Error retrieving chat context: {str(e)}")
+            return [], []
+
+    async def aget_relevant_turns(
+        self,
+        current_question: str,
+        max_results: int = 3,
+        query_embedding: Optional[List[float]] = None
+    ) -> Tuple[List[str], List[str]]:
+        """Async variant of get_relevant_turns"""
+        if not self.has_history():
+            return [], []
+
+        try:
+            if query_embedding is None:
+                query_embedding = await self.embeddings.aembed_query(current_question)
+            relevant_docs = await run_blocking(io_executor, self._search, query_embedding, max_results)
+            return self._format_turns(relevant_docs)
+
         except Exception as e:
             print(f"Error retrieving chat context: {str(e)}")
-            return "", []
-    
+            return [], []
+
+    async def aget_relevant_turns_batch(
+        self,
+        query_embeddings: List[List[float]],
+        max_results: int = 3
+    ) -> List[Tuple[List[str], List[str]]]:
+        """get_relevant_turns for several already-embedded questions, searched together"""
+        if not self.has_history():
+            return [([], []) for _ in query_embeddings]
+
+        try:
+            relevant = await run_blocking(
+                io_executor, lambda: self._live().search_many(query_embeddings, max_results)
+            )
+            return [self._format_turns(relevant_docs) for relevant_docs in relevant]
+
+        except Exception as e:
+            print(f"Error retrieving chat context: {str(e)}")
+            return [([], []) for _ in query_embeddings]
+
+    def get_relevant_context(
+        self,
+        current_question: str,
+        max_results: int = 3,
+        query_embedding: Optional[List[float]] = None
+    ) -> Tuple[str, List[str]]:
+        """Retrieve relevant chat history context for the current question"""
+        turns, context_sources = self.get_relevant_turns(current_question, max_results, query_embedding)
+        return CHAT_TURN_SEPARATOR.join(turns), context_sources
+
+    async def aget_relevant_context(
+        self,
+        current_question: str,
+        max_results: int = 3,
+        query_embedding: Optional[List[float]] = None
+    ) -> Tuple[str, List[str]]:
+        """Async variant of get_relevant_context"""
+        turns, context_sources = await self.aget_relevant_turns(current_question, max_results, query_embedding)
+        return CHAT_TURN_SEPARATOR.join(turns), context_sources
+
     def clear_history(self):
         """Clear the chat history vector store"""
-        if self.chat_history_path.exists():
-            shutil.rmtree(self.chat_history_path)
\ No newline at end of file
+        with _lock_for(self.chat_history_path), _file_lock(self.chat_history_path):
+            index_cache.invalidate(self.chat_history_path)
+            if self.chat_history_path.exists():
+                shutil.rmtree(self.chat_history_path)
@@ -1,22 +1,51 @@
 import os
-from typing import Optional, Tuple, List
-from pathlib import Path
+import time
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple, List
+import numpy as np
 from fastapi import HTTPException
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_groq import ChatGroq
 
 from .models import DEFAULT_SYSTEM_PROMPT
-from .chat_manager import ChatHistoryManager
+from .chat_manager import CHAT_TURN_SEPARATOR, ChatHistoryManager
+from .context_packing import PackedContext, pack_context
+from .executors import io_executor, run_blocking
+from .embeddings import aembed_queries, get_embeddings
+from .document_store import (
+    session_docset_fingerprint,
+    session_embedding_backend,
+    session_index_generation,
+    session_index_path
+)
+from .answer_cache import answer_cache, answer_scope
+from .metrics import CHAT_CONTEXT_TOKENS, CHAT_REQUESTS, StageTimer, chat_timer, optional_stage
+from .index_cache import index_cache
+from .sparse_index import BM25Index, reciprocal_rank_fusion
+from .vector_index import load_vector_store
+from .llm_clients import chain_cache, get_llm
 
 
-def get_conversational_chain(model_name: str, system_prompt: Optional[str] = None):
-    """Create conversational chain with custom system prompt"""
+# "hybrid" fuses dense and BM25 rankings; "dense" and "sparse" use one of them
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+# Questions accepted by one batch request, and completions run at once per batch
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+
+def get_conversational_chain(
+    model_name: str,
+    system_prompt: Optional[str] = None,
+    llm: Optional[BaseChatModel] = None
+):
+    """Get the conversational chain for a model and system prompt (compiled once and cached)"""
     if system_prompt is None:
         system_prompt = DEFAULT_SYSTEM_PROMPT
-    
+
     # Ensure the system prompt includes all necessary placeholders
     if "{context}" not in system_prompt:
         system_prompt += "\n\nDocument Context:\n{context}"
@@ -24,87 +53,598 @@ def get_conversational_chain(model_name: str, system_prompt: Optional[str] = Non
         system_prompt += "\n\nChat History Context:\n{chat_context}"
     if "{input}" not in system_prompt:
         system_prompt += "\n\nQuestion: {input}"
-    
-    groq_api_key = os.getenv('GROQ_API_KEY')
-    llm = ChatGroq(groq_api_key=groq_api_key, model_name=model_name)
-    prompt = ChatPromptTemplate.from_template(system_prompt)
-    chain = create_stuff_documents_chain(llm, prompt)
-    return chain
+
+    if llm is None:
+        llm = get_llm(model_name)
+    return chain_cache.get(
+        model_name,
+        system_prompt,
+        llm,
+        lambda: create_stuff_documents_chain(llm, ChatPromptTemplate.from_template(system_prompt))
+    )
+
+
+def load_session_index(session_id: str, generation: Optional[int] = None) -> FAISS:
+    """Load a session's document vector store (served from the index cache when warm)"""
+    index_path = session_index_path(session_id, "faiss_index", generation)
+    if not index_path.exists():
+        raise HTTPException(status_code=400, detail="No processed documents found for this session")
+
+    # Query with the backend that built the index; vectors from another backend are not comparable
+    embeddings = get_embeddings(session_embedding_backend(session_id))
+    return index_cache.get(index_path, lambda: load_vector_store(index_path, embeddings))
+
+
+def load_session_sparse_index(session_id: str, generation: Optional[int] = None) -> Optional[BM25Index]:
+    """Load a session's BM25 index, or None for sessions built before it existed"""
+    sparse_path = session_index_path(session_id, "bm25_index", generation)
+    if not (sparse_path / "vocab.json").exists():
+        return None
+    return index_cache.get(sparse_path, lambda: BM25Index.load(sparse_path))
+
+
+def load_session_indexes(session_id: str) -> Tuple[FAISS, Optional[BM25Index]]:
+    """Load a session's dense and sparse indexes from the same generation"""
+    generation = session_index_generation(session_id)
+    return load_session_index(session_id, generation), load_session_sparse_index(session_id, generation)
+
+
+def search_documents(
+    vector_store: FAISS,
+    sparse_index: Optional[BM25Index],
+    question: str,
+    query_embedding: List[float],
+    k: int = RETRIEVAL_K,
+    mode: Optional[str] = None
+) -> List[Document]:
+    """Retrieve the top-k chunks, fusing dense and BM25 rankings when a sparse index is available"""
+    return search_documents_batch(vector_store, sparse_index, [question], [query_embedding], k, mode)[0]
+
+
+def search_documents_batch(
+    vector_store: FAISS,
+    sparse_index: Optional[BM25Index],
+    questions: List[str],
+    query_embeddings: List[List[float]],
+    k: int = RETRIEVAL_K,
+    mode: Optional[str] = None
+) -> List[List[Document]]:
+    """search_documents for several questions, with one FAISS search for the whole batch"""
+    mode = mode or RETRIEVAL_MODE
+    if not questions:
+        return []
+    hybrid = sparse_index is not None and mode != "dense"
+    fetch_k = k * 4 if hybrid else k
+
+    sparse_rankings = [
+        [doc_id for doc_id, _ in sparse_index.search(question, fetch_k)] if hybrid else []
+        for question in questions
+    ]
+    dense_rankings = [[] for _ in questions]
+    if not hybrid or mode != "sparse" or not all(sparse_rankings):
+        _, positions = vector_store.index.search(np.asarray(query_embeddings, dtype=np.float32), fetch_k)
+        dense_rankings = [[int(position) for position in row if position >= 0] for row in positions]
+
+    results = []
+    for dense_ranking, sparse_ranking in zip(dense_rankings, sparse_rankings):
+        if not hybrid:
+            fused = dense_ranking
+        elif mode == "sparse" and sparse_ranking:
+            fused = sparse_ranking[:k]
+        else:
+            fused = reciprocal_rank_fusion([dense_ranking, sparse_ranking], k)
+        results.append([
+            vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+            for position in fused
+        ])
+    return results
+
+
+def retrieve_context(
+    question: str,
+    session_id: str,
+    use_chat_history: bool = True,
+    timer: Optional[StageTimer] = None,
+    chat_manager: Optional[ChatHistoryManager] = None
+) -> Tuple[List[Document], List[str], List[str]]:
+    """Retrieve document chunks and relevant previous conversations (with their labels) for a question
+
+    The question is embedded once; the vector is used for both searches.
+    """
+    with optional_stage(timer, "load"):
+        vector_store, sparse_index = load_session_indexes(session_id)
+
+    with optional_stage(timer, "embed"):
+        query_embedding = vector_store.embeddings.embed_query(question)
+
+    # Get chat history context if enabled
+    chat_turns = []
+    chat_context_sources = []
+    if use_chat_history:
+        with optional_stage(timer, "history"):
+            chat_manager = chat_manager or ChatHistoryManager(session_id)
+            chat_turns, chat_context_sources = chat_manager.get_relevant_turns(
+                question, query_embedding=query_embedding
+            )
+
+    with optional_stage(timer, "retrieve"):
+        docs = search_documents(vector_store, sparse_index, question, query_embedding)
+    return docs, chat_turns, chat_context_sources
+
+
+async def aretrieve_context(
+    question: str,
+    session_id: str,
+    use_chat_history: bool = True,
+    k: int = RETRIEVAL_K,
+    query_embedding: Optional[List[float]] = None,
+    timer: Optional[StageTimer] = None,
+    chat_manager: Optional[ChatHistoryManager] = None
+) -> Tuple[List[Document], List[str], List[str]]:
+    """Async variant of retrieve_context
+
+    Embedding calls use the async client; index loads and searches run on the
+    index I/O pool. The question is embedded once (or not at all when the
+    caller passes the query_embedding it computed for the answer cache) and
+    document and chat history search then run concurrently on that vector.
+    """
+    with optional_stage(timer, "load"):
+        vector_store, sparse_index = await run_blocking(io_executor, load_session_indexes, session_id)
+
+    if query_embedding is None:
+        with optional_stage(timer, "embed"):
+            query_embedding = await vector_store.embeddings.aembed_query(question)
+
+    async def retrieve_documents() -> List[Document]:
+        with optional_stage(timer, "retrieve"):
+            return await run_blocking(
+                io_executor, search_documents, vector_store, sparse_index, question, query_embedding, k
+            )
+
+    async def search_chat_history() -> Tuple[List[str], List[str]]:
+        if not use_chat_history:
+            return [], []
+        with optional_stage(timer, "history"):
+            return await (chat_manager or ChatHistoryManager(session_id)).aget_relevant_turns(
+                question, query_embedding=query_embedding
+            )
+
+    docs, (chat_turns, chat_context_sources) = await asyncio.gather(
+        retrieve_documents(), search_chat_history()
+    )
+    return docs, chat_turns, chat_context_sources
+
+
+async def apreview_chat_context(session_id: str, question: str) -> Tuple[str, List[str]]:
+    """Chat history context that would be retrieved for a question, through the same vector path as /chat"""
+    chat_manager = ChatHistoryManager(session_id)
+    if not chat_manager.has_history():
+        return "", []
+    query_embedding = await aembed_question(session_id, question)
+    return await chat_manager.aget_relevant_context(question, query_embedding=query_embedding)
+
+
+def pack_retrieved_context(
+    docs: List[Document],
+    chat_turns: List[str],
+    chat_context_sources: List[str],
+    model_name: str,
+    question: str,
+    system_prompt: Optional[str] = None
+) -> PackedContext:
+    """Fit retrieved documents and chat history into the model's prompt budget"""
+    packed = pack_context(
+        docs, chat_turns, chat_context_sources, model_name, question, system_prompt, CHAT_TURN_SEPARATOR
+    )
+    CHAT_CONTEXT_TOKENS.observe(packed.context_tokens)
+    return packed
+
+
+def format_sources(docs: List[Document]) -> List[str]:
+    """Format file and page references for retrieved documents"""
+    sources = set()
+    for doc in docs:
+        if 'file' in doc.metadata and 'page' in doc.metadata:
+            sources.add(f"{doc.metadata['file']} (page {doc.metadata['page']})")
+    return list(sources)
 
 
 def process_question(
-    question: str, 
-    model_name: str, 
-    session_id: str, 
-    system_prompt: Optional[str] = None, 
-    use_chat_history: bool = True
+    question: str,
+    model_name: str,
+    session_id: str,
+    system_prompt: Optional[str] = None,
+    use_chat_history: bool = True,
+    llm: Optional[BaseChatModel] = None
 ) -> Tuple[str, List[str], List[str]]:
     """Process user question and return answer with context preservation"""
+    timer = chat_timer()
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        session_dir = Path(f"sessions/{session_id}")
-        
-        if not (session_dir / "faiss_index").exists():
-            raise HTTPException(status_code=400, detail="No processed documents found for this session")
-        
-        # Load document vector store
-        vector_store = FAISS.load_local(
-            str(session_dir / "faiss_index"), 
-            embeddings, 
-            allow_dangerous_deserialization=True
-        )
-        
-        retriever = vector_store.as_retriever()
-        
-        # Get chat history context if enabled
-        chat_context = ""
-        chat_context_sources = []
-        if use_chat_history:
-            chat_manager = ChatHistoryManager(session_id)
-            chat_context, chat_context_sources = chat_manager.get_relevant_context(question)
-        
-        # Create custom chain that includes chat context
-        chain = get_conversational_chain(model_name, system_prompt)
-        
-        # Create a custom retrieval chain that includes chat context
-        def enhanced_chain(inputs):
-            # Get document context
-            docs = retriever.get_relevant_documents(inputs['input'])
-            
-            # Prepare inputs for the chain
-            chain_inputs = {
-                'input': inputs['input'],
-                'context': docs,
-                'chat_context': chat_context
-            }
-            
-            # Get response from chain
-            response = chain.invoke(chain_inputs)
-            
+        with timer.stage("total"):
+            chat_manager = ChatHistoryManager(session_id) if use_chat_history else None
+            retrieved = retrieve_context(question, session_id, use_chat_history, timer, chat_manager)
+            with timer.stage("pack"):
+                packed = pack_retrieved_context(*retrieved, model_name, question, system_prompt)
+
+            # Create custom chain that includes chat context
+            chain = get_conversational_chain(model_name, system_prompt, llm)
+            with timer.stage("llm"):
+                answer = chain.invoke({
+                    'input': question,
+                    'context': packed.docs,
+                    'chat_context': packed.chat_context
+                })
+
+            # Add source information
+            sources = format_sources(packed.docs)
+
+            # Add chat history to vector store for future context
+            if use_chat_history:
+                with timer.stage("persist"):
+                    chat_manager.add_to_history(question, answer, sources)
+
+        CHAT_REQUESTS.inc(outcome="answered")
+        return answer, sources, packed.chat_context_sources
+
+    except Exception as e:
+        CHAT_REQUESTS.inc(outcome="error")
+        raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
+
+
+async def aembed_question(session_id: str, question: str, timer: Optional[StageTimer] = None) -> List[float]:
+    """Embed a question with the backend that built the session's index"""
+    with optional_stage(timer, "load"):
+        vector_store = await run_blocking(io_executor, load_session_index, session_id)
+    with optional_stage(timer, "embed"):
+        return await vector_store.embeddings.aembed_query(question)
+
+
+def session_answer_scope(session_id: str, model_name: str, system_prompt: Optional[str]) -> Tuple[str, str, str]:
+    """Answer cache scope for a session's current documents, model and prompt"""
+    return answer_scope(session_docset_fingerprint(session_id), model_name, system_prompt)
+
+
+def answer_cacheable(chat_manager: Optional[ChatHistoryManager]) -> bool:
+    """Whether a session's next answer may be read from or written to the answer cache
+
+    The cache is shared by every session over the same documents and keyed
+    only by the question, so an answer that drew on a conversation (or a
+    follow-up asked in one) is not cached or served from it.
+    """
+    return chat_manager is None or not chat_manager.has_history()
+
+
+async def alookup_cached_answer(
+    question: str,
+    session_id: str,
+    scope: Tuple[str, str, str],
+    timer: StageTimer
+) -> Tuple[Optional[Dict], Optional[List[float]]]:
+    """Answer cache lookup; returns the cached response (or None) and the query embedding if one was computed"""
+    if not answer_cache.enabled:
+        return None, None
+
+    with timer.stage("cache"):
+        cached = answer_cache.get(scope, question)
+    if cached is not None or answer_cache.mode != "semantic":
+        return cached, None
+
+    query_embedding = await aembed_question(session_id, question, timer)
+    with timer.stage("cache"):
+        return answer_cache.get(scope, question, query_embedding), query_embedding
+
+
+async def aprocess_question(
+    question: str,
+    model_name: str,
+    session_id: str,
+    system_prompt: Optional[str] = None,
+    use_chat_history: bool = True,
+    llm: Optional[BaseChatModel] = None,
+    use_cache: bool = True
+) -> Dict:
+    """Async variant of process_question for use inside request handlers
+
+    Returns the ChatResponse fields: answer, sources, chat_context_used,
+    cached (True when the answer came from the answer cache),
+    context_tokens, the estimated size of the packed document and chat
+    context, and timings, milliseconds spent in each stage.
+    """
+    timer = chat_timer()
+    started = time.perf_counter()
+    try:
+        chat_manager = ChatHistoryManager(session_id) if use_chat_history else None
+        scope = session_answer_scope(session_id, model_name, system_prompt)
+        use_cache = use_cache and answer_cacheable(chat_manager)
+        cached, query_embedding = None, None
+        if use_cache:
+            cached, query_embedding = await alookup_cached_answer(question, session_id, scope, timer)
+
+        if cached is not None:
+            if use_chat_history:
+                with timer.stage("persist"):
+                    await chat_manager.aadd_to_history(question, cached["answer"], cached["sources"])
+            timer.record("total", time.perf_counter() - started)
+            CHAT_REQUESTS.inc(outcome="cached")
             return {
-                'answer': response,
-                'context': docs,
-                'chat_context': chat_context
+                **cached,
+                "chat_context_used": [],
+                "cached": True,
+                "context_tokens": 0,
+                "timings": timer.as_ms()
             }
-        
-        response = enhanced_chain({'input': question})
-        
-        # Format the answer with file and page references
-        answer = response['answer']
-        context_docs = response['context']
-        
-        # Add source information
-        sources = set()
-        for doc in context_docs:
-            if 'file' in doc.metadata and 'page' in doc.metadata:
-                sources.add(f"{doc.metadata['file']} (page {doc.metadata['page']})")
-        
-        # Add chat history to vector store for future context
+
+        retrieved = await aretrieve_context(
+            question, session_id, use_chat_history,
+            query_embedding=query_embedding, timer=timer, chat_manager=chat_manager
+        )
+        with timer.stage("pack"):
+            packed = pack_retrieved_context(*retrieved, model_name, question, system_prompt)
+
+        chain = get_conversational_chain(model_name, system_prompt, llm)
+        with timer.stage("llm"):
+            answer = await chain.ainvoke({
+                'input': question,
+                'context': packed.docs,
+                'chat_context': packed.chat_context
+            })
+
+        sources = format_sources(packed.docs)
+        if use_cache and not packed.chat_context_sources:
+            answer_cache.put(scope, question, {"answer": answer, "sources": sources}, query_embedding)
+
         if use_chat_history:
-            chat_manager = ChatHistoryManager(session_id)
-            chat_manager.add_to_history(question, answer, list(sources))
-        
-        return answer, list(sources), chat_context_sources
-    
+            with timer.stage("persist"):
+                await chat_manager.aadd_to_history(question, answer, sources)
+
+        timer.record("total", time.perf_counter() - started)
+        CHAT_REQUESTS.inc(outcome="answered")
+        return {
+            "answer": answer,
+            "sources": sources,
+            "chat_context_used": packed.chat_context_sources,
+            "cached": False,
+            "context_tokens": packed.context_tokens,
+            "timings": timer.as_ms()
+        }
+
+    except HTTPException:
+        CHAT_REQUESTS.inc(outcome="error")
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
\ No newline at end of file
+        CHAT_REQUESTS.inc(outcome="error")
+        raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
+
+
+async def astream_question(
+    question: str,
+    model_name: str,
+    session_id: str,
+    system_prompt: Optional[str] = None,
+    use_chat_history: bool = True,
+    llm: Optional[BaseChatModel] = None,
+    use_cache: bool = True
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """Process user question, yielding (event, data) pairs as the answer is generated
+
+    Events are emitted in order: ``sources`` once retrieval is done, ``token``
+    for each chunk of the completion, then ``done`` with the full answer and
+    stage timings. The chat history index is updated after the last token.
+    A cached answer is sent as a single token.
+    """
+    try:
+        timer = chat_timer()
+        started = time.perf_counter()
+        chat_manager = ChatHistoryManager(session_id) if use_chat_history else None
+        scope = session_answer_scope(session_id, model_name, system_prompt)
+        use_cache = use_cache and answer_cacheable(chat_manager)
+        cached, query_embedding = None, None
+        if use_cache:
+            cached, query_embedding = await alookup_cached_answer(question, session_id, scope, timer)
+
+        if cached is not None:
+            yield "sources", {"sources": cached["sources"], "chat_context_used": [], "cached": True, "context_tokens": 0}
+            yield "token", {"token": cached["answer"]}
+            if use_chat_history:
+                with timer.stage("persist"):
+                    await chat_manager.aadd_to_history(question, cached["answer"], cached["sources"])
+            timer.record("total", time.perf_counter() - started)
+            CHAT_REQUESTS.inc(outcome="cached")
+            yield "done", {"answer": cached["answer"], "cached": True, "timings": timer.as_ms()}
+            return
+
+        retrieved = await aretrieve_context(
+            question, session_id, use_chat_history,
+            query_embedding=query_embedding, timer=timer, chat_manager=chat_manager
+        )
+        with timer.stage("pack"):
+            packed = pack_retrieved_context(*retrieved, model_name, question, system_prompt)
+        sources = format_sources(packed.docs)
+        yield "sources", {
+            "sources": sources,
+            "chat_context_used": packed.chat_context_sources,
+            "cached": False,
+            "context_tokens": packed.context_tokens
+        }
+
+        chain = get_conversational_chain(model_name, system_prompt, llm)
+        answer_parts = []
+        llm_started = time.perf_counter()
+        async for token in chain.astream({
+            'input': question,
+            'context': packed.docs,
+            'chat_context': packed.chat_context
+        }):
+            if token:
+                if not answer_parts:
+                    timer.record("first_token", time.perf_counter() - llm_started)
+                answer_parts.append(token)
+                yield "token", {"token": token}
+        timer.record("llm", time.perf_counter() - llm_started)
+
+        answer = "".join(answer_parts)
+        if use_cache and not packed.chat_context_sources:
+            answer_cache.put(scope, question, {"answer": answer, "sources": sources}, query_embedding)
+        if use_chat_history:
+            with timer.stage("persist"):
+                await chat_manager.aadd_to_history(question, answer, sources)
+
+        timer.record("total", time.perf_counter() - started)
+        CHAT_REQUESTS.inc(outcome="answered")
+        yield "done", {"answer": answer, "cached": False, "timings": timer.as_ms()}
+    except Exception:
+        CHAT_REQUESTS.inc(outcome="error")
+        raise
+
+
+async def aprocess_question_batch(
+    questions: List[str],
+    model_name: str,
+    session_id: str,
+    system_prompt: Optional[str] = None,
+    use_chat_history: bool = True,
+    llm: Optional[BaseChatModel] = None,
+    use_cache: bool = True,
+    max_concurrency: Optional[int] = None,
+    record_turn: Optional[Callable[[str, str], None]] = None
+) -> AsyncIterator[Tuple[int, Dict]]:
+    """Answer a batch of questions, yielding (index, result) as each answer completes
+
+    The session's indexes are loaded once, all questions are embedded as
+    queries together (aembed_queries) and searched with one FAISS query,
+    and completions run concurrently, at most max_concurrency
+    (BATCH_LLM_CONCURRENCY by default) at a time. Results have the aprocess_question fields, with the batch's
+    shared stages in each one's timings, or an error for a question that
+    could not be answered.
+
+    Every question sees the chat history from before the batch. The
+    batch's turns are added to it in input order, each once all earlier
+    questions are answered; record_turn(question, answer) is called for each
+    at the same point.
+    """
+    timer = chat_timer()
+    started = time.perf_counter()
+    chat_manager = ChatHistoryManager(session_id) if use_chat_history else None
+    scope = session_answer_scope(session_id, model_name, system_prompt)
+    use_cache = use_cache and answer_cacheable(chat_manager)
+    results: List[Optional[Dict]] = [None] * len(questions)
+    turns: List[Optional[Tuple[str, str, List[str]]]] = [None] * len(questions)
+    committed = 0
+
+    async def commit_ready() -> None:
+        """Add the answered turns that follow the last committed one to history"""
+        nonlocal committed
+        start = committed
+        while committed < len(questions) and results[committed] is not None:
+            committed += 1
+        ready = [turn for turn in turns[start:committed] if turn is not None]
+        if use_chat_history and ready:
+            with timer.stage("persist"):
+                await chat_manager.aadd_turns_to_history(ready)
+        if record_turn is not None:
+            for question, answer, _ in ready:
+                record_turn(question, answer)
+
+    def finish(index: int, result: Dict) -> Dict:
+        results[index] = result
+        if "answer" in result:
+            turns[index] = (questions[index], result["answer"], result["sources"])
+        return result
+
+    with timer.stage("load"):
+        vector_store, sparse_index = await run_blocking(io_executor, load_session_indexes, session_id)
+
+    cached: List[Optional[Dict]] = [None] * len(questions)
+    if use_cache and answer_cache.enabled:
+        with timer.stage("cache"):
+            cached = [answer_cache.get(scope, question) for question in questions]
+
+    # Each distinct question is embedded once, in one call
+    pending = [index for index, hit in enumerate(cached) if hit is None]
+    distinct = list(dict.fromkeys(questions[index] for index in pending))
+    embedding_of: Dict[str, List[float]] = {}
+    if distinct:
+        with timer.stage("embed"):
+            embedding_of = dict(zip(distinct, await aembed_queries(vector_store.embeddings, distinct)))
+    if use_cache and answer_cache.enabled and answer_cache.mode == "semantic":
+        with timer.stage("cache"):
+            for index in pending:
+                cached[index] = answer_cache.get(scope, questions[index], embedding_of[questions[index]])
+        pending = [index for index in pending if cached[index] is None]
+
+    pending_questions = [questions[index] for index in pending]
+    pending_embeddings = [embedding_of[question] for question in pending_questions]
+
+    async def retrieve_documents() -> List[List[Document]]:
+        with timer.stage("retrieve"):
+            return await run_blocking(
+                io_executor, search_documents_batch, vector_store, sparse_index, pending_questions, pending_embeddings
+            )
+
+    async def search_chat_history() -> List[Tuple[List[str], List[str]]]:
+        if not use_chat_history or not pending:
+            return [([], []) for _ in pending]
+        with timer.stage("history"):
+            return await chat_manager.aget_relevant_turns_batch(pending_embeddings)
+
+    docs, history = await asyncio.gather(retrieve_documents(), search_chat_history())
+    shared_timings = timer.as_ms()
+
+    for index, hit in enumerate(cached):
+        if hit is not None:
+            CHAT_REQUESTS.inc(outcome="cached")
+            result = finish(index, {
+                **hit,
+                "chat_context_used": [],
+                "cached": True,
+                "context_tokens": 0,
+                "timings": shared_timings
+            })
+            await commit_ready()
+            yield index, result
+
+    chain = get_conversational_chain(model_name, system_prompt, llm)
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency or BATCH_LLM_CONCURRENCY, BATCH_LLM_CONCURRENCY)))
+
+    async def answer_one(position: int) -> Tuple[int, Dict]:
+        index = pending[position]
+        question = questions[index]
+        question_timer = chat_timer()
+        try:
+            with question_timer.stage("pack"):
+                packed = pack_retrieved_context(docs[position], *history[position], model_name, question, system_prompt)
+            async with semaphore:
+                with question_timer.stage("llm"):
+                    answer = await chain.ainvoke({
+                        'input': question,
+                        'context': packed.docs,
+                        'chat_context': packed.chat_context
+                    })
+        except Exception as e:
+            CHAT_REQUESTS.inc(outcome="error")
+            return index, {"error": f"Error processing question: {str(e)}"}
+
+        sources = format_sources(packed.docs)
+        if use_cache and not packed.chat_context_sources:
+            answer_cache.put(scope, question, {"answer": answer, "sources": sources}, pending_embeddings[position])
+        CHAT_REQUESTS.inc(outcome="answered")
+        return index, {
+            "answer": answer,
+            "sources": sources,
+            "chat_context_used": packed.chat_context_sources,
+            "cached": False,
+            "context_tokens": packed.context_tokens,
+            "timings": {**shared_timings, **question_timer.as_ms()}
+        }
+
+    tasks = [asyncio.ensure_future(answer_one(position)) for position in range(len(pending))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            finish(index, result)
+            await commit_ready()
+            yield index, result
+    finally:
+        for task in tasks:
+            task.cancel()
+    timer.record("total", time.perf_counter() - started)
@@ -0,0 +1,263 @@
+import json
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+
+# Metadata keys with their own columns; anything else goes to the JSON column
+_COLUMN_KEYS = ("file", "page")
+# Marks a missing file or page
+_MISSING = -1
+
+
+def _load_array(path: Path, mmap: bool) -> np.ndarray:
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def _encode_blob(values: Sequence[bytes]) -> tuple:
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    return np.frombuffer(b"".join(values), dtype=np.uint8), offsets
+
+
+class PositionIds(MutableMapping):
+    """index_to_docstore_id for a ChunkStore: FAISS position i maps to the id str(i)
+
+    Behaves like the dict LangChain's FAISS expects without holding one
+    entry per chunk. Ids can only be appended in position order.
+    """
+
+    def __init__(self, length: int = 0):
+        self.length = length
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < self.length:
+            raise KeyError(position)
+        return str(position)
+
+    def __setitem__(self, position: int, doc_id: str) -> None:
+        if position != self.length or doc_id != str(position):
+            raise ValueError("Chunk ids must be appended in position order")
+        self.length += 1
+
+    def __delitem__(self, position: int) -> None:
+        raise NotImplementedError("Chunks cannot be deleted from a chunk store")
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.length))
+
+    def __len__(self) -> int:
+        return self.length
+
+
+class ChunkStore(Docstore, AddableMixin):
+    """Columnar docstore for chunk Documents, addressed by FAISS position
+
+    Chunk i's text is ``text[offsets[i]:offsets[i + 1]]`` (UTF-8), its file is
+    ``files[file_ids[i]]`` and its page ``pages[i]``; any other metadata (chat
+    history turns) is JSON in the ``extra`` blob with ``extra_offsets``. On disk
+    each array is a ``.npy`` file that is memory-mapped on load, plus
+    ``files.json`` for the interned file table. Documents are only built for
+    the positions that are looked up.
+    """
+
+    def __init__(
+        self,
+        text: np.ndarray,
+        offsets: np.ndarray,
+        files: List[str],
+        file_ids: np.ndarray,
+        pages: np.ndarray,
+        extra: np.ndarray,
+        extra_offsets: np.ndarray
+    ):
+        self.text = text
+        self.offsets = offsets
+        self.files = files
+        self.file_ids = file_ids
+        self.pages = pages
+        self.extra = extra
+        self.extra_offsets = extra_offsets
+        # Chunks added since the columns were built or loaded
+        self._pending: List[Document] = []
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Document]) -> "ChunkStore":
+        """Build the columns from documents in FAISS position order"""
+        files: List[str] = []
+        file_index: Dict[str, int] = {}
+        file_ids = np.full(len(documents), _MISSING, dtype=np.int32)
+        pages = np.full(len(documents), _MISSING, dtype=np.int32)
+        texts, extras = [], []
+
+        for position, doc in enumerate(documents):
+            texts.append(doc.page_content.encode("utf-8"))
+            metadata = doc.metadata
+            if metadata.get("file") is not None:
+                file_ids[position] = file_index.setdefault(metadata["file"], len(file_index))
+                if file_ids[position] == len(files):
+                    files.append(metadata["file"])
+            if metadata.get("page") is not None:
+                pages[position] = metadata["page"]
+            rest = {key: value for key, value in metadata.items() if key not in _COLUMN_KEYS}
+            extras.append(json.dumps(rest).encode("utf-8") if rest else b"")
+
+        text, offsets = _encode_blob(texts)
+        extra, extra_offsets = _encode_blob(extras)
+        return cls(text, offsets, files, file_ids, pages, extra, extra_offsets)
+
+    @classmethod
+    def concat(cls, stores: Sequence["ChunkStore"], file_names: Optional[Sequence[str]] = None) -> "ChunkStore":
+        """Join stores end to end without building Documents
+
+        With file_names, every chunk of stores[i] is labelled file_names[i].
+        """
+        stores = [store._flushed() for store in stores]
+        files: List[str] = []
+        file_index: Dict[str, int] = {}
+        file_id_columns = []
+        for position, store in enumerate(stores):
+            if file_names is not None:
+                file_id = file_index.setdefault(file_names[position], len(file_index))
+                if file_id == len(files):
+                    files.append(file_names[position])
+                file_id_columns.append(np.full(len(store), file_id, dtype=np.int32))
+                continue
+            mapping = np.empty(len(store.files) + 1, dtype=np.int32)
+            mapping[-1] = _MISSING
+            for old_id, file_name in enumerate(store.files):
+                mapping[old_id] = file_index.setdefault(file_name, len(file_index))
+                if mapping[old_id] == len(files):
+                    files.append(file_name)
+            # _MISSING (-1) indexes the last slot of mapping
+            file_id_columns.append(mapping[store.file_ids])
+
+        def join(column: str, empty_dtype) -> np.ndarray:
+            parts = [np.asarray(getattr(store, column)) for store in stores]
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=empty_dtype)
+
+        def join_offsets(column: str) -> np.ndarray:
+            offsets, base = [np.zeros(1, dtype=np.int64)], 0
+            for store in stores:
+                store_offsets = np.asarray(getattr(store, column), dtype=np.int64)
+                offsets.append(store_offsets[1:] + base)
+                base += int(store_offsets[-1])
+            return np.concatenate(offsets)
+
+        return cls(
+            join("text", np.uint8),
+            join_offsets("offsets"),
+            files,
+            np.concatenate(file_id_columns) if file_id_columns else np.zeros(0, dtype=np.int32),
+            join("pages", np.int32),
+            join("extra", np.uint8),
+            join_offsets("extra_offsets")
+        )
+
+    def slice(self, start: int, end: int) -> "ChunkStore":
+        """Chunks start to end - 1 as a store of their own"""
+        store = self._flushed()
+        offsets = np.asarray(store.offsets[start:end + 1], dtype=np.int64)
+        extra_offsets = np.asarray(store.extra_offsets[start:end + 1], dtype=np.int64)
+        return ChunkStore(
+            store.text[offsets[0]:offsets[-1]],
+            offsets - offsets[0],
+            store.files,
+            store.file_ids[start:end],
+            store.pages[start:end],
+            store.extra[extra_offsets[0]:extra_offsets[-1]],
+            extra_offsets - extra_offsets[0]
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1 + len(self._pending)
+
+    def _flushed(self) -> "ChunkStore":
+        """This store with pending chunks folded into the columns"""
+        if not self._pending:
+            return self
+        frozen = ChunkStore(
+            self.text, self.offsets, self.files, self.file_ids, self.pages, self.extra, self.extra_offsets
+        )
+        return ChunkStore.concat([frozen, ChunkStore.from_documents(self._pending)])
+
+    def page_content(self, position: int) -> str:
+        """Text of one chunk"""
+        frozen = len(self.offsets) - 1
+        if position >= frozen:
+            return self._pending[position - frozen].page_content
+        return bytes(self.text[self.offsets[position]:self.offsets[position + 1]]).decode("utf-8")
+
+    def texts(self) -> Iterator[str]:
+        """Every chunk's text in position order"""
+        for position in range(len(self)):
+            yield self.page_content(position)
+
+    def document(self, position: int) -> Document:
+        """Materialize one chunk as a Document"""
+        frozen = len(self.offsets) - 1
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        if position >= frozen:
+            return self._pending[position - frozen]
+
+        metadata = {}
+        start, end = self.extra_offsets[position], self.extra_offsets[position + 1]
+        if end > start:
+            metadata.update(json.loads(bytes(self.extra[start:end]).decode("utf-8")))
+        if self.file_ids[position] != _MISSING:
+            metadata["file"] = self.files[self.file_ids[position]]
+        if self.pages[position] != _MISSING:
+            metadata["page"] = int(self.pages[position])
+        return Document(page_content=self.page_content(position), metadata=metadata)
+
+    def search(self, search: str) -> Union[str, Document]:
+        try:
+            return self.document(int(search))
+        except (ValueError, IndexError):
+            return f"ID {search} not found."
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        for doc_id, doc in texts.items():
+            if doc_id != str(len(self)):
+                raise ValueError("Chunk ids must be appended in position order")
+            self._pending.append(doc)
+
+    def delete(self, ids: List) -> None:
+        raise NotImplementedError("Chunks cannot be deleted from a chunk store")
+
+    def nbytes(self) -> int:
+        """Process memory held by the columns (memory-mapped columns count as none)"""
+        arrays = (self.text, self.offsets, self.file_ids, self.pages, self.extra, self.extra_offsets)
+        size = sum(array.nbytes for array in arrays if not isinstance(array, np.memmap))
+        size += sum(len(file_name) + 64 for file_name in self.files)
+        return size + sum(len(doc.page_content) + 256 for doc in self._pending)
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        store = self._flushed()
+        np.save(path / "text.npy", np.asarray(store.text))
+        np.save(path / "offsets.npy", np.asarray(store.offsets))
+        np.save(path / "file_ids.npy", np.asarray(store.file_ids))
+        np.save(path / "pages.npy", np.asarray(store.pages))
+        np.save(path / "extra.npy", np.asarray(store.extra))
+        np.save(path / "extra_offsets.npy", np.asarray(store.extra_offsets))
+        (path / "files.json").write_text(json.dumps(store.files))
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "ChunkStore":
+        path = Path(path)
+        return cls(
+            _load_array(path / "text.npy", mmap),
+            _load_array(path / "offsets.npy", mmap),
+            json.loads((path / "files.json").read_text()),
+            _load_array(path / "file_ids.npy", mmap),
+            _load_array(path / "pages.npy", mmap),
+            _load_array(path / "extra.npy", mmap),
+            _load_array(path / "extra_offsets.npy", mmap)
+        )
@@ -0,0 +1,178 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from .models import DEFAULT_SYSTEM_PROMPT
+
+
+# Context windows (tokens) of the models in MODEL_OPTIONS
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gemma2-9b-it": 8192,
+    "llama3-8b-8192": 8192,
+    "llama3-70b-8192": 8192,
+    "mixtral-8x7b-32768": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.getenv("DEFAULT_CONTEXT_WINDOW", "8192"))
+# Tokens kept free for the model's answer
+RESPONSE_TOKEN_RESERVE = int(os.getenv("RESPONSE_TOKEN_RESERVE", "1024"))
+# Upper bound on packed context regardless of the window, to bound latency and cost (0 = window only)
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "6000"))
+# Largest share of the context budget chat history may take; documents come first
+CHAT_CONTEXT_SHARE = float(os.getenv("CHAT_CONTEXT_SHARE", "0.25"))
+# Must match the splitter's chunk_overlap in ingest.get_text_chunks
+CHUNK_OVERLAP = 200
+MIN_OVERLAP = 20
+# Partial chunks shorter than this are dropped rather than truncated
+MIN_TRUNCATED_TOKENS = 64
+
+_WINDOW_SUFFIX = re.compile(r"-(\d{4,6})$")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def context_window(model_name: str) -> int:
+    """Context window of a model, from the table or a trailing size such as -8192"""
+    if model_name in MODEL_CONTEXT_WINDOWS:
+        return MODEL_CONTEXT_WINDOWS[model_name]
+    match = _WINDOW_SUFFIX.search(model_name)
+    return int(match.group(1)) if match else DEFAULT_CONTEXT_WINDOW
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a word boundary when possible"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars].rstrip()
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of first that is a prefix of second"""
+    for size in range(min(CHUNK_OVERLAP, len(first), len(second)), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def dedupe_chunks(docs: List[Document]) -> List[Document]:
+    """Drop repeated chunks and strip text shared with an adjacent chunk of the same page
+
+    Neighbouring chunks from the splitter repeat up to CHUNK_OVERLAP
+    characters; the copy in the lower-ranked chunk is removed.
+    """
+    kept: List[Document] = []
+    seen = set()
+    for doc in docs:
+        text = doc.page_content
+        if text in seen:
+            continue
+        seen.add(text)
+
+        page = (doc.metadata.get("file"), doc.metadata.get("page"))
+        for other in kept:
+            if (other.metadata.get("file"), other.metadata.get("page")) != page:
+                continue
+            head = _overlap(other.page_content, text)
+            if head:
+                text = text[head:].lstrip()
+            tail = _overlap(text, other.page_content)
+            if tail:
+                text = text[:-tail].rstrip()
+
+        if text.strip():
+            kept.append(doc if text == doc.page_content else Document(page_content=text, metadata=doc.metadata))
+    return kept
+
+
+@dataclass
+class PackedContext:
+    """Documents and chat history that fit the prompt budget"""
+
+    docs: List[Document]
+    chat_context: str
+    chat_context_sources: List[str]
+    context_tokens: int
+    prompt_tokens: int
+    budget: int
+    dropped_docs: int = 0
+    dropped_turns: int = 0
+
+
+def _fixed_tokens(question: str, system_prompt: Optional[str]) -> int:
+    template = system_prompt if system_prompt is not None else DEFAULT_SYSTEM_PROMPT
+    return estimate_tokens(template) + estimate_tokens(question)
+
+
+def context_budget(model_name: str, question: str, system_prompt: Optional[str] = None) -> int:
+    """Tokens available for document and chat context in one request"""
+    budget = context_window(model_name) - RESPONSE_TOKEN_RESERVE - _fixed_tokens(question, system_prompt)
+    if MAX_CONTEXT_TOKENS > 0:
+        budget = min(budget, MAX_CONTEXT_TOKENS)
+    return max(budget, 0)
+
+
+def pack_context(
+    docs: List[Document],
+    chat_turns: List[str],
+    chat_turn_sources: List[str],
+    model_name: str,
+    question: str,
+    system_prompt: Optional[str] = None,
+    turn_separator: str = "\n\n---\n\n"
+) -> PackedContext:
+    """Fit ranked documents and chat turns into the model's token budget
+
+    Chat turns (most relevant first) may use up to CHAT_CONTEXT_SHARE of the
+    budget; documents, deduplicated and in rank order, fill the rest. The
+    last document that does not fit whole is truncated if enough room is left.
+    """
+    budget = context_budget(model_name, question, system_prompt)
+
+    turns: List[str] = []
+    turn_sources: List[str] = []
+    chat_tokens = 0
+    chat_budget = int(budget * CHAT_CONTEXT_SHARE)
+    for turn, source in zip(chat_turns, chat_turn_sources):
+        tokens = estimate_tokens(turn) + estimate_tokens(turn_separator)
+        if chat_tokens + tokens > chat_budget:
+            continue
+        turns.append(turn)
+        turn_sources.append(source)
+        chat_tokens += tokens
+
+    packed: List[Document] = []
+    doc_tokens = 0
+    doc_budget = budget - chat_tokens
+    unique_docs = dedupe_chunks(docs)
+    for doc in unique_docs:
+        # The stuff chain joins documents with a blank line
+        tokens = estimate_tokens(doc.page_content) + 1
+        remaining = doc_budget - doc_tokens
+        if tokens <= remaining:
+            packed.append(doc)
+            doc_tokens += tokens
+            continue
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            text = truncate_to_tokens(doc.page_content, remaining - 1)
+            packed.append(Document(page_content=text, metadata=doc.metadata))
+            doc_tokens += estimate_tokens(text) + 1
+        break
+
+    context_tokens = doc_tokens + chat_tokens
+    return PackedContext(
+        docs=packed,
+        chat_context=turn_separator.join(turns),
+        chat_context_sources=turn_sources,
+        context_tokens=context_tokens,
+        prompt_tokens=context_tokens + _fixed_tokens(question, system_prompt),
+        budget=budget,
+        dropped_docs=len(docs) - len(packed),
+        dropped_turns=len(chat_turns) - len(turns)
+    )
@@ -0,0 +1,161 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+from pathlib import Path
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from .chunk_store import ChunkStore
+from .embeddings import EMBEDDING_BACKEND, get_embeddings
+from .vector_index import build_vector_store, index_vectors, load_vector_store, save_vector_store
+
+
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "doc_store")
+
+
+def fingerprint_file(path: Union[str, Path]) -> str:
+    """Content hash identifying an uploaded document"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as pdf_file:
+        for block in iter(lambda: pdf_file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_session_manifest(session_id: str) -> Dict:
+    """Read the manifest describing which documents built a session's index"""
+    manifest_path = Path(f"sessions/{session_id}/manifest.json")
+    if not manifest_path.exists():
+        return {"documents": []}
+    return json.loads(manifest_path.read_text())
+
+
+def session_embedding_backend(session_id: str) -> str:
+    """Embedding backend that built a session's index
+
+    Sessions created before backends were recorded were built with Google embeddings.
+    """
+    return read_session_manifest(session_id).get("embedding_backend", "google")
+
+
+def session_documents(session_id: str) -> Set[Tuple[str, str]]:
+    """(backend, fingerprint) of every stored document a session's index uses"""
+    manifest = read_session_manifest(session_id)
+    backend = manifest.get("embedding_backend", "google")
+    return {(backend, document["fingerprint"]) for document in manifest.get("documents", [])}
+
+
+def session_docset_fingerprint(session_id: str) -> str:
+    """Fingerprint of the set of documents (and backend) behind a session's index"""
+    manifest = read_session_manifest(session_id)
+    documents = sorted((document["file"], document["fingerprint"]) for document in manifest.get("documents", []))
+    if not documents:
+        # Without recorded documents the index is unique to this session
+        return f"session:{session_id}"
+    # File names are part of the fingerprint because they appear in answer sources
+    digest = hashlib.sha256(manifest.get("embedding_backend", "google").encode("utf-8"))
+    for file_name, fingerprint in documents:
+        digest.update(f"\0{file_name}\0{fingerprint}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def session_index_generation(session_id: str) -> int:
+    """Generation of a session's current indexes; bumped whenever its documents change"""
+    return read_session_manifest(session_id).get("index_generation", 0)
+
+
+def session_index_path(session_id: str, name: str, generation: Optional[int] = None) -> Path:
+    """Directory of one of a session's indexes ("faiss_index" or "bm25_index")
+
+    Each generation is written to its own directory and the manifest switches
+    readers over, so an index that may be memory-mapped is never rewritten.
+    Generation 0 uses the bare name.
+    """
+    if generation is None:
+        generation = session_index_generation(session_id)
+    return Path(f"sessions/{session_id}") / (name if generation == 0 else f"{name}-{generation}")
+
+
+def write_session_manifest(session_id: str, manifest: Dict) -> None:
+    """Atomically write a session's manifest"""
+    session_dir = Path(f"sessions/{session_id}")
+    session_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = session_dir / "manifest.json.tmp"
+    tmp_path.write_text(json.dumps(manifest))
+    os.replace(tmp_path, session_dir / "manifest.json")
+
+
+class DocumentStore:
+    """Shared store of per-document chunk indexes keyed by embedding backend and content fingerprint"""
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def entry_dir(self, fingerprint: str, backend: str = EMBEDDING_BACKEND) -> Path:
+        return self.root / backend / fingerprint
+
+    def path_for(self, fingerprint: str, backend: str = EMBEDDING_BACKEND) -> Path:
+        return self.entry_dir(fingerprint, backend) / "faiss_index"
+
+    def has(self, fingerprint: str, backend: str = EMBEDDING_BACKEND) -> bool:
+        """Check if a document's chunks are already indexed with a backend"""
+        # Entries without a chunk store were pickled by an older version and are re-ingested
+        return (self.path_for(fingerprint, backend) / "chunks" / "files.json").exists()
+
+    def load(self, fingerprint: str, backend: str = EMBEDDING_BACKEND) -> FAISS:
+        """Load a document's chunk index (memory-mapped and read-only when FAISS_MMAP is set)"""
+        return load_vector_store(self.path_for(fingerprint, backend), get_embeddings(backend))
+
+    def save(self, fingerprint: str, vector_store: FAISS, backend: str = EMBEDDING_BACKEND) -> None:
+        """Store a document's chunk index; the first writer wins on concurrent saves"""
+        if self.has(fingerprint, backend):
+            return
+
+        staging = self.root / backend / f".staging-{uuid.uuid4().hex}"
+        save_vector_store(vector_store, staging / "faiss_index")
+        target = self.entry_dir(fingerprint, backend)
+        if target.exists() and not self.has(fingerprint, backend):
+            # Entry in the pickled format of an older version
+            shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another ingest stored the same document first
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def entries(self) -> Iterator[Tuple[str, str]]:
+        """(backend, fingerprint) of every stored document"""
+        if not self.root.is_dir():
+            return
+        for backend_dir in self.root.iterdir():
+            if backend_dir.is_dir():
+                for entry in backend_dir.iterdir():
+                    if entry.is_dir() and not entry.name.startswith("."):
+                        yield backend_dir.name, entry.name
+
+    def delete(self, fingerprint: str, backend: str = EMBEDDING_BACKEND) -> None:
+        """Remove a stored document; callers make sure no session uses it"""
+        shutil.rmtree(self.entry_dir(fingerprint, backend), ignore_errors=True)
+
+    def assemble(self, documents: List[dict], backend: str = EMBEDDING_BACKEND) -> FAISS:
+        """Build one index for a session from the stored document indexes
+
+        documents is a list of {"file", "fingerprint"} in session order; chunk
+        metadata is relabelled with the file name used in this session. The
+        index type is chosen for the combined chunk count (see FAISS_INDEX_TYPE).
+        """
+        stores = [self.load(document["fingerprint"], backend) for document in documents]
+        chunks = ChunkStore.concat(
+            [stored.docstore for stored in stores],
+            [document["file"] for document in documents]
+        )
+        vectors = np.concatenate([index_vectors(stored.index) for stored in stores])
+        return build_vector_store(chunks, vectors, get_embeddings(backend))
+
+
+# Global document store instance
+document_store = DocumentStore(DOCUMENT_STORE_DIR)
@@ -0,0 +1,215 @@
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+from pathlib import Path
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """Persistent, size-bounded cache of embedding vectors for one model
+
+    Vectors live in a memory-mapped float32 matrix (``vectors.f32``); an
+    SQLite table maps each content key to its row and last-use time. When the
+    cache is full the least recently used rows are reused. Lookups only note
+    use times in memory; they are written in batches, and always before rows
+    are chosen for eviction.
+    """
+
+    MIN_CAPACITY = 1024
+    # Pending use times are written once this many keys or seconds accumulate
+    TOUCH_FLUSH_ENTRIES = 256
+    TOUCH_FLUSH_SECONDS = 30.0
+
+    def __init__(self, directory: Path, max_entries: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.vectors_path = self.directory / "vectors.f32"
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.directory / "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, row INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self._matrix: Optional[np.memmap] = None
+        self._touched: Dict[str, float] = {}
+        self._touched_since = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(kind: str, text: str) -> str:
+        """Content key for a text embedded as a document or a query"""
+        return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _dimension(self) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+        return row[0] if row else None
+
+    def _set_dimension(self, dimension: int) -> None:
+        """Record the vector size on first store; another process may get there first"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dimension', ?)", (dimension,))
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        stored = self._dimension()
+        if stored != dimension:
+            raise ValueError(f"Embedding cache holds {stored}-dimensional vectors, got {dimension}")
+
+    def _write_touches(self) -> None:
+        """Write pending use times; the caller holds a write transaction"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(last_used, key) for key, last_used in self._touched.items()]
+            )
+            self._touched = {}
+        self._touched_since = time.monotonic()
+
+    def flush(self) -> None:
+        """Write pending use times now"""
+        with self._lock:
+            if not self._touched:
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_touches()
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def _open_matrix(self, min_rows: int = 0) -> Optional[np.memmap]:
+        """Map the vector file, growing it to hold at least min_rows rows"""
+        dimension = self._dimension()
+        if dimension is None:
+            return None
+
+        row_bytes = dimension * 4
+        current_rows = self.vectors_path.stat().st_size // row_bytes if self.vectors_path.exists() else 0
+        if min_rows > current_rows:
+            new_rows = min(max(min_rows, current_rows * 2, self.MIN_CAPACITY), self.max_entries)
+            with open(self.vectors_path, "ab") as vectors_file:
+                vectors_file.truncate(new_rows * row_bytes)
+            current_rows = new_rows
+            self._matrix = None
+
+        if self._matrix is None or self._matrix.shape[0] != current_rows:
+            if current_rows == 0:
+                return None
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(current_rows, dimension))
+        return self._matrix
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Look up cached vectors; missing keys are absent from the result"""
+        if not keys:
+            return {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            rows: Dict[str, int] = {}
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, row in self._conn.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+                ):
+                    rows[key] = row
+
+            found: Dict[str, np.ndarray] = {}
+            if rows:
+                matrix = self._open_matrix(max(rows.values()) + 1)
+                for key, row in rows.items():
+                    found[key] = np.array(matrix[row])
+                now = time.time()
+                self._touched.update((key, now) for key in rows)
+                if (
+                    len(self._touched) >= self.TOUCH_FLUSH_ENTRIES
+                    or time.monotonic() - self._touched_since >= self.TOUCH_FLUSH_SECONDS
+                ):
+                    self.flush()
+
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+            return found
+
+    def put_many(self, items: Sequence[Tuple[str, Sequence[float]]]) -> None:
+        """Store vectors, evicting least recently used entries when full"""
+        if not items or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            items = list(dict(items).items())
+            dimension = len(items[0][1])
+            if self._dimension() is None:
+                self._set_dimension(dimension)
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Eviction below picks victims by use time
+                self._write_touches()
+                existing = {
+                    key: row for key, row in self._conn.execute(
+                        f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(items))})",
+                        [key for key, _ in items]
+                    )
+                }
+                new_items = [(key, vector) for key, vector in items if key not in existing]
+                count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+                free_rows = list(range(count, min(count + len(new_items), self.max_entries)))
+                shortfall = len(new_items) - len(free_rows)
+                if shortfall > 0:
+                    victims = self._conn.execute(
+                        "SELECT key, row FROM entries ORDER BY last_used LIMIT ?", (shortfall,)
+                    ).fetchall()
+                    self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+                    free_rows.extend(row for _, row in victims)
+                    self.evictions += len(victims)
+
+                # More new vectors than the whole cache holds: keep the last ones
+                new_items = new_items[len(new_items) - len(free_rows):]
+                assignments = list(zip(new_items, free_rows)) + [
+                    ((key, vector), existing[key]) for key, vector in items if key in existing
+                ]
+
+                matrix = self._open_matrix(max(row for _, row in assignments) + 1)
+                for (_, vector), row in assignments:
+                    matrix[row] = np.asarray(vector, dtype=np.float32)
+                matrix.flush()
+
+                now = time.time()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                    [(key, row, now) for (key, _), row in assignments]
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def stats(self) -> Dict:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "bytes": self.vectors_path.stat().st_size if self.vectors_path.exists() else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,137 @@
+import os
+import time
+import random
+import shutil
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+EMBED_RETRY_BASE_DELAY = float(os.getenv("EMBED_RETRY_BASE_DELAY", "1.0"))
+EMBED_RETRY_MAX_DELAY = float(os.getenv("EMBED_RETRY_MAX_DELAY", "60.0"))
+EMBED_CHECKPOINT_DIR = os.getenv("EMBED_CHECKPOINT_DIR", "cache/embed_checkpoints")
+
+T = TypeVar("T")
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Whether an embedding error is a rate limit or transient failure worth retrying"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    name = type(error).__name__
+    if "ResourceExhausted" in name or "RateLimit" in name or "ServiceUnavailable" in name:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "resource exhausted" in message or "quota" in message
+
+
+class BatchEmbedder:
+    """Embeds texts in fixed-size batches with bounded concurrency, backoff and checkpoints
+
+    Up to max_in_flight batches are sent at once. Rate-limit and transient
+    errors are retried with exponential backoff and jitter. Batches that come
+    with a checkpoint file are saved there once embedded, so a later run over
+    the same texts only embeds the batches that are missing.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+        max_retries: int = EMBED_MAX_RETRIES,
+        base_delay: float = EMBED_RETRY_BASE_DELAY,
+        max_delay: float = EMBED_RETRY_MAX_DELAY,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.retries = 0
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                return self.embeddings.embed_documents(batch)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                self.sleep(delay * random.uniform(0.5, 1.0))
+                attempt += 1
+                self.retries += 1
+
+    def _save_batch(self, batch_path: Path, vectors: np.ndarray) -> None:
+        batch_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = batch_path.with_suffix(".tmp.npy")
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, batch_path)
+
+    def embed_batches(
+        self,
+        batches: Iterable[Tuple[List[T], Optional[Path]]],
+        text: Callable[[T], str],
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> Iterator[Tuple[List[T], np.ndarray]]:
+        """Embed a stream of (items, checkpoint file) batches, yielding (items, float32 vectors) in order
+
+        A batch whose checkpoint file exists is loaded instead of embedded, and
+        every embedded batch is saved to its file. At most max_in_flight
+        batches are read ahead of the one being yielded, so memory depends on
+        the batch size rather than on the length of the stream. The total
+        passed to progress is None until the stream ends.
+        """
+        in_flight: "deque[Tuple[List[T], Optional[Path], Future]]" = deque()
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embed") as executor:
+            def submit(items: List[T], batch_path: Optional[Path]) -> None:
+                if batch_path is not None and batch_path.exists():
+                    future: Future = Future()
+                    future.set_result(np.load(batch_path))
+                else:
+                    future = executor.submit(self._embed_batch, [text(item) for item in items])
+                in_flight.append((items, batch_path, future))
+
+            def finish() -> Tuple[List[T], np.ndarray]:
+                nonlocal done
+                items, batch_path, future = in_flight.popleft()
+                vectors = np.asarray(future.result(), dtype=np.float32)
+                if batch_path is not None and not batch_path.exists():
+                    self._save_batch(batch_path, vectors)
+                done += len(items)
+                if progress is not None:
+                    progress(done, None)
+                return items, vectors
+
+            try:
+                for items, batch_path in batches:
+                    submit(items, batch_path)
+                    if len(in_flight) >= self.max_in_flight:
+                        yield finish()
+                while in_flight:
+                    yield finish()
+            finally:
+                for _, _, future in in_flight:
+                    future.cancel()
+
+        if progress is not None:
+            progress(done, done)
+
+    @staticmethod
+    def clear_checkpoint(checkpoint_dir: Path) -> None:
+        """Remove a checkpoint once its vectors are safely stored"""
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
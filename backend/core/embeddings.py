@@ -0,0 +1,144 @@
+import os
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from .embedding_cache import EmbeddingCache
+from .executors import io_executor, run_blocking
+from .local_embeddings import HashingEmbeddings
+from .fakes import FakeEmbeddings
+
+
+EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "google")
+HASHING_EMBEDDING_SIZE = int(os.getenv("HASHING_EMBEDDING_SIZE", "768"))
+# Seconds added to every call of the "fake" backend, to simulate a remote provider
+FAKE_EMBEDDING_LATENCY = float(os.getenv("FAKE_EMBEDDING_LATENCY", "0"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "cache/embeddings")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from the shared embedding cache
+
+    The async methods do their cache reads and writes on the io executor, so
+    disk access never blocks the event loop.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def _split(self, kind: str, texts: List[str]):
+        keys = [self.cache.make_key(kind, text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in cached))
+        return keys, cached, missing
+
+    def _merge(self, kind: str, keys, cached, missing, vectors) -> List[List[float]]:
+        fresh = {self.cache.make_key(kind, text): vector for text, vector in zip(missing, vectors)}
+        self.cache.put_many(list(fresh.items()))
+        return [list(map(float, cached[key])) if key in cached else list(fresh[key]) for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = self._split("document", texts)
+        vectors = self.embeddings.embed_documents(missing) if missing else []
+        return self._merge("document", keys, cached, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, cached, missing = self._split("query", [text])
+        vectors = [self.embeddings.embed_query(text)] if missing else []
+        return self._merge("query", keys, cached, missing, vectors)[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = await run_blocking(io_executor, self._split, "document", texts)
+        vectors = await self.embeddings.aembed_documents(missing) if missing else []
+        return await run_blocking(io_executor, self._merge, "document", keys, cached, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, cached, missing = await run_blocking(io_executor, self._split, "query", [text])
+        vectors = [await self.embeddings.aembed_query(text)] if missing else []
+        return (await run_blocking(io_executor, self._merge, "query", keys, cached, missing, vectors))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = await run_blocking(io_executor, self._split, "query", texts)
+        vectors = await _aembed_query_batch(self.embeddings, missing) if missing else []
+        return await run_blocking(io_executor, self._merge, "query", keys, cached, missing, vectors)
+
+
+# Embedding backends by name. "cache" marks backends worth fronting with the
+# persistent embedding cache (remote ones); local backends are cheaper to recompute.
+EMBEDDING_BACKENDS: Dict[str, Dict] = {
+    "google": {
+        "factory": lambda: GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL),
+        "cache": True
+    },
+    "hashing": {
+        "factory": lambda: HashingEmbeddings(size=HASHING_EMBEDDING_SIZE),
+        "cache": False
+    },
+    # Deterministic random vectors for offline tests and benchmarks
+    "fake": {
+        "factory": lambda: FakeEmbeddings(size=HASHING_EMBEDDING_SIZE, latency=FAKE_EMBEDDING_LATENCY),
+        "cache": False
+    },
+}
+
+_embeddings: Dict[str, Embeddings] = {}
+_embeddings_lock = threading.Lock()
+
+
+def register_embedding_backend(name: str, factory: Callable[[], Embeddings], cache: bool = False) -> None:
+    """Register an embedding backend selectable through EMBEDDING_BACKEND"""
+    with _embeddings_lock:
+        EMBEDDING_BACKENDS[name] = {"factory": factory, "cache": cache}
+        _embeddings.pop(name, None)
+
+
+def get_embeddings(backend: Optional[str] = None) -> Embeddings:
+    """Get the shared embeddings client for a backend (the configured one by default)"""
+    backend = backend or EMBEDDING_BACKEND
+    with _embeddings_lock:
+        if backend not in _embeddings:
+            if backend not in EMBEDDING_BACKENDS:
+                raise ValueError(f"Unknown embedding backend: {backend}")
+            config = EMBEDDING_BACKENDS[backend]
+            embeddings = config["factory"]()
+            if config["cache"] and EMBEDDING_CACHE_MAX_ENTRIES > 0:
+                cache = EmbeddingCache(Path(EMBEDDING_CACHE_DIR) / backend, EMBEDDING_CACHE_MAX_ENTRIES)
+                embeddings = CachedEmbeddings(embeddings, cache)
+            _embeddings[backend] = embeddings
+        return _embeddings[backend]
+
+
+async def _aembed_query_batch(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    # Google's batch endpoint embeds documents unless told the texts are queries
+    if isinstance(embeddings, GoogleGenerativeAIEmbeddings):
+        return await embeddings.aembed_documents(texts, task_type="retrieval_query")
+    return list(await asyncio.gather(*(embeddings.aembed_query(text) for text in texts)))
+
+
+async def aembed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed several questions as queries, in one batched call where the backend has one
+
+    Google embeddings use the batch endpoint with the query task type; other
+    backends embed each question with aembed_query. Cached embeddings look
+    up and store the vectors as queries.
+    """
+    if isinstance(embeddings, CachedEmbeddings):
+        return await embeddings.aembed_queries(texts)
+    return await _aembed_query_batch(embeddings, texts)
+
+
+def embedding_cache_stats() -> Dict[str, Dict]:
+    """Get embedding cache counters per backend"""
+    with _embeddings_lock:
+        return {
+            backend: embeddings.cache.stats()
+            for backend, embeddings in _embeddings.items()
+            if isinstance(embeddings, CachedEmbeddings)
+        }
@@ -0,0 +1,56 @@
+import os
+import asyncio
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# Bounded pools for blocking work so async request handlers never stall the event loop.
+# Ingest (PDF parsing, chunking, index builds) is heavy and kept small; index loads,
+# searches and history writes are short and get a wider pool.
+ingest_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INGEST_WORKERS", "2")),
+    thread_name_prefix="ingest"
+)
+io_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IO_WORKERS", "8")),
+    thread_name_prefix="index-io"
+)
+
+# CPU-bound PDF text extraction runs in worker processes, created on first use.
+# Spawned rather than forked since the parent process is multithreaded.
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+_extract_executor: Optional[ProcessPoolExecutor] = None
+_extract_executor_lock = threading.Lock()
+
+
+def get_extract_executor() -> Optional[ProcessPoolExecutor]:
+    """Get the shared extraction process pool, or None when extraction runs inline"""
+    global _extract_executor
+    if EXTRACT_WORKERS <= 1:
+        return None
+    with _extract_executor_lock:
+        if _extract_executor is None:
+            _extract_executor = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _extract_executor
+
+
+async def run_blocking(executor: Executor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable on an executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """Stop accepting work and wait for running tasks to finish"""
+    ingest_executor.shutdown(wait=True)
+    io_executor.shutdown(wait=True)
+    if _extract_executor is not None:
+        _extract_executor.shutdown(wait=True)
@@ -0,0 +1,117 @@
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeRateLimitError(Exception):
+    """Stand-in for a provider's 429 response"""
+
+    status_code = 429
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic local embedder for tests and benchmarks
+
+    Vectors are derived from a hash of the text. Optional latency is added to
+    every call, and errors can be injected either for the first
+    fail_first_calls calls or at random with probability error_rate.
+    """
+
+    def __init__(
+        self,
+        size: int = 768,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        fail_first_calls: int = 0,
+        error_factory=lambda: FakeRateLimitError("429 Resource exhausted"),
+        seed: Optional[int] = None
+    ):
+        self.size = size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_first_calls = fail_first_calls
+        self.error_factory = error_factory
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def _call(self, count: int) -> None:
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_first_calls or self._random.random() < self.error_rate
+            if not fail:
+                self.texts_embedded += count
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise self.error_factory()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._call(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._call(1)
+        return self._vector(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model for benchmarks
+
+    The answer is answer_tokens words chosen from a hash of the prompt.
+    first_token_latency is spent before the first token and token_latency
+    before each later one, with asyncio.sleep on the async paths so
+    concurrent requests overlap like real network calls.
+    """
+
+    answer_tokens: int = 40
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        words = prompt.split() or ["answer"]
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        return [rng.choice(words) + " " for _ in range(self.answer_tokens)]
+
+    def _delay(self, index: int) -> float:
+        return self.first_token_latency if index == 0 else self.token_latency
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(sum(self._delay(index) for index in range(len(tokens))))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens).strip()))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(sum(self._delay(index) for index in range(len(tokens))))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens).strip()))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for index, token in enumerate(self._tokens(messages)):
+            time.sleep(self._delay(index))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for index, token in enumerate(self._tokens(messages)):
+            await asyncio.sleep(self._delay(index))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Union
+
+from langchain_community.vectorstores import FAISS
+
+
+def estimate_index_bytes(vector_store: FAISS) -> int:
+    """Rough memory footprint of a loaded FAISS vector store"""
+    if hasattr(vector_store, "nbytes"):
+        return vector_store.nbytes()
+    index = vector_store.index
+    # Memory-mapped indexes live in the page cache, not in process memory
+    size = 0 if getattr(vector_store, "mmapped", False) else index.ntotal * index.d * 4
+    if hasattr(vector_store.docstore, "nbytes"):
+        return size + vector_store.docstore.nbytes()
+    docstore = getattr(vector_store.docstore, "_dict", {})
+    for doc in docstore.values():
+        size += len(doc.page_content) + 256
+    return size
+
+
+class IndexCache:
+    """Process-wide LRU cache of loaded FAISS indexes keyed by their on-disk path"""
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, FAISS]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> str:
+        return str(Path(path))
+
+    def get(self, path: Union[str, Path], loader: Callable[[], FAISS]) -> FAISS:
+        """Return the cached index for path, loading it with loader on a miss"""
+        key = self._key(path)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        vector_store = loader()
+        self.put(path, vector_store)
+        return vector_store
+
+    def put(self, path: Union[str, Path], vector_store: FAISS) -> None:
+        """Insert or replace the cached index for path"""
+        key = self._key(path)
+        size = estimate_index_bytes(vector_store)
+        with self._lock:
+            self._entries[key] = vector_store
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._evict()
+
+    def resize(self, path: Union[str, Path]) -> None:
+        """Recompute the size of an entry that was modified in place"""
+        key = self._key(path)
+        with self._lock:
+            if key in self._entries:
+                self._sizes[key] = estimate_index_bytes(self._entries[key])
+                self._evict()
+
+    def invalidate(self, path: Union[str, Path]) -> None:
+        """Drop the cached index for path"""
+        key = self._key(path)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._sizes.pop(key, None)
+
+    def invalidate_session(self, session_id: str) -> None:
+        """Drop every cached index that belongs to a session"""
+        session_dir = Path(f"sessions/{session_id}")
+        with self._lock:
+            for key in list(self._entries):
+                if session_dir in Path(key).parents:
+                    self._entries.pop(key, None)
+                    self._sizes.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all cached indexes"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+    def _evict(self) -> None:
+        # Keep the most recently used entry even if it alone exceeds the byte budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or sum(self._sizes.values()) > self.max_bytes
+        ):
+            key, _ = self._entries.popitem(last=False)
+            self._sizes.pop(key, None)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(self._sizes.values()),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Global index cache instance
+index_cache = IndexCache(
+    max_entries=int(os.getenv("INDEX_CACHE_MAX_ENTRIES", "32")),
+    max_bytes=int(os.getenv("INDEX_CACHE_MAX_MB", "512")) * 1024 * 1024,
+)
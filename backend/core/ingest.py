@@ -1,77 +1,638 @@
 import os
-import tempfile
-from typing import List
+import time
+import queue
+import shutil
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
 from pathlib import Path
+import numpy as np
 from PyPDF2 import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-
-
-def get_pdf_text(pdf_files):
-    """Extract text from PDF files"""
-    text = ""
-    file_page_mapping = []
-    
-    for pdf_file in pdf_files:
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(pdf_file.file.read())
-            tmp_file.flush()
-            
-            pdf_reader = PdfReader(tmp_file.name)
-            file_name = pdf_file.filename
-            
-            for page_num, page in enumerate(pdf_reader.pages, start=1):
-                page_text = page.extract_text()
-                text += page_text
-                file_page_mapping.append({
-                    "text": page_text,
-                    "file": file_name,
-                    "page": page_num
-                })
-        
-        # Clean up temporary file
-        os.unlink(tmp_file.name)
-    
+
+from .executors import EXTRACT_WORKERS, get_extract_executor
+from .embeddings import EMBEDDING_BACKEND, get_embeddings
+from .embedding_pipeline import EMBED_CHECKPOINT_DIR, BatchEmbedder
+from .chunk_store import ChunkStore
+from .index_cache import index_cache
+from .sparse_index import BM25Index
+from .document_store import (
+    document_store,
+    fingerprint_file,
+    read_session_manifest,
+    session_index_generation,
+    session_index_path,
+    write_session_manifest
+)
+from .metrics import INGEST_CHUNKS, INGEST_PAGES, StageTimer, ingest_timer
+from .vector_index import (
+    build_index,
+    chunk_store_of,
+    fits_corpus,
+    index_type_of,
+    index_vectors,
+    load_vector_store,
+    remove_range,
+    save_vector_store,
+    vector_store_from_index
+)
+
+
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Page ranges submitted for extraction ahead of the range being chunked
+PDF_TASKS_IN_FLIGHT = int(os.getenv("PDF_TASKS_IN_FLIGHT", str(2 * EXTRACT_WORKERS)))
+# Chunk batches buffered between splitting and embedding
+INGEST_QUEUE_BATCHES = int(os.getenv("INGEST_QUEUE_BATCHES", "4"))
+
+T = TypeVar("T")
+
+# Progress callback: (stage, done, total)
+ProgressCallback = Callable[[str, int, Optional[int]], None]
+
+# Serializes changes to one session's documents within this process
+_document_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+_document_locks_guard = threading.Lock()
+
+
+def _report(progress: Optional[ProgressCallback], stage: str, done: int, total: Optional[int] = None) -> None:
+    if progress is not None:
+        progress(stage, done, total)
+
+
+def save_uploads(files, session_id: str) -> List[Path]:
+    """Persist uploaded files under the session directory"""
+    upload_dir = Path(f"sessions/{session_id}/uploads")
+    upload_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for upload in files:
+        path = upload_dir / Path(upload.filename).name
+        with open(path, "wb") as out:
+            shutil.copyfileobj(upload.file, out)
+        paths.append(path)
+    return paths
+
+
+def _extract_page_range(pdf_file: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) from one PDF; runs in a worker process"""
+    pdf_reader = PdfReader(pdf_file)
+    return [pdf_reader.pages[index].extract_text() for index in range(start, end)]
+
+
+def _in_order(executor: Executor, fn: Callable[..., T], tasks: Iterable[tuple], in_flight: int) -> Iterator[T]:
+    """Results of fn(*task) in task order, with at most in_flight tasks submitted at once"""
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(executor.submit(fn, *task))
+            if len(pending) >= max(1, in_flight):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_pdf_pages(pdf_files: List[Union[str, Path]], progress: Optional[ProgressCallback] = None) -> Iterator[Dict]:
+    """Extract PDF pages as {"text", "file", "page"} items, in file and page order
+
+    Files are split into page ranges of PDF_PAGES_PER_TASK pages which are
+    extracted in parallel on the extraction process pool. At most
+    PDF_TASKS_IN_FLIGHT ranges are extracted ahead of the consumer, so only
+    their text is held at once.
+    """
+    pdf_files = [str(pdf_file) for pdf_file in pdf_files]
+    page_counts = [len(PdfReader(pdf_file).pages) for pdf_file in pdf_files]
+    total_pages = sum(page_counts)
+    _report(progress, "extract", 0, total_pages)
+
+    tasks = [
+        (pdf_file, start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for pdf_file, page_count in zip(pdf_files, page_counts)
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+    executor = get_extract_executor()
+    if executor is None or len(tasks) <= 1:
+        ranges = (_extract_page_range(*task) for task in tasks)
+    else:
+        ranges = _in_order(executor, _extract_page_range, tasks, PDF_TASKS_IN_FLIGHT)
+
+    pages_done = 0
+    for (pdf_file, start, _), page_texts in zip(tasks, ranges):
+        pages_done += len(page_texts)
+        INGEST_PAGES.inc(len(page_texts))
+        _report(progress, "extract", pages_done, total_pages)
+        file_name = Path(pdf_file).name
+        for page_num, page_text in enumerate(page_texts, start=start + 1):
+            yield {"text": page_text, "file": file_name, "page": page_num}
+
+
+def get_pdf_text(pdf_files: List[Union[str, Path]], progress: Optional[ProgressCallback] = None):
+    """Extract text from PDF files
+
+    Returns the text of every page and file_page_mapping, in file and page
+    order. Everything is held in memory; ingestion streams iter_pdf_pages.
+    """
+    file_page_mapping = list(iter_pdf_pages(pdf_files, progress))
+    text = "".join(page["text"] for page in file_page_mapping)
     return text, file_page_mapping
 
 
-def get_text_chunks(file_page_mapping):
-    """Split text into chunks"""
+def iter_text_chunks(
+    pages: Iterable[Dict],
+    progress: Optional[ProgressCallback] = None,
+    timer: Optional[StageTimer] = None
+) -> Iterator[Dict]:
+    """Split pages into {"text", "file", "page"} chunks as the pages arrive"""
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = []
-    
-    for item in file_page_mapping:
+    chunks_done = 0
+    seconds = 0.0
+
+    for item in pages:
+        started = time.perf_counter()
         chunk_items = text_splitter.split_text(item["text"])
+        seconds += time.perf_counter() - started
         for chunk in chunk_items:
-            chunks.append({
+            yield {
                 "text": chunk,
                 "file": item["file"],
                 "page": item["page"]
-            })
-    return chunks
-
-
-def get_vector_store(text_chunks, session_id):
-    """Create and save vector store"""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    texts = [chunk["text"] for chunk in text_chunks]
-    metadatas = [{"file": chunk["file"], "page": chunk["page"]} for chunk in text_chunks]
-    
-    vector_store = FAISS.from_texts(texts, embedding=embeddings, metadatas=metadatas)
-    
-    # Create session directory
+            }
+        chunks_done += len(chunk_items)
+        _report(progress, "split", chunks_done)
+
+    if timer is not None:
+        timer.record("split", seconds)
+    _report(progress, "split", chunks_done, chunks_done)
+
+
+def get_text_chunks(file_page_mapping, progress: Optional[ProgressCallback] = None):
+    """Split text into chunks"""
+    return list(iter_text_chunks(file_page_mapping, progress))
+
+
+def _timed(items: Iterable[T], timer: StageTimer, stage: str) -> Iterator[T]:
+    """Pass items through, recording the time spent waiting for them as one stage"""
+    iterator = iter(items)
+    seconds = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - started
+            yield item
+    finally:
+        timer.record(stage, seconds)
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def _prefetched(items: Iterable[T], max_items: int) -> Iterator[T]:
+    """Iterate items produced on a background thread, at most max_items ahead of the consumer"""
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, max_items))
+    stopped = threading.Event()
+    end = object()
+
+    def put(entry) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((end, e))
+            return
+        put((end, None))
+
+    threading.Thread(target=produce, name="ingest-prefetch", daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+def _document_batches(
+    chunks: Iterable[Dict],
+    fingerprints: Dict[str, str],
+    batch_size: int,
+    checkpoint_root: Path
+) -> Iterator[Tuple[List[Dict], Path]]:
+    """Cut chunks into embedding batches that never span two documents
+
+    Batch i of a document is checkpointed under the document's fingerprint,
+    so a retried job reuses it whichever other documents it ingests.
+    """
+    batch: List[Dict] = []
+    batch_index = 0
+    for chunk in chunks:
+        if batch and (chunk["file"] != batch[0]["file"] or len(batch) >= batch_size):
+            yield batch, checkpoint_root / fingerprints[batch[0]["file"]] / f"batch-{batch_index:06d}.npy"
+            batch_index = batch_index + 1 if chunk["file"] == batch[0]["file"] else 0
+            batch = []
+        batch.append(chunk)
+    if batch:
+        yield batch, checkpoint_root / fingerprints[batch[0]["file"]] / f"batch-{batch_index:06d}.npy"
+
+
+def _chunk_document(chunk: Dict) -> Document:
+    return Document(page_content=chunk["text"], metadata={"file": chunk["file"], "page": chunk["page"]})
+
+
+class _DocumentIndexBuilder:
+    """Adds one document's embedded chunk batches to a flat index and chunk columns as they arrive"""
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.index = None
+        self.stores: List[ChunkStore] = []
+        self.seconds = 0.0
+
+    def add(self, chunks: List[Dict], vectors) -> None:
+        started = time.perf_counter()
+        # Stored documents stay flat so session assembly can reconstruct their vectors
+        if self.index is None:
+            self.index = build_index(vectors, "flat")
+        else:
+            self.index.add(vectors)
+        self.stores.append(ChunkStore.from_documents([_chunk_document(chunk) for chunk in chunks]))
+        self.seconds += time.perf_counter() - started
+
+    def build(self) -> FAISS:
+        return vector_store_from_index(self.index, ChunkStore.concat(self.stores), get_embeddings())
+
+
+def save_session_index(
+    vector_store: FAISS,
+    session_id: str,
+    generation: int = 0,
+    sparse_index: Optional[BM25Index] = None
+) -> Path:
+    """Save a session's dense and sparse document indexes and refresh the index cache
+
+    The sparse index is built from the chunks unless one is given.
+    """
+    index_path = session_index_path(session_id, "faiss_index", generation)
+    sparse_path = session_index_path(session_id, "bm25_index", generation)
+    # Left over from an interrupted rebuild; no reader has been switched to it
+    for path in (index_path, sparse_path):
+        if generation > 0 and path.exists():
+            shutil.rmtree(path)
+
+    save_vector_store(vector_store, index_path)
+    index_cache.put(index_path, vector_store)
+
+    # Sparse index over the same chunks, addressed by FAISS position
+    if sparse_index is None:
+        sparse_index = BM25Index.build(list(chunk_store_of(vector_store).texts()))
+    sparse_index.save(sparse_path)
+    index_cache.put(sparse_path, sparse_index)
+    return index_path
+
+
+def _prune_index_generations(session_id: str, generation: int) -> None:
+    """Uncache superseded index generations and delete all but the previous one
+
+    The previous generation stays on disk for requests in other workers that
+    read the manifest just before it changed.
+    """
     session_dir = Path(f"sessions/{session_id}")
-    session_dir.mkdir(parents=True, exist_ok=True)
-    
-    vector_store.save_local(str(session_dir / "faiss_index"))
+    for name in ("faiss_index", "bm25_index"):
+        for path in session_dir.glob(f"{name}*"):
+            suffix = path.name[len(name):]
+            if suffix and not (suffix.startswith("-") and suffix[1:].isdigit()):
+                continue
+            old_generation = int(suffix[1:]) if suffix else 0
+            if old_generation < generation:
+                index_cache.invalidate(path)
+            if old_generation < generation - 1:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def find_reused_files(pdf_files: List[Union[str, Path]]) -> List[str]:
+    """Names of files whose content is already in the document store"""
+    return [
+        Path(pdf_file).name for pdf_file in pdf_files
+        if document_store.has(fingerprint_file(pdf_file))
+    ]
+
+
+def store_pdf_files(
+    pdf_files,
+    progress: Optional[ProgressCallback] = None,
+    timer: Optional[StageTimer] = None
+) -> List[Dict]:
+    """Add PDFs to the document store, extracting and embedding only unseen content
+
+    Returns {"file", "fingerprint"} for every file that has text, in the
+    order given.
+    """
+    timer = timer or ingest_timer()
+    documents = [
+        {"file": Path(pdf_file).name, "fingerprint": fingerprint_file(pdf_file), "path": pdf_file}
+        for pdf_file in pdf_files
+    ]
+    new_documents = list({
+        document["fingerprint"]: document
+        for document in documents
+        if not document_store.has(document["fingerprint"])
+    }.values())
+
+    if new_documents:
+        fingerprints = {document["file"]: document["fingerprint"] for document in new_documents}
+        embedder = BatchEmbedder(get_embeddings())
+        # Completed batches are checkpointed so a retried job resumes where it stopped
+        checkpoint_root = Path(EMBED_CHECKPOINT_DIR) / EMBEDDING_BACKEND / f"stream-{embedder.batch_size}"
+
+        # Extraction and splitting run on a background thread at most
+        # INGEST_QUEUE_BATCHES batches ahead of embedding, and each document's
+        # index is built batch by batch, so memory depends on the batch size
+        # rather than on document size. Stages overlap, so a stage's time is
+        # the time spent in it or waiting for the stage before it.
+        pages = _timed(iter_pdf_pages([document["path"] for document in new_documents], progress), timer, "extract")
+        batches = _prefetched(
+            _document_batches(iter_text_chunks(pages, progress, timer), fingerprints, embedder.batch_size, checkpoint_root),
+            INGEST_QUEUE_BATCHES
+        )
+        embedded = _timed(
+            embedder.embed_batches(
+                batches,
+                lambda chunk: chunk["text"],
+                lambda done, total: _report(progress, "embed", done, total)
+            ),
+            timer,
+            "embed"
+        )
+
+        def store(builder: _DocumentIndexBuilder) -> None:
+            timer.record("index", builder.seconds)
+            with timer.stage("save"):
+                document_store.save(builder.fingerprint, builder.build())
+            BatchEmbedder.clear_checkpoint(checkpoint_root / builder.fingerprint)
+
+        builder = None
+        try:
+            for chunks, vectors in embedded:
+                INGEST_CHUNKS.inc(len(chunks))
+                fingerprint = fingerprints[chunks[0]["file"]]
+                if builder is not None and builder.fingerprint != fingerprint:
+                    store(builder)
+                    builder = None
+                builder = builder or _DocumentIndexBuilder(fingerprint)
+                builder.add(chunks, vectors)
+            if builder is not None:
+                store(builder)
+        finally:
+            embedded.close()
+            batches.close()
+    else:
+        _report(progress, "extract", 0, 0)
+        _report(progress, "split", 0, 0)
+        _report(progress, "embed", 0, 0)
+
+    return [
+        {"file": document["file"], "fingerprint": document["fingerprint"]}
+        for document in documents
+        if document_store.has(document["fingerprint"])
+    ]
+
+
+def _next_index_generation(session_id: str) -> int:
+    previous = session_index_generation(session_id)
+    return previous + 1 if session_index_path(session_id, "faiss_index", previous).exists() else previous
+
+
+def _publish_session_index(
+    session_id: str,
+    vector_store: FAISS,
+    sparse_index: Optional[BM25Index],
+    documents: List[Dict],
+    backend: str,
+    timer: StageTimer
+) -> None:
+    """Save indexes as the session's next generation and switch the manifest to them"""
+    generation = _next_index_generation(session_id)
+    with timer.stage("save"):
+        save_session_index(vector_store, session_id, generation, sparse_index)
+        write_session_manifest(session_id, {
+            "documents": documents,
+            "embedding_backend": backend,
+            "index_generation": generation
+        })
+    _prune_index_generations(session_id, generation)
+
+
+def build_session_index(
+    session_id: str,
+    documents: List[Dict],
+    progress: Optional[ProgressCallback] = None,
+    timer: Optional[StageTimer] = None,
+    backend: str = EMBEDDING_BACKEND
+) -> FAISS:
+    """Assemble a session's indexes from stored documents and switch the session to them
+
+    A session that already has indexes gets a new generation, published by
+    rewriting the manifest; the indexes being read are never modified.
+    """
+    timer = timer or ingest_timer()
+    _report(progress, "index", 0, 1)
+    if not documents:
+        raise ValueError("No text could be extracted from the uploaded PDFs")
+
+    with timer.stage("index"):
+        vector_store = document_store.assemble(documents, backend)
+    _publish_session_index(session_id, vector_store, None, documents, backend, timer)
+    _report(progress, "index", 1, 1)
     return vector_store
 
 
-def process_pdf_files(pdf_files, session_id):
-    """Process PDF files and create vector store"""
-    raw_text, file_page_mapping = get_pdf_text(pdf_files)
-    text_chunks = get_text_chunks(file_page_mapping)
-    vector_store = get_vector_store(text_chunks, session_id)
-    return vector_store
\ No newline at end of file
+def _updated_session_indexes(
+    session_id: str,
+    documents: List[Dict],
+    backend: str
+) -> Optional[Tuple[FAISS, BM25Index]]:
+    """The session's current indexes changed to hold documents, or None when they must be rebuilt
+
+    Each document's chunks occupy consecutive positions, in manifest order.
+    Documents that stay must keep their order, with new ones after them.
+    """
+    current = read_session_manifest(session_id).get("documents") or []
+    index_path = session_index_path(session_id, "faiss_index")
+    sparse_path = session_index_path(session_id, "bm25_index")
+    if not current or not index_path.exists() or not sparse_path.exists():
+        return None
+
+    fingerprints = {document["fingerprint"] for document in documents}
+    current_fingerprints = {document["fingerprint"] for document in current}
+    kept = [position for position, document in enumerate(current) if document["fingerprint"] in fingerprints]
+    added = [document for document in documents if document["fingerprint"] not in current_fingerprints]
+    if [document["fingerprint"] for document in documents] != (
+        [current[position]["fingerprint"] for position in kept] + [document["fingerprint"] for document in added]
+    ):
+        return None
+
+    counts = [document_store.load(document["fingerprint"], backend).index.ntotal for document in current]
+    starts = np.cumsum([0] + counts)
+    added_stores = [document_store.load(document["fingerprint"], backend) for document in added]
+    num_chunks = sum(counts[position] for position in kept) + sum(store.index.ntotal for store in added_stores)
+
+    # Loaded into memory: the current generation may be mapped by readers and is never modified
+    vector_store = load_vector_store(index_path, get_embeddings(backend), mmap=False)
+    index = vector_store.index
+    removed = sorted(set(range(len(current))) - set(kept))
+    if not fits_corpus(index, num_chunks) or (removed and index_type_of(index) == "hnsw"):
+        return None
+
+    sparse_index = BM25Index.load(sparse_path)
+    for position in reversed(removed):
+        remove_range(index, int(starts[position]), int(starts[position + 1]))
+        sparse_index = sparse_index.remove_range(int(starts[position]), int(starts[position + 1]))
+    if added_stores:
+        index.add(np.concatenate([index_vectors(store.index) for store in added_stores]))
+        sparse_index = sparse_index.extend([
+            text for store in added_stores for text in chunk_store_of(store).texts()
+        ])
+
+    session_chunks = chunk_store_of(vector_store)
+    chunks = ChunkStore.concat(
+        [session_chunks.slice(int(starts[position]), int(starts[position + 1])) for position in kept]
+        + [chunk_store_of(store) for store in added_stores],
+        [document["file"] for document in documents]
+    )
+    return vector_store_from_index(index, chunks, get_embeddings(backend)), sparse_index
+
+
+def update_session_index(
+    session_id: str,
+    documents: List[Dict],
+    progress: Optional[ProgressCallback] = None,
+    timer: Optional[StageTimer] = None,
+    backend: str = EMBEDDING_BACKEND
+) -> FAISS:
+    """Switch a session to a new document list by editing its current indexes
+
+    Chunks of dropped documents are removed and those of new documents added
+    from their stored vectors, so the cost follows the documents that change
+    rather than the whole session. The indexes are rebuilt from the document
+    store instead when the FAISS index no longer fits the corpus size (see
+    fits_corpus), for removals from HNSW, and for sessions without a current
+    index.
+    """
+    timer = timer or ingest_timer()
+    _report(progress, "index", 0, 1)
+    if not documents:
+        raise ValueError("No text could be extracted from the uploaded PDFs")
+
+    with timer.stage("index"):
+        updated = _updated_session_indexes(session_id, documents, backend)
+    if updated is None:
+        return build_session_index(session_id, documents, progress, timer, backend)
+
+    vector_store, sparse_index = updated
+    _publish_session_index(session_id, vector_store, sparse_index, documents, backend, timer)
+    _report(progress, "index", 1, 1)
+    return vector_store
+
+
+def process_pdf_files(
+    pdf_files,
+    session_id,
+    progress: Optional[ProgressCallback] = None,
+    timer: Optional[StageTimer] = None
+):
+    """Process PDF files and create vector store
+
+    Each file is fingerprinted by content. Files already in the document store
+    are reused as-is; only new files are extracted, chunked and embedded, and
+    their chunk indexes are added to the store. The session index is then
+    assembled from the stored per-document indexes. Stage durations are
+    recorded in timer (a new ingest timer by default).
+    """
+    timer = timer or ingest_timer()
+    documents = store_pdf_files(pdf_files, progress, timer)
+    return build_session_index(session_id, documents, progress, timer)
+
+
+def _document_lock(session_id: str) -> threading.Lock:
+    with _document_locks_guard:
+        return _document_locks[session_id]
+
+
+def _session_documents(session_id: str) -> List[Dict]:
+    manifest = read_session_manifest(session_id)
+    if not manifest.get("documents"):
+        raise ValueError("This session's documents cannot be changed; upload them again in a new session")
+    return manifest["documents"]
+
+
+def add_pdf_files(
+    pdf_files,
+    session_id,
+    progress: Optional[ProgressCallback] = None,
+    timer: Optional[StageTimer] = None
+):
+    """Add PDF files to a processed session
+
+    Only content new to the document store is extracted and embedded, and
+    the session index is updated with the new documents' stored vectors.
+    Documents are keyed by content: a file whose content is already in the
+    session renames that document rather than adding it again, and a file
+    named like a session document with other content replaces it.
+    """
+    timer = timer or ingest_timer()
+    if read_session_manifest(session_id).get("embedding_backend", "google") != EMBEDDING_BACKEND:
+        raise ValueError("This session was built with another embedding backend; upload its documents again")
+
+    added = {document["fingerprint"]: document for document in store_pdf_files(pdf_files, progress, timer)}
+    with _document_lock(session_id):
+        existing = _session_documents(session_id)
+        added_names = {document["file"] for document in added.values()}
+        documents = []
+        for document in existing:
+            if document["fingerprint"] in added:
+                documents.append(added.pop(document["fingerprint"]))
+            elif document["file"] not in added_names:
+                documents.append(document)
+        documents.extend(added.values())
+        return update_session_index(session_id, documents, progress, timer)
+
+
+def remove_session_document(session_id: str, file_name: str) -> List[Dict]:
+    """Remove one file from a session and drop its chunks from the session index
+
+    Returns the session's remaining documents. Raises KeyError for a file
+    not in the session.
+    """
+    with _document_lock(session_id):
+        existing = _session_documents(session_id)
+        documents = [document for document in existing if document["file"] != file_name]
+        if len(documents) == len(existing):
+            raise KeyError(file_name)
+        if not documents:
+            raise ValueError("A session must keep at least one document")
+
+        backend = read_session_manifest(session_id).get("embedding_backend", "google")
+        update_session_index(session_id, documents, backend=backend)
+    return documents
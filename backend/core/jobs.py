@@ -0,0 +1,177 @@
+import os
+import time
+import datetime
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+from pathlib import Path
+
+from .executors import ingest_executor
+from .ingest import add_pdf_files, process_pdf_files
+from .document_store import read_session_manifest, session_docset_fingerprint, session_documents
+from .session_manager import session_manager
+from .metrics import INGEST_JOBS, ingest_timer
+
+
+INGEST_STAGES = ["extract", "split", "embed", "index"]
+# "replace" builds the session's documents from the uploads; "add" merges them into its current ones
+INGEST_MODES = ("replace", "add")
+
+
+class IngestJob:
+    """Tracks one background ingestion run and mirrors its state into the session"""
+
+    # Minimum seconds between progress writes to the session store
+    PUBLISH_INTERVAL = 0.25
+
+    def __init__(
+        self,
+        session_id: str,
+        pdf_paths: List[Path],
+        reused_files: Optional[List[str]] = None,
+        mode: str = "replace"
+    ):
+        if mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest mode: {mode}")
+        self.session_id = session_id
+        self.pdf_paths = pdf_paths
+        self._lock = threading.Lock()
+        self._last_publish = 0.0
+        self.state: Dict = {
+            "status": "queued",
+            "mode": mode,
+            "stage": None,
+            "stages": {stage: {"done": 0, "total": None} for stage in INGEST_STAGES},
+            "files": [path.name for path in pdf_paths],
+            "reused_files": reused_files or [],
+            "error": None,
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "finished_at": None,
+            "pid": os.getpid(),
+            "timings_ms": {}
+        }
+        self._publish(force=True)
+
+    def _publish(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_publish < self.PUBLISH_INTERVAL:
+            return
+        self._last_publish = now
+        session_manager.update_job(self.session_id, {
+            **self.state,
+            "stages": {name: dict(stage) for name, stage in self.state["stages"].items()}
+        })
+
+    def progress(self, stage: str, done: int, total: Optional[int] = None) -> None:
+        """Progress callback passed to the ingest stages"""
+        with self._lock:
+            self.state["stage"] = stage
+            self.state["stages"][stage]["done"] = done
+            if total is not None:
+                self.state["stages"][stage]["total"] = total
+            self._publish(force=total is not None and done >= total)
+
+    def run(self) -> None:
+        """Run every ingest stage and record the outcome"""
+        with self._lock:
+            self.state["status"] = "running"
+            self._publish(force=True)
+
+        timer = ingest_timer()
+        try:
+            if self.state["mode"] == "add":
+                docset = session_docset_fingerprint(self.session_id)
+                previous_documents = session_documents(self.session_id)
+                add_pdf_files(self.pdf_paths, self.session_id, self.progress, timer)
+            else:
+                process_pdf_files(self.pdf_paths, self.session_id, self.progress, timer)
+        except Exception as e:
+            INGEST_JOBS.inc(status="failed")
+            with self._lock:
+                self.state["status"] = "failed"
+                self.state["error"] = str(e)
+                self.state["timings_ms"] = timer.as_ms()
+                self.state["finished_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+                self._publish(force=True)
+            return
+
+        # The new index generation is already in the manifest; the session is
+        # marked usable before the job reports completion, so a client that
+        # polls for "completed" can chat straight away
+        if self.state["mode"] == "add":
+            documents = read_session_manifest(self.session_id)["documents"]
+            session_manager.set_files(self.session_id, [document["file"] for document in documents])
+            session_manager.release_docset(docset)
+        session_manager.set_processed(self.session_id, True)
+
+        INGEST_JOBS.inc(status="completed")
+        with self._lock:
+            self.state["status"] = "completed"
+            self.state["stage"] = None
+            self.state["timings_ms"] = timer.as_ms()
+            self.state["finished_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+            self._publish(force=True)
+        if self.state["mode"] == "add":
+            # Documents the added files replaced
+            session_manager.release_documents(previous_documents - session_documents(self.session_id))
+
+        # Chunk vectors now live in the document store; the raw uploads are no longer needed
+        for path in self.pdf_paths:
+            Path(path).unlink(missing_ok=True)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def fail_interrupted_jobs() -> int:
+    """Mark queued/running jobs whose worker process is gone as failed so they can be retried
+
+    Called at startup, when this process cannot own any job yet.
+    """
+    interrupted = 0
+    for session_id in session_manager.list_sessions():
+        job = session_manager.get_job(session_id)
+        if not job or job["status"] not in ("queued", "running"):
+            continue
+        pid = job.get("pid")
+        if pid is not None and pid != os.getpid() and _process_alive(pid):
+            continue
+        session_manager.update_job(session_id, {
+            **job,
+            "status": "failed",
+            "error": "Interrupted by a server restart",
+            "finished_at": datetime.datetime.now().isoformat(timespec="seconds")
+        })
+        interrupted += 1
+    return interrupted
+
+
+def retry_ingest_job(session_id: str) -> Optional[Future]:
+    """Re-queue a failed ingestion from the uploads it left behind"""
+    job = session_manager.get_job(session_id)
+    if not job or job["status"] != "failed":
+        return None
+
+    upload_dir = Path(f"sessions/{session_id}/uploads")
+    pdf_paths = [upload_dir / file_name for file_name in job["files"]]
+    if not all(path.exists() for path in pdf_paths):
+        return None
+    return submit_ingest_job(session_id, pdf_paths, job.get("reused_files"), job.get("mode", "replace"))
+
+
+def submit_ingest_job(
+    session_id: str,
+    pdf_paths: List[Path],
+    reused_files: Optional[List[str]] = None,
+    mode: str = "replace"
+) -> Future:
+    """Queue ingestion of already-persisted PDFs on the ingest pool"""
+    job = IngestJob(session_id, pdf_paths, reused_files, mode)
+    return ingest_executor.submit(job.run)
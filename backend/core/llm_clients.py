@@ -0,0 +1,137 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+from langchain_groq import ChatGroq
+
+
+# Connection pool shared by every chat model client
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+# Compiled chains kept for reuse, one per (model, system prompt)
+LLM_CHAIN_CACHE_SIZE = int(os.getenv("LLM_CHAIN_CACHE_SIZE", "64"))
+
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_llms: Dict[str, BaseChatModel] = {}
+_llms_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+    )
+
+
+def shared_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Keep-alive HTTP clients shared by the chat model clients"""
+    global _http_client, _http_async_client
+    with _llms_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits(), timeout=LLM_REQUEST_TIMEOUT)
+            _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=LLM_REQUEST_TIMEOUT)
+        return _http_client, _http_async_client
+
+
+def create_llm(model_name: str) -> BaseChatModel:
+    """Create a Groq chat model client on the shared connection pool"""
+    http_client, http_async_client = shared_http_clients()
+    return ChatGroq(
+        groq_api_key=os.getenv('GROQ_API_KEY'),
+        model_name=model_name,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
+
+
+def get_llm(model_name: str) -> BaseChatModel:
+    """Get the shared chat model client for a model"""
+    with _llms_lock:
+        llm = _llms.get(model_name)
+    if llm is None:
+        llm = create_llm(model_name)
+        with _llms_lock:
+            llm = _llms.setdefault(model_name, llm)
+    return llm
+
+
+async def close_llm_clients() -> None:
+    """Close the shared connection pools and drop the cached clients"""
+    global _http_client, _http_async_client
+    with _llms_lock:
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client, _http_async_client = None, None
+        _llms.clear()
+    chain_cache.clear()
+    if http_client is not None:
+        http_client.close()
+        await http_async_client.aclose()
+
+
+def prompt_digest(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+
+class ChainCache:
+    """Bounded LRU of compiled chains keyed by (model, system prompt digest, client)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, int], Runnable]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name: str, system_prompt: str, llm: BaseChatModel, build: Callable[[], Runnable]) -> Runnable:
+        """Return the cached chain, compiling it with build on a miss"""
+        if self.max_entries <= 0:
+            return build()
+        # The cached chain holds a reference to llm, so its id is not reused while cached
+        key = (model_name, prompt_digest(system_prompt), id(llm))
+        with self._lock:
+            chain = self._entries.get(key)
+            if chain is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return chain
+            self.misses += 1
+
+        chain = build()
+        with self._lock:
+            chain = self._entries.setdefault(key, chain)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return chain
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Global compiled chain cache
+chain_cache = ChainCache(LLM_CHAIN_CACHE_SIZE)
@@ -0,0 +1,52 @@
+import re
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbeddings(Embeddings):
+    """Fully local embedder using the hashing trick over word unigrams and bigrams
+
+    Each feature is hashed (CRC32) into one of ``size`` buckets with a hashed
+    sign, weighted by sublinear term frequency and L2-normalised. No model
+    files or network calls are needed, so it suits offline and
+    latency-critical deployments at the cost of purely lexical similarity.
+    """
+
+    def __init__(self, size: int = 768, bigrams: bool = True):
+        self.size = size
+        self.bigrams = bigrams
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        if self.bigrams:
+            tokens += [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+        return tokens
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.size), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features, counts = np.unique(self._features(text), return_counts=True)
+            if len(features) == 0:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in features),
+                dtype=np.uint32, count=len(features)
+            )
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            weights = (1.0 + np.log(counts)).astype(np.float32) * signs
+            matrix[row] = np.bincount(hashes % self.size, weights=weights, minlength=self.size)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
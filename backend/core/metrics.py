@@ -0,0 +1,230 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Seconds; spans fast index lookups through slow LLM calls and large ingests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}_total{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], Dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: {**series, "counts": list(series["counts"])} for key, series in self._series.items()}
+
+        lines = []
+        for key, series in sorted(snapshot.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+# A collector returns (name, kind, help, [(labels, value)]) for values owned elsewhere
+Collector = Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class MetricsRegistry:
+    """Metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector) -> None:
+        """Add a callback that reports gauges or counters at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            # Counter samples carry the _total suffix, and the family is named after them
+            name = f"{metric.name}_total" if metric.kind == "counter" else metric.name
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Times the stages of one request or job into a histogram and a per-run breakdown"""
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.histogram.observe(seconds, stage=name)
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def as_ms(self) -> Dict[str, float]:
+        """Per-stage milliseconds for this run"""
+        return {name: round(seconds * 1000, 3) for name, seconds in self.seconds.items()}
+
+
+# Global metrics registry and the application's metrics
+metrics_registry = MetricsRegistry()
+
+INGEST_STAGE_SECONDS = metrics_registry.histogram(
+    "chatpdf_ingest_stage_seconds", "Time spent in each ingestion stage", ["stage"]
+)
+INGEST_JOBS = metrics_registry.counter(
+    "chatpdf_ingest_jobs", "Ingestion jobs by outcome", ["status"]
+)
+INGEST_PAGES = metrics_registry.counter("chatpdf_ingest_pages", "PDF pages extracted")
+INGEST_CHUNKS = metrics_registry.counter("chatpdf_ingest_chunks", "Text chunks embedded")
+CHAT_STAGE_SECONDS = metrics_registry.histogram(
+    "chatpdf_chat_stage_seconds", "Time spent in each stage of answering a question", ["stage"]
+)
+CHAT_REQUESTS = metrics_registry.counter(
+    "chatpdf_chat_requests", "Answered questions by outcome", ["outcome"]
+)
+CHAT_CONTEXT_TOKENS = metrics_registry.histogram(
+    "chatpdf_chat_context_tokens", "Estimated tokens of packed prompt context",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+)
+REPORT_EXPORTS = metrics_registry.counter(
+    "chatpdf_report_exports", "Chat history PDF downloads by whether the report was rendered or cached", ["outcome"]
+)
+
+
+def ingest_timer() -> StageTimer:
+    """Stage timer for one ingestion run"""
+    return StageTimer(INGEST_STAGE_SECONDS)
+
+
+def chat_timer() -> StageTimer:
+    """Stage timer for one question"""
+    return StageTimer(CHAT_STAGE_SECONDS)
+
+
+@contextmanager
+def optional_stage(timer: Optional[StageTimer], name: str) -> Iterator[None]:
+    """timer.stage(name), or nothing when no timer is given"""
+    if timer is None:
+        yield
+    else:
+        with timer.stage(name):
+            yield
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -7,6 +7,8 @@ class ChatMessage(BaseModel):
     model_name: str = "llama3-70b-8192"
     system_prompt: Optional[str] = None
     use_chat_history: bool = True
+    use_cache: bool = True
+    include_timings: bool = False
 
 
 class ChatResponse(BaseModel):
@@ -14,12 +16,47 @@ class ChatResponse(BaseModel):
     sources: List[str]
     session_id: str
     chat_context_used: List[str] = []
+    cached: bool = False
+    context_tokens: int = 0
+    timings: Optional[Dict[str, float]] = None
+
+
+class BatchChatMessage(BaseModel):
+    questions: List[str]
+    model_name: str = "llama3-70b-8192"
+    system_prompt: Optional[str] = None
+    use_chat_history: bool = True
+    use_cache: bool = True
+    include_timings: bool = False
+    max_concurrency: Optional[int] = None
+    stream: bool = False
+
+
+class BatchChatResult(BaseModel):
+    index: int
+    question: str
+    answer: Optional[str] = None
+    sources: List[str] = []
+    chat_context_used: List[str] = []
+    cached: bool = False
+    context_tokens: int = 0
+    timings: Optional[Dict[str, float]] = None
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    session_id: str
+    results: List[BatchChatResult]
+    answered: int
+    failed: int
 
 
 class ProcessResponse(BaseModel):
     message: str
     session_id: str
     processed: bool
+    status: str = "completed"
+    reused_files: List[str] = []
 
 
 class ChatHistory(BaseModel):
@@ -1,8 +1,28 @@
-from typing import List
+import os
+import uuid
+import shutil
+import threading
+from collections import defaultdict
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
+from pathlib import Path
 from fpdf import FPDF
 
+from .metrics import REPORT_EXPORTS
 
-def generate_pdf_report(chat_history: List[dict]) -> FPDF:
+
+# Bytes per chunk when streaming a rendered report
+REPORT_CHUNK_SIZE = int(os.getenv("REPORT_CHUNK_SIZE", str(64 * 1024)))
+
+_session_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+_session_locks_guard = threading.Lock()
+
+
+def _lock_for(session_id: str) -> threading.Lock:
+    with _session_locks_guard:
+        return _session_locks[session_id]
+
+
+def generate_pdf_report(chat_history: Iterable[dict]) -> FPDF:
     """Generate PDF report from chat history"""
     pdf = FPDF()
     pdf.add_page()
@@ -32,4 +52,71 @@ def generate_pdf_report(chat_history: List[dict]) -> FPDF:
         pdf.multi_cell(0, 10, f"{content}\n")
         pdf.ln(5)
     
-    return pdf
\ No newline at end of file
+    return pdf
+
+
+def reports_dir(session_id: str) -> Path:
+    return Path(f"sessions/{session_id}/reports")
+
+
+def _export_locked(session_id: str, chat_history: List[dict]) -> Path:
+    directory = reports_dir(session_id)
+    path = directory / f"chat_history-{len(chat_history)}.pdf"
+    if path.exists():
+        REPORT_EXPORTS.inc(outcome="cached")
+        return path
+
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / f".{uuid.uuid4().hex}.pdf.tmp"
+    try:
+        generate_pdf_report(chat_history).output(str(tmp_path))
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    REPORT_EXPORTS.inc(outcome="rendered")
+
+    # Superseded reports; a download still streaming one keeps its open file
+    for old_path in directory.glob("chat_history-*.pdf"):
+        if old_path != path:
+            old_path.unlink(missing_ok=True)
+    return path
+
+
+def export_chat_history(session_id: str, chat_history: List[dict]) -> Path:
+    """Path of the rendered report for a session's history, rendering it on first request
+
+    Reports are cached on disk per session, keyed by history length, so
+    repeated downloads of an unchanged history read the file. Rendering writes
+    to a uniquely named file next to the target and renames it into place, so
+    concurrent workers never see a partial report and nothing is left behind
+    on failure.
+    """
+    with _lock_for(session_id):
+        return _export_locked(session_id, chat_history)
+
+
+def open_chat_history_report(session_id: str, chat_history: List[dict]) -> Tuple[BinaryIO, int]:
+    """Open the rendered report for a session's history, returning the file and its size
+
+    The file is opened under the same lock as rendering and invalidation, so
+    a later render or a cleared history can unlink the path but not the open
+    handle, and the size always matches the bytes that will be read.
+    """
+    with _lock_for(session_id):
+        report_file = open(_export_locked(session_id, chat_history), "rb")
+    return report_file, os.fstat(report_file.fileno()).st_size
+
+
+def invalidate_reports(session_id: str) -> None:
+    """Drop a session's rendered reports (after its history is cleared)"""
+    with _lock_for(session_id):
+        shutil.rmtree(reports_dir(session_id), ignore_errors=True)
+
+
+def iter_report(report_file: BinaryIO, chunk_size: int = REPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Stream an open report in chunks, closing it when done"""
+    try:
+        for block in iter(lambda: report_file.read(chunk_size), b""):
+            yield block
+    finally:
+        report_file.close()
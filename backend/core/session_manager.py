@@ -1,85 +1,299 @@
-from typing import Dict, List, Optional
+import os
+import time
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from pathlib import Path
 
+from .session_store import SessionStore, create_session_store
+from .index_cache import index_cache
+from .answer_cache import answer_cache
+from .document_store import document_store, session_docset_fingerprint, session_documents
+from .embeddings import EMBEDDING_CACHE_DIR
+from .embedding_pipeline import EMBED_CHECKPOINT_DIR
+from .report_generator import invalidate_reports
+
+
+SESSIONS_DIR = Path("sessions")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "86400"))
+SESSION_DISK_QUOTA_MB = float(os.getenv("SESSION_DISK_QUOTA_MB", "2048"))
+# Last-access writes to the store are skipped if the previous one is this recent
+SESSION_TOUCH_INTERVAL = float(os.getenv("SESSION_TOUCH_INTERVAL", "60"))
+# Shared by all sessions and counted against the disk quota along with sessions/ and
+# the document store; evicting sessions does not shrink them
+CACHE_DIRS = (Path(EMBEDDING_CACHE_DIR), Path(EMBED_CHECKPOINT_DIR))
+
+
+def directory_bytes(path: Path) -> int:
+    """Total size of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
 
 class SessionManager:
     """Manages user sessions and their state"""
     
-    def __init__(self):
-        self.sessions: Dict[str, Dict] = {}
+    def __init__(self, store: Optional[SessionStore] = None):
+        self.store = store or create_session_store()
+        self._touched: Dict[str, float] = {}
+        self._cleanup_lock = threading.Lock()
+        self.metrics = {
+            "sweeps": 0,
+            "evicted_sessions": 0,
+            "orphaned_dirs_removed": 0,
+            "reclaimed_bytes": 0,
+            "live_sessions": 0,
+            "released_documents": 0,
+            "disk_bytes": 0,
+            "shared_disk_bytes": 0,
+            "last_sweep_at": None,
+        }
     
-    def create_session(self, session_id: str, files: List[str]) -> None:
+    def create_session(self, session_id: str, files: List[str], processed: bool = True) -> None:
         """Create a new session"""
-        self.sessions[session_id] = {
-            "processed": True,
-            "history": [],
-            "files": files,
-            "system_prompt": None
-        }
+        self.store.create(session_id, {"processed": processed, "files": files})
     
     def get_session(self, session_id: str) -> Optional[Dict]:
         """Get session data"""
-        return self.sessions.get(session_id)
+        session = self.store.get(session_id)
+        if session is not None:
+            session["history"] = self.store.get_history(session_id)
+        return session
     
     def session_exists(self, session_id: str) -> bool:
         """Check if session exists"""
-        return session_id in self.sessions
+        return self.store.exists(session_id)
+    
+    def list_sessions(self) -> List[str]:
+        """Get every session id"""
+        return self.store.list_sessions()
+    
+    def touch(self, session_id: str) -> None:
+        """Record that the session is in use, keeping it from TTL eviction"""
+        now = time.time()
+        if now - self._touched.get(session_id, 0.0) < SESSION_TOUCH_INTERVAL:
+            return
+        self._touched[session_id] = now
+        self.store.touch(session_id, now)
     
     def is_session_processed(self, session_id: str) -> bool:
         """Check if session has processed documents"""
-        if session_id not in self.sessions:
-            return False
-        return self.sessions[session_id]["processed"]
+        session = self.store.get(session_id)
+        return bool(session and session["processed"])
+    
+    def set_processed(self, session_id: str, processed: bool) -> None:
+        """Mark whether the session's documents are ready for chat"""
+        self.store.update(session_id, {"processed": processed})
+    
+    def set_files(self, session_id: str, files: List[str]) -> None:
+        """Set the names of the session's documents"""
+        self.store.update(session_id, {"files": files})
+    
+    def update_job(self, session_id: str, job: Dict) -> None:
+        """Store the state of the session's ingestion job"""
+        self.store.update(session_id, {"job": job})
+    
+    def get_job(self, session_id: str) -> Optional[Dict]:
+        """Get the state of the session's ingestion job"""
+        session = self.store.get(session_id)
+        return session["job"] if session else None
     
     def add_to_history(self, session_id: str, message_type: str, content: str) -> None:
         """Add message to session history"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["history"].append({
-                "type": message_type,
-                "content": content
-            })
+        self.store.append_history(session_id, message_type, content)
     
     def get_history(self, session_id: str) -> List[Dict]:
         """Get session chat history"""
-        if session_id not in self.sessions:
-            return []
-        return self.sessions[session_id]["history"]
+        return self.store.get_history(session_id)
     
     def clear_history(self, session_id: str) -> None:
         """Clear session chat history"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["history"] = []
+        self.store.clear_history(session_id)
+        invalidate_reports(session_id)
     
     def set_system_prompt(self, session_id: str, system_prompt: str) -> None:
         """Set system prompt for session"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["system_prompt"] = system_prompt
+        self.store.update(session_id, {"system_prompt": system_prompt})
     
     def get_system_prompt(self, session_id: str) -> Optional[str]:
         """Get system prompt for session"""
-        if session_id not in self.sessions:
-            return None
-        return self.sessions[session_id].get("system_prompt")
+        session = self.store.get(session_id)
+        return session["system_prompt"] if session else None
     
     def reset_system_prompt(self, session_id: str) -> None:
         """Reset system prompt to default"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["system_prompt"] = None
+        self.store.update(session_id, {"system_prompt": None})
     
     def get_session_info(self, session_id: str) -> Dict:
         """Get complete session information"""
-        if session_id not in self.sessions:
+        session_info = self.get_session(session_id)
+        if session_info is None:
             return {}
         
-        session_info = self.sessions[session_id].copy()
         session_info["session_id"] = session_id
         return session_info
     
-    def cleanup_old_sessions(self) -> None:
-        """Clean up old session files (implement based on your needs)"""
-        # This can be implemented to clean up old session directories
-        # based on timestamp or other criteria
-        pass
+    def delete_session(self, session_id: str) -> int:
+        """Remove a session's state, cached indexes and files; returns bytes freed on disk
+
+        Stored documents that no other session uses are deleted too.
+        """
+        docset = session_docset_fingerprint(session_id)
+        documents = session_documents(session_id)
+        session_dir = SESSIONS_DIR / session_id
+        freed = directory_bytes(session_dir)
+        self.store.delete(session_id)
+        self._touched.pop(session_id, None)
+        index_cache.invalidate_session(session_id)
+        shutil.rmtree(session_dir, ignore_errors=True)
+        self.release_docset(docset)
+        return freed + self.release_documents(documents)
+
+    def _ingest_in_progress(self, session_ids: Iterable[str]) -> bool:
+        return any((self.get_job(session_id) or {}).get("status") in ("queued", "running") for session_id in session_ids)
+
+    def release_documents(self, documents: Set[Tuple[str, str]], min_age: float = 0.0) -> int:
+        """Delete stored (backend, fingerprint) documents that no session's manifest lists; returns bytes freed
+
+        A stored document is referenced by every session built from it and
+        goes once the last of them is deleted or drops it. Nothing is deleted
+        while an ingestion job is queued or running, since the job may be
+        about to reuse stored documents; the sweeper collects them later.
+        Documents stored less than min_age seconds ago are kept.
+        """
+        session_ids = self.store.list_sessions()
+        if not documents or self._ingest_in_progress(session_ids):
+            return 0
+        referenced = set()
+        for session_id in session_ids:
+            referenced |= session_documents(session_id)
+
+        freed = 0
+        now = time.time()
+        for backend, fingerprint in documents - referenced:
+            entry_dir = document_store.entry_dir(fingerprint, backend)
+            try:
+                if now - entry_dir.stat().st_mtime < min_age:
+                    continue
+            except FileNotFoundError:
+                continue
+            freed += directory_bytes(entry_dir)
+            document_store.delete(fingerprint, backend)
+            self.metrics["released_documents"] += 1
+        return freed
+
+    def _sweep_shared_files(self, ttl_seconds: float) -> int:
+        """Delete unused stored documents, staging directories and embedding checkpoints older than the TTL
+
+        Checkpoints are only left behind by failed ingestion jobs, which can
+        be retried until then.
+        """
+        if self._ingest_in_progress(self.store.list_sessions()):
+            return 0
+        freed = self.release_documents(set(document_store.entries()), min_age=ttl_seconds)
+
+        now = time.time()
+        stale = list(document_store.root.glob("*/.staging-*")) + list(Path(EMBED_CHECKPOINT_DIR).glob("*/*/*"))
+        for path in stale:
+            try:
+                if not path.is_dir() or now - path.stat().st_mtime <= ttl_seconds:
+                    continue
+            except FileNotFoundError:
+                continue
+            freed += directory_bytes(path)
+            shutil.rmtree(path, ignore_errors=True)
+        return freed
+    
+    def release_docset(self, docset: str) -> None:
+        """Drop cached answers for a document set that a session stopped using
+
+        Other sessions over the same documents keep using the cached answers.
+        """
+        if docset.startswith("session:") or not any(
+            session_docset_fingerprint(other) == docset for other in self.store.list_sessions()
+        ):
+            answer_cache.invalidate(docset)
+    
+    def cleanup_old_sessions(
+        self,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ) -> Dict:
+        """Evict sessions idle for longer than the TTL, then least recently used ones over the disk quota
+        
+        Sessions with an ingestion job in progress are never evicted. Session
+        directories with no stored session (e.g. left by a previous process)
+        are removed once they are older than the TTL, as are stored documents
+        no session uses and abandoned embedding checkpoints. The quota covers
+        sessions/ and the shared document store and embedding caches; no
+        session is evicted when the caches alone exceed it.
+        """
+        ttl_seconds = SESSION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        if max_bytes is None:
+            max_bytes = int(SESSION_DISK_QUOTA_MB * 1024 * 1024)
+        
+        with self._cleanup_lock:
+            now = time.time()
+            evicted = orphans = reclaimed = 0
+            sessions = self.store.sessions_by_last_access()
+            live = {session_id for session_id, _ in sessions}
+            
+            if SESSIONS_DIR.is_dir():
+                for path in SESSIONS_DIR.iterdir():
+                    if path.is_dir() and path.name not in live and now - path.stat().st_mtime > ttl_seconds:
+                        reclaimed += directory_bytes(path)
+                        shutil.rmtree(path, ignore_errors=True)
+                        orphans += 1
+            
+            remaining = []
+            for session_id, last_accessed in sessions:
+                job = self.get_job(session_id) or {}
+                if job.get("status") in ("queued", "running"):
+                    continue
+                if now - last_accessed > ttl_seconds:
+                    reclaimed += self.delete_session(session_id)
+                    evicted += 1
+                else:
+                    remaining.append(session_id)
+            
+            reclaimed += self._sweep_shared_files(ttl_seconds)
+            
+            cache_bytes = sum(directory_bytes(path) for path in CACHE_DIRS)
+            disk_bytes = cache_bytes + directory_bytes(document_store.root) + sum(
+                directory_bytes(SESSIONS_DIR / session_id) for session_id in remaining
+            )
+            if max_bytes > 0 and cache_bytes >= max_bytes:
+                print(f"Embedding caches ({cache_bytes} bytes) alone exceed the disk quota; no sessions evicted")
+            elif max_bytes > 0:
+                # remaining is ordered least recently used first
+                for session_id in remaining:
+                    if disk_bytes <= max_bytes:
+                        break
+                    # Includes stored documents only this session used
+                    freed = self.delete_session(session_id)
+                    reclaimed += freed
+                    disk_bytes -= freed
+                    evicted += 1
+            
+            self.metrics["sweeps"] += 1
+            self.metrics["evicted_sessions"] += evicted
+            self.metrics["orphaned_dirs_removed"] += orphans
+            self.metrics["reclaimed_bytes"] += reclaimed
+            self.metrics["live_sessions"] = len(self.store.list_sessions())
+            self.metrics["disk_bytes"] = disk_bytes
+            self.metrics["shared_disk_bytes"] = directory_bytes(document_store.root) + cache_bytes
+            self.metrics["last_sweep_at"] = now
+            return {"evicted_sessions": evicted, "orphaned_dirs_removed": orphans, "reclaimed_bytes": reclaimed}
+    
+    def get_metrics(self) -> Dict:
+        """Get session garbage collection counters"""
+        return {**self.metrics, "live_sessions": len(self.store.list_sessions())}
 
 
 # Global session manager instance
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+
+
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions/sessions.db")
+
+# Session fields besides the chat history, with their defaults
+SESSION_FIELDS = {
+    "processed": True,
+    "files": [],
+    "system_prompt": None,
+    "job": None,
+}
+
+
+class SessionStore(ABC):
+    """Storage backend for session state and chat history"""
+
+    @abstractmethod
+    def create(self, session_id: str, fields: Dict[str, Any]) -> None:
+        """Create or replace a session"""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Get a session's fields (without history), or None"""
+
+    @abstractmethod
+    def exists(self, session_id: str) -> bool:
+        """Check if a session exists"""
+
+    @abstractmethod
+    def list_sessions(self) -> List[str]:
+        """Get every session id"""
+
+    @abstractmethod
+    def touch(self, session_id: str, timestamp: float) -> None:
+        """Record when a session was last used"""
+
+    @abstractmethod
+    def sessions_by_last_access(self) -> List[Tuple[str, float]]:
+        """Get (session_id, last_accessed) pairs, least recently used first"""
+
+    @abstractmethod
+    def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        """Update some fields of an existing session"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session and its history"""
+
+    @abstractmethod
+    def append_history(self, session_id: str, message_type: str, content: str) -> None:
+        """Append a message to a session's history"""
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> List[Dict]:
+        """Get a session's history in order"""
+
+    @abstractmethod
+    def clear_history(self, session_id: str) -> None:
+        """Remove a session's history"""
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store; sessions are lost on restart and not shared between workers"""
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict] = {}
+        self._history: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, session_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            now = time.time()
+            self._sessions[session_id] = {**SESSION_FIELDS, **fields, "created_at": now, "last_accessed": now}
+            self._history[session_id] = []
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return dict(session) if session is not None else None
+
+    def exists(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def list_sessions(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def touch(self, session_id: str, timestamp: float) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id]["last_accessed"] = timestamp
+
+    def sessions_by_last_access(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            pairs = [(session_id, session["last_accessed"]) for session_id, session in self._sessions.items()]
+        return sorted(pairs, key=lambda pair: pair[1])
+
+    def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id].update(fields)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._history.pop(session_id, None)
+
+    def append_history(self, session_id: str, message_type: str, content: str) -> None:
+        with self._lock:
+            if session_id in self._history:
+                self._history[session_id].append({"type": message_type, "content": content})
+
+    def get_history(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            return list(self._history.get(session_id, []))
+
+    def clear_history(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._history:
+                self._history[session_id] = []
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite store in WAL mode, shared by every worker process using the same file
+
+    Session fields are columns of ``sessions`` (lists and dicts as JSON).
+    History messages are rows of ``history`` indexed by (session_id, id), so
+    an append is a single insert rather than a rewrite of the session.
+    """
+
+    _JSON_FIELDS = ("files", "job")
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, processed INTEGER NOT NULL, files TEXT NOT NULL, "
+            "system_prompt TEXT, job TEXT, created_at REAL NOT NULL, last_accessed REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "last_accessed" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN last_accessed REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE sessions SET last_accessed = created_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_accessed ON sessions(last_accessed)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+            "type TEXT NOT NULL, content TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_session ON history(session_id, id)")
+        self._conn.commit()
+
+    def _encode(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        encoded = {}
+        for name, value in fields.items():
+            if name not in SESSION_FIELDS:
+                raise ValueError(f"Unknown session field: {name}")
+            if name in self._JSON_FIELDS:
+                value = json.dumps(value) if value is not None else None
+            elif name == "processed":
+                value = int(bool(value))
+            encoded[name] = value
+        return encoded
+
+    def create(self, session_id: str, fields: Dict[str, Any]) -> None:
+        values = self._encode({**SESSION_FIELDS, **fields})
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions "
+                "(session_id, processed, files, system_prompt, job, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, values["processed"], values["files"], values["system_prompt"],
+                 values["job"], now, now)
+            )
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT processed, files, system_prompt, job, created_at, last_accessed "
+                "FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        processed, files, system_prompt, job, created_at, last_accessed = row
+        return {
+            "processed": bool(processed),
+            "files": json.loads(files),
+            "system_prompt": system_prompt,
+            "job": json.loads(job) if job is not None else None,
+            "created_at": created_at,
+            "last_accessed": last_accessed,
+        }
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is not None
+
+    def list_sessions(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT session_id FROM sessions")]
+
+    def touch(self, session_id: str, timestamp: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET last_accessed = MAX(last_accessed, ?) WHERE session_id = ?",
+                (timestamp, session_id)
+            )
+
+    def sessions_by_last_access(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT session_id, last_accessed FROM sessions ORDER BY last_accessed"
+            ).fetchall()
+
+    def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        if not fields:
+            return
+        values = self._encode(fields)
+        assignments = ", ".join(f"{name} = ?" for name in values)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE sessions SET {assignments} WHERE session_id = ?",
+                (*values.values(), session_id)
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def append_history(self, session_id: str, message_type: str, content: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO history (session_id, type, content) "
+                "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM sessions WHERE session_id = ?)",
+                (session_id, message_type, content, session_id)
+            )
+
+    def get_history(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT type, content FROM history WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        return [{"type": message_type, "content": content} for message_type, content in rows]
+
+    def clear_history(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+
+
+def create_session_store(kind: Optional[str] = None, path: Optional[str] = None) -> SessionStore:
+    """Create the session store selected by SESSION_STORE ("sqlite" or "memory")"""
+    kind = kind or SESSION_STORE
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore(path or SESSION_DB_PATH)
+    raise ValueError(f"Unknown session store: {kind}")
@@ -0,0 +1,175 @@
+import re
+import json
+from typing import Dict, List, Sequence, Tuple, Union
+from pathlib import Path
+
+import numpy as np
+
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; identifiers such as part numbers keep their digits"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 inverted index stored as flat posting arrays
+
+    Postings for term t are ``doc_ids[offsets[t]:offsets[t + 1]]`` with the
+    matching term frequencies in ``term_freqs``. Document ids are positions in
+    the session's FAISS index. On disk each array is a ``.npy`` file that is
+    memory-mapped on load, plus ``vocab.json`` for the term table.
+    """
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(doc_lengths)
+        self.avg_doc_length = float(np.mean(doc_lengths)) if self.num_docs else 0.0
+        doc_freqs = np.diff(offsets).astype(np.float32)
+        self.idf = np.log(1.0 + (self.num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts: Sequence[str]) -> "BM25Index":
+        """Build the index from texts in FAISS position order"""
+        empty = cls(
+            {},
+            np.zeros(1, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.float32)
+        )
+        return empty.extend(texts)
+
+    @classmethod
+    def _from_postings(
+        cls,
+        vocab: Dict[str, int],
+        term_ids: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray
+    ) -> "BM25Index":
+        # Group postings by term, keeping document order within a term
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+        return cls(vocab, offsets, doc_ids[order], term_freqs[order], doc_lengths)
+
+    def _term_ids(self) -> np.ndarray:
+        """Term of every posting"""
+        return np.repeat(np.arange(len(self.vocab), dtype=np.int64), np.diff(self.offsets))
+
+    def extend(self, texts: Sequence[str]) -> "BM25Index":
+        """New index with texts appended as the next doc ids; only the new texts are tokenized"""
+        vocab = dict(self.vocab)
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        term_freqs: List[int] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[position] = len(tokens)
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                term_id = vocab.setdefault(token, len(vocab))
+                counts[term_id] = counts.get(term_id, 0) + 1
+            term_ids.extend(counts)
+            doc_ids.extend([self.num_docs + position] * len(counts))
+            term_freqs.extend(counts.values())
+
+        return self._from_postings(
+            vocab,
+            np.concatenate([self._term_ids(), np.asarray(term_ids, dtype=np.int64)]),
+            np.concatenate([np.asarray(self.doc_ids), np.asarray(doc_ids, dtype=np.int32)]),
+            np.concatenate([np.asarray(self.term_freqs), np.asarray(term_freqs, dtype=np.float32)]),
+            np.concatenate([np.asarray(self.doc_lengths), doc_lengths])
+        )
+
+    def remove_range(self, start: int, end: int) -> "BM25Index":
+        """New index without doc ids start to end - 1; later doc ids shift down as in FAISS"""
+        doc_ids = np.asarray(self.doc_ids)
+        keep = (doc_ids < start) | (doc_ids >= end)
+        doc_ids = doc_ids[keep]
+        doc_ids = np.where(doc_ids >= end, doc_ids - (end - start), doc_ids).astype(np.int32)
+        doc_lengths = np.asarray(self.doc_lengths)
+        # Terms left without postings stay in the vocabulary and match nothing
+        return self._from_postings(
+            self.vocab,
+            self._term_ids()[keep],
+            doc_ids,
+            np.asarray(self.term_freqs)[keep],
+            np.concatenate([doc_lengths[:start], doc_lengths[end:]])
+        )
+
+    def nbytes(self) -> int:
+        arrays = (self.offsets, self.doc_ids, self.term_freqs, self.doc_lengths, self.idf)
+        return sum(array.nbytes for array in arrays) + sum(len(term) + 64 for term in self.vocab)
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "offsets.npy", self.offsets)
+        np.save(path / "doc_ids.npy", self.doc_ids)
+        np.save(path / "term_freqs.npy", self.term_freqs)
+        np.save(path / "doc_lengths.npy", self.doc_lengths)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        (path / "vocab.json").write_text(json.dumps(terms))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "BM25Index":
+        path = Path(path)
+        terms = json.loads((path / "vocab.json").read_text())
+        return cls(
+            {term: term_id for term_id, term in enumerate(terms)},
+            np.load(path / "offsets.npy", mmap_mode="r"),
+            np.load(path / "doc_ids.npy", mmap_mode="r"),
+            np.load(path / "term_freqs.npy", mmap_mode="r"),
+            np.load(path / "doc_lengths.npy")
+        )
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (doc_id, score) pairs for a query"""
+        term_ids = {self.vocab[token] for token in tokenize(query) if token in self.vocab}
+        if not term_ids or self.num_docs == 0:
+            return []
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        length_norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths / (self.avg_doc_length or 1.0))
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + length_norm[docs])
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in ranked]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int, rrf_k: int = 60) -> List[int]:
+    """Fuse ranked id lists; an id scores sum(1 / (rrf_k + rank)) over the lists containing it"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])[:k]
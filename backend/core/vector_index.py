@@ -0,0 +1,258 @@
+import os
+import math
+import uuid
+import shutil
+import pickle
+from typing import List, Optional, Sequence, Union
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+from .chunk_store import ChunkStore, PositionIds
+
+
+# "auto" picks by chunk count; "flat", "hnsw", "ivf" and "ivfpq" force a type
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+FAISS_IVF_MIN_CHUNKS = int(os.getenv("FAISS_IVF_MIN_CHUNKS", "20000"))
+FAISS_IVFPQ_MIN_CHUNKS = int(os.getenv("FAISS_IVFPQ_MIN_CHUNKS", "500000"))
+# Inverted lists probed per query (IVF) and graph candidates kept per query (HNSW)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+# Memory-map read-only indexes so idle ones stay in the page cache rather than in RSS
+FAISS_MMAP = os.getenv("FAISS_MMAP", "true").lower() in ("1", "true", "yes")
+
+# faiss keeps codes in the mapped file with IO_FLAG_MMAP_IFC (1.8+); older
+# releases only support mapping inverted lists
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+# Training points per IVF centroid
+_TRAIN_POINTS_PER_LIST = 64
+
+
+def choose_index_type(num_vectors: int, index_type: Optional[str] = None) -> str:
+    """Index type for a corpus of num_vectors chunks"""
+    index_type = index_type or FAISS_INDEX_TYPE
+    if index_type != "auto":
+        return index_type
+    if num_vectors >= FAISS_IVFPQ_MIN_CHUNKS:
+        return "ivfpq"
+    if num_vectors >= FAISS_IVF_MIN_CHUNKS:
+        return "ivf"
+    return "flat"
+
+
+def _num_lists(num_vectors: int) -> int:
+    # About 4 * sqrt(n) lists, with enough points per list to train the centroids
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    # Largest divisor of the dimension that is at most dimension / 16 (4 bytes per 64 floats)
+    for m in range(max(1, dimension // 16), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def configure_search(index: faiss.Index) -> faiss.Index:
+    """Apply the configured query-time parameters to an index"""
+    try:
+        faiss.extract_index_ivf(index).nprobe = FAISS_NPROBE
+    except (RuntimeError, TypeError):
+        # Not an IVF index
+        pass
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+    return index
+
+
+def resolve_index_type(num_vectors: int, index_type: Optional[str] = None) -> str:
+    """Index type build_index uses for num_vectors vectors, after falling back for small corpora"""
+    index_type = choose_index_type(num_vectors, index_type)
+    if index_type == "ivfpq" and num_vectors < 256 * 39:
+        # Too few points to train 8-bit PQ codebooks
+        index_type = "ivf"
+    if index_type == "ivf" and num_vectors < 39:
+        # Too few points to train even one list
+        index_type = "flat"
+    return index_type
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Type name of an index built by build_index"""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def fits_corpus(index: faiss.Index, num_vectors: int) -> bool:
+    """Whether an index can keep serving a corpus grown or shrunk to num_vectors
+
+    False when build_index would now pick another type, or when an IVF
+    index has half or less, or twice or more, the lists it would be trained
+    with (the corpus has changed about fourfold since training).
+    """
+    if resolve_index_type(num_vectors) != index_type_of(index):
+        return False
+    if isinstance(index, faiss.IndexIVF):
+        return index.nlist / 2 < _num_lists(num_vectors) < index.nlist * 2
+    return True
+
+
+def build_index(vectors: np.ndarray, index_type: Optional[str] = None) -> faiss.Index:
+    """Build an L2 index of the configured (or given) type over vectors"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dimension = vectors.shape
+    index_type = resolve_index_type(num_vectors, index_type)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, FAISS_HNSW_M)
+    elif index_type in ("ivf", "ivfpq"):
+        num_lists = _num_lists(num_vectors)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimension, num_lists)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, num_lists, _pq_subquantizers(dimension), 8)
+        # PQ codebooks need at least 256 points each
+        sample_size = min(num_vectors, max(num_lists * _TRAIN_POINTS_PER_LIST, 256 * 39))
+        sample = vectors[np.random.default_rng(0).choice(num_vectors, sample_size, replace=False)]
+        index.train(sample)
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+    index.add(vectors)
+    return configure_search(index)
+
+
+def remove_range(index: faiss.Index, start: int, end: int) -> None:
+    """Delete positions start to end - 1 from an in-memory index, shifting later positions down
+
+    Flat indexes shift on removal; IVF lists keep their ids, so the ids past
+    the range are renumbered. HNSW graphs do not support removal.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        raise ValueError("HNSW indexes do not support removal")
+    index.remove_ids(faiss.IDSelectorRange(start, end))
+    if not isinstance(index, faiss.IndexIVF):
+        return
+    invlists = index.invlists
+    for list_no in range(index.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+            ids[ids >= end] -= end - start
+
+
+def index_vectors(index: faiss.Index) -> np.ndarray:
+    """All stored vectors of a flat index, in position order"""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build_vector_store(
+    documents: Union[Sequence[Document], ChunkStore],
+    vectors: Union[np.ndarray, List[List[float]]],
+    embeddings: Embeddings,
+    index_type: Optional[str] = None
+) -> FAISS:
+    """Vector store whose position i holds documents[i] and vectors[i]"""
+    index = build_index(np.asarray(vectors, dtype=np.float32), index_type)
+    docstore = documents if isinstance(documents, ChunkStore) else ChunkStore.from_documents(documents)
+    return vector_store_from_index(index, docstore, embeddings)
+
+
+def vector_store_from_index(index: faiss.Index, docstore: ChunkStore, embeddings: Embeddings) -> FAISS:
+    """Vector store over an index whose position i holds docstore chunk i"""
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=PositionIds(len(docstore))
+    )
+
+
+def add_to_vector_store(
+    vector_store: FAISS,
+    documents: Sequence[Document],
+    vectors: Union[np.ndarray, List[List[float]]]
+) -> None:
+    """Append documents and their vectors to a vector store that is not memory-mapped"""
+    if getattr(vector_store, "mmapped", False):
+        raise ValueError("Memory-mapped vector stores are read-only")
+    start = vector_store.index.ntotal
+    ids = [str(position) for position in range(start, start + len(documents))]
+    vector_store.index.add(np.asarray(vectors, dtype=np.float32))
+    vector_store.docstore.add(dict(zip(ids, documents)))
+    vector_store.index_to_docstore_id.update(enumerate(ids, start=start))
+
+
+def chunk_store_of(vector_store: FAISS) -> ChunkStore:
+    """A vector store's documents as a ChunkStore, converting other docstores"""
+    if isinstance(vector_store.docstore, ChunkStore):
+        return vector_store.docstore
+    return ChunkStore.from_documents([
+        vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+        for position in range(vector_store.index.ntotal)
+    ])
+
+
+def save_vector_store(vector_store: FAISS, path: Union[str, Path]) -> None:
+    """Save the index as ``index.faiss`` and the documents as a ChunkStore in ``chunks/``"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(vector_store.index, str(path / "index.faiss"))
+    chunk_store_of(vector_store).save(path / "chunks")
+
+
+def _migrate_pickled_docstore(path: Path) -> None:
+    """Convert the documents of a store written by FAISS.save_local into a ChunkStore
+
+    Runs once per store, on its first load. The pickle is the one this app
+    wrote (and loaded) before the chunk store format existed. The chunk
+    store is written next to it and renamed into place, so a concurrent
+    migration of the same store keeps whichever finishes first.
+    """
+    with open(path / "index.pkl", "rb") as pickled:
+        docstore, index_to_docstore_id = pickle.load(pickled)
+    documents = [docstore.search(index_to_docstore_id[position]) for position in range(len(index_to_docstore_id))]
+
+    tmp_path = path / f".chunks-{uuid.uuid4().hex}.tmp"
+    ChunkStore.from_documents(documents).save(tmp_path)
+    try:
+        os.rename(tmp_path, path / "chunks")
+    except OSError:
+        if not (path / "chunks").exists():
+            raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_vector_store(path: Union[str, Path], embeddings: Embeddings, mmap: bool = FAISS_MMAP) -> FAISS:
+    """Load a vector store saved with save_vector_store
+
+    With mmap the index is mapped read-only: it can be searched and its
+    vectors reconstructed, but it must not be modified. Chunk columns are
+    always memory-mapped; chunks added later are kept in memory. Stores
+    saved with FAISS.save_local (``index.pkl``) are converted on first load.
+    """
+    path = Path(path)
+    if not (path / "chunks").exists():
+        if not (path / "index.pkl").exists():
+            raise FileNotFoundError(f"No chunk store in {path}")
+        _migrate_pickled_docstore(path)
+    index = faiss.read_index(str(path / "index.faiss"), _MMAP_FLAGS if mmap else 0)
+    vector_store = vector_store_from_index(configure_search(index), ChunkStore.load(path / "chunks"), embeddings)
+    vector_store.mmapped = mmap
+    return vector_store
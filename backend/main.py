@@ -1,12 +1,13 @@
 import os
+import json
+import asyncio
 import uuid
-import tempfile
 from typing import List
 from pathlib import Path
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import uvicorn
 from dotenv import load_dotenv
 
@@ -14,15 +15,39 @@ from dotenv import load_dotenv
 from core import (
     ChatMessage,
     ChatResponse,
+    BatchChatMessage,
+    BatchChatResult,
+    BatchChatResponse,
     ProcessResponse,
     SystemPromptUpdate,
     MODEL_OPTIONS,
     DEFAULT_SYSTEM_PROMPT,
-    process_pdf_files,
+    save_uploads,
+    find_reused_files,
+    remove_session_document,
+    submit_ingest_job,
+    retry_ingest_job,
+    fail_interrupted_jobs,
     ChatHistoryManager,
-    process_question,
-    generate_pdf_report,
-    session_manager
+    aprocess_question,
+    astream_question,
+    aprocess_question_batch,
+    apreview_chat_context,
+    BATCH_MAX_QUESTIONS,
+    open_chat_history_report,
+    iter_report,
+    session_manager,
+    session_docset_fingerprint,
+    session_documents,
+    index_cache,
+    embedding_cache_stats,
+    answer_cache,
+    chain_cache,
+    close_llm_clients,
+    metrics_registry,
+    io_executor,
+    run_blocking,
+    shutdown_executors
 )
 
 # Load environment variables
@@ -55,9 +80,29 @@ async def get_models():
     return {"models": MODEL_OPTIONS}
 
 
+def ensure_session(session_id: str) -> None:
+    """Raise 404 for unknown sessions and record access to known ones"""
+    if not session_manager.session_exists(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    session_manager.touch(session_id)
+
+
+def ensure_session_processed(session_id: str) -> None:
+    """Raise unless the session's documents are ready for chat"""
+    if session_manager.is_session_processed(session_id):
+        return
+    
+    job = session_manager.get_job(session_id) or {}
+    if job.get("status") in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="Documents are still being processed")
+    if job.get("status") == "failed":
+        raise HTTPException(status_code=400, detail=f"Document processing failed: {job.get('error')}")
+    raise HTTPException(status_code=400, detail="No processed documents found")
+
+
 @app.post("/upload", response_model=ProcessResponse)
 async def upload_files(files: List[UploadFile] = File(...)):
-    """Upload and process PDF files"""
+    """Upload PDF files and start processing them in the background"""
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
     
@@ -70,64 +115,264 @@ async def upload_files(files: List[UploadFile] = File(...)):
         # Generate session ID
         session_id = str(uuid.uuid4())
         
-        # Process PDFs using core module
-        process_pdf_files(files, session_id)
+        # Persist uploads so the ingest job can outlive this request
+        pdf_paths = await run_blocking(io_executor, save_uploads, files, session_id)
         
-        # Initialize session using session manager
-        file_names = [file.filename for file in files]
-        session_manager.create_session(session_id, file_names)
+        # Files already in the document store are reused without re-embedding
+        reused_files = await run_blocking(io_executor, find_reused_files, pdf_paths)
+        
+        # Initialize session using session manager; it becomes usable once the job completes
+        file_names = [path.name for path in pdf_paths]
+        session_manager.create_session(session_id, file_names, processed=False)
+        submit_ingest_job(session_id, pdf_paths, reused_files)
         
         return ProcessResponse(
-            message="Documents processed successfully",
+            message="Documents uploaded; processing started",
             session_id=session_id,
-            processed=True
+            processed=False,
+            status="queued",
+            reused_files=reused_files
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
 
 
+@app.get("/upload/{session_id}/status")
+async def get_upload_status(session_id: str):
+    """Get ingestion progress for a session"""
+    ensure_session(session_id)
+    
+    return {
+        "session_id": session_id,
+        "processed": session_manager.is_session_processed(session_id),
+        "job": session_manager.get_job(session_id)
+    }
+
+
+@app.post("/upload/{session_id}/retry")
+async def retry_upload(session_id: str):
+    """Resume a failed ingestion; embedding batches that already completed are reused"""
+    ensure_session(session_id)
+    
+    if retry_ingest_job(session_id) is None:
+        raise HTTPException(status_code=400, detail="No failed ingestion to retry for this session")
+    
+    return {"message": "Processing restarted", "session_id": session_id}
+
+
+def ensure_no_ingest_running(session_id: str) -> None:
+    """Raise 409 while an ingestion job for the session is queued or running"""
+    job = session_manager.get_job(session_id) or {}
+    if job.get("status") in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="Documents are still being processed")
+
+
+@app.post("/session/{session_id}/documents", response_model=ProcessResponse)
+async def add_documents(session_id: str, files: List[UploadFile] = File(...)):
+    """Add PDF files to a processed session; only new content is embedded"""
+    ensure_session(session_id)
+    ensure_session_processed(session_id)
+    ensure_no_ingest_running(session_id)
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    
+    for file in files:
+        if not file.filename.endswith('.pdf'):
+            raise HTTPException(status_code=400, detail=f"File {file.filename} is not a PDF")
+    
+    try:
+        pdf_paths = await run_blocking(io_executor, save_uploads, files, session_id)
+        reused_files = await run_blocking(io_executor, find_reused_files, pdf_paths)
+        
+        # The session keeps answering from its current documents until the job switches it over
+        submit_ingest_job(session_id, pdf_paths, reused_files, mode="add")
+        
+        return ProcessResponse(
+            message="Documents uploaded; adding them to the session",
+            session_id=session_id,
+            processed=True,
+            status="queued",
+            reused_files=reused_files
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
+
+
+@app.delete("/session/{session_id}/documents/{file_name}")
+async def remove_document(session_id: str, file_name: str):
+    """Remove one document from a session, dropping its chunks from the session index"""
+    ensure_session(session_id)
+    ensure_session_processed(session_id)
+    ensure_no_ingest_running(session_id)
+    
+    docset = session_docset_fingerprint(session_id)
+    previous_documents = session_documents(session_id)
+    try:
+        documents = await run_blocking(io_executor, remove_session_document, session_id, file_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Document {file_name} not found in this session")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error removing document: {str(e)}")
+    
+    files = [document["file"] for document in documents]
+    session_manager.set_files(session_id, files)
+    session_manager.release_docset(docset)
+    await run_blocking(io_executor, session_manager.release_documents, previous_documents - session_documents(session_id))
+    return {"message": f"Removed {file_name}", "session_id": session_id, "files": files}
+
+
 @app.post("/chat/{session_id}", response_model=ChatResponse)
 async def chat(session_id: str, message: ChatMessage):
     """Send a message and get response with context preservation"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
-    if not session_manager.is_session_processed(session_id):
-        raise HTTPException(status_code=400, detail="No processed documents found")
+    ensure_session_processed(session_id)
     
     try:
         # Get system prompt from session if not provided
         system_prompt = message.system_prompt or session_manager.get_system_prompt(session_id)
         
-        answer, sources, chat_context_sources = process_question(
+        result = await aprocess_question(
             message.question, 
             message.model_name, 
             session_id, 
             system_prompt,
-            message.use_chat_history
+            message.use_chat_history,
+            use_cache=message.use_cache
         )
         
         # Update session history using session manager
         session_manager.add_to_history(session_id, "user", message.question)
+        session_manager.add_to_history(session_id, "assistant", result["answer"])
+        
+        if not message.include_timings:
+            result["timings"] = None
+        return ChatResponse(session_id=session_id, **result)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+
+
+@app.post("/chat/{session_id}/stream")
+async def chat_stream(session_id: str, message: ChatMessage):
+    """Send a message and stream the response as Server-Sent Events"""
+    ensure_session(session_id)
+    
+    ensure_session_processed(session_id)
+    
+    system_prompt = message.system_prompt or session_manager.get_system_prompt(session_id)
+    
+    async def event_stream():
+        try:
+            async for event, data in astream_question(
+                message.question,
+                message.model_name,
+                session_id,
+                system_prompt,
+                message.use_chat_history,
+                use_cache=message.use_cache
+            ):
+                if event == "done":
+                    # Update session history once the full answer is known
+                    session_manager.add_to_history(session_id, "user", message.question)
+                    session_manager.add_to_history(session_id, "assistant", data["answer"])
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error processing chat: {detail}'})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/chat/{session_id}/batch")
+async def chat_batch(session_id: str, message: BatchChatMessage):
+    """Answer a list of questions against one session
+    
+    Results are returned in input order, or with stream set, sent as
+    Server-Sent Events as each answer completes. Turns are added to the
+    session history in input order either way.
+    """
+    ensure_session(session_id)
+    
+    ensure_session_processed(session_id)
+    
+    if not message.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(message.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    
+    system_prompt = message.system_prompt or session_manager.get_system_prompt(session_id)
+    
+    def record_turn(question: str, answer: str) -> None:
+        session_manager.add_to_history(session_id, "user", question)
         session_manager.add_to_history(session_id, "assistant", answer)
+    
+    def batch_result(index: int, result: dict) -> BatchChatResult:
+        if not message.include_timings:
+            result = {**result, "timings": None}
+        return BatchChatResult(index=index, question=message.questions[index], **result)
+    
+    results = aprocess_question_batch(
+        message.questions,
+        message.model_name,
+        session_id,
+        system_prompt,
+        message.use_chat_history,
+        use_cache=message.use_cache,
+        max_concurrency=message.max_concurrency,
+        record_turn=record_turn
+    )
+    
+    if message.stream:
+        async def event_stream():
+            failed = 0
+            try:
+                async for index, result in results:
+                    item = batch_result(index, result)
+                    failed += item.error is not None
+                    yield f"event: result\ndata: {item.model_dump_json()}\n\n"
+                done = {"answered": len(message.questions) - failed, "failed": failed}
+                yield f"event: done\ndata: {json.dumps(done)}\n\n"
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                yield f"event: error\ndata: {json.dumps({'detail': f'Error processing batch: {detail}'})}\n\n"
         
-        return ChatResponse(
-            answer=answer,
-            sources=sources,
-            session_id=session_id,
-            chat_context_used=chat_context_sources
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
     
+    try:
+        ordered = [None] * len(message.questions)
+        async for index, result in results:
+            ordered[index] = batch_result(index, result)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing batch: {str(e)}")
+    
+    failed = sum(item.error is not None for item in ordered)
+    return BatchChatResponse(
+        session_id=session_id,
+        results=ordered,
+        answered=len(ordered) - failed,
+        failed=failed
+    )
 
 
 @app.put("/system-prompt/{session_id}")
 async def update_system_prompt(session_id: str, prompt_data: SystemPromptUpdate):
     """Update the system prompt for a session"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
     session_manager.set_system_prompt(session_id, prompt_data.system_prompt)
     return {"message": "System prompt updated successfully"}
@@ -136,8 +381,7 @@ async def update_system_prompt(session_id: str, prompt_data: SystemPromptUpdate)
 @app.get("/system-prompt/{session_id}")
 async def get_system_prompt(session_id: str):
     """Get the current system prompt for a session"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
     current_prompt = session_manager.get_system_prompt(session_id)
     return {
@@ -149,8 +393,7 @@ async def get_system_prompt(session_id: str):
 @app.delete("/system-prompt/{session_id}")
 async def reset_system_prompt(session_id: str):
     """Reset system prompt to default for a session"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
     session_manager.reset_system_prompt(session_id)
     return {"message": "System prompt reset to default"}
@@ -159,8 +402,7 @@ async def reset_system_prompt(session_id: str):
 @app.get("/history/{session_id}")
 async def get_history(session_id: str):
     """Get chat history for a session"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
     history = session_manager.get_history(session_id)
     return {"history": history}
@@ -169,15 +411,14 @@ async def get_history(session_id: str):
 @app.delete("/history/{session_id}")
 async def clear_history(session_id: str):
     """Clear chat history for a session"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
     # Clear in-memory history using session manager
     session_manager.clear_history(session_id)
     
     # Clear chat history vector store
     chat_manager = ChatHistoryManager(session_id)
-    chat_manager.clear_history()
+    await run_blocking(io_executor, chat_manager.clear_history)
     
     return {"message": "Chat history cleared"}
 
@@ -185,35 +426,33 @@ async def clear_history(session_id: str):
 @app.get("/download/{session_id}")
 async def download_history(session_id: str):
     """Download chat history as PDF"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
     history = session_manager.get_history(session_id)
     if not history:
         raise HTTPException(status_code=400, detail="No chat history to download")
     
     try:
-        pdf = generate_pdf_report(history)
-        
-        # Save PDF to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            pdf.output(tmp_file.name)
-            
-            return FileResponse(
-                tmp_file.name,
-                media_type='application/pdf',
-                filename=f"chat_history_{session_id}.pdf"
-            )
-    
+        # Opened before responding: a concurrent render or cleared history
+        # can then remove the path without truncating this download
+        report_file, report_size = await run_blocking(io_executor, open_chat_history_report, session_id, history)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
+    return StreamingResponse(
+        iter_report(report_file),
+        media_type='application/pdf',
+        headers={
+            "Content-Disposition": f'attachment; filename="chat_history_{session_id}.pdf"',
+            "Content-Length": str(report_size),
+        }
+    )
+
 
 @app.get("/session/{session_id}")
 async def get_session_info(session_id: str):
     """Get session information"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
     return session_manager.get_session_info(session_id)
 
@@ -221,11 +460,9 @@ async def get_session_info(session_id: str):
 @app.get("/chat-context/{session_id}")
 async def get_chat_context_preview(session_id: str, question: str):
     """Preview what chat context would be retrieved for a question"""
-    if not session_manager.session_exists(session_id):
-        raise HTTPException(status_code=404, detail="Session not found")
+    ensure_session(session_id)
     
-    chat_manager = ChatHistoryManager(session_id)
-    chat_context, context_sources = chat_manager.get_relevant_context(question)
+    chat_context, context_sources = await apreview_chat_context(session_id, question)
     
     return {
         "chat_context": chat_context,
@@ -234,18 +471,103 @@ async def get_chat_context_preview(session_id: str, question: str):
     }
 
 
+@app.get("/sessions/stats")
+async def get_session_stats():
+    """Get live session count and session garbage collection counters"""
+    return await run_blocking(io_executor, session_manager.get_metrics)
+
+
+def collect_service_metrics():
+    """Report cache and session counters kept by other components at scrape time"""
+    families = []
+    index_stats = index_cache.stats()
+    families.append(("chatpdf_index_cache_hits_total", "counter", "Index cache hits", [({}, index_stats["hits"])]))
+    families.append(("chatpdf_index_cache_misses_total", "counter", "Index cache misses", [({}, index_stats["misses"])]))
+    families.append(("chatpdf_index_cache_bytes", "gauge", "Estimated bytes of cached indexes", [({}, index_stats["bytes"])]))
+    
+    embedding_stats = embedding_cache_stats()
+    families.append(("chatpdf_embedding_cache_hits_total", "counter", "Embedding cache hits",
+                     [({"backend": backend}, stats["hits"]) for backend, stats in embedding_stats.items()]))
+    families.append(("chatpdf_embedding_cache_misses_total", "counter", "Embedding cache misses",
+                     [({"backend": backend}, stats["misses"]) for backend, stats in embedding_stats.items()]))
+    
+    answer_stats = answer_cache.stats()
+    families.append(("chatpdf_answer_cache_hits_total", "counter", "Answer cache hits", [({}, answer_stats["hits"])]))
+    families.append(("chatpdf_answer_cache_misses_total", "counter", "Answer cache misses", [({}, answer_stats["misses"])]))
+    
+    session_stats = session_manager.get_metrics()
+    families.append(("chatpdf_live_sessions", "gauge", "Sessions in the session store", [({}, session_stats["live_sessions"])]))
+    families.append(("chatpdf_session_disk_bytes", "gauge", "Bytes counted against the disk quota at the last sweep", [({}, session_stats["disk_bytes"])]))
+    families.append(("chatpdf_shared_disk_bytes", "gauge", "Bytes in the document store and embedding caches at the last sweep", [({}, session_stats["shared_disk_bytes"])]))
+    families.append(("chatpdf_documents_released_total", "counter", "Stored documents deleted once no session used them", [({}, session_stats["released_documents"])]))
+    families.append(("chatpdf_sessions_evicted_total", "counter", "Sessions removed by the sweeper", [({}, session_stats["evicted_sessions"])]))
+    families.append(("chatpdf_session_reclaimed_bytes_total", "counter", "Bytes freed by the sweeper", [({}, session_stats["reclaimed_bytes"])]))
+    return families
+
+
+metrics_registry.register_collector(collect_service_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: per-stage ingest and chat latency histograms, counters and cache gauges"""
+    text = await run_blocking(io_executor, metrics_registry.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get index, embedding, answer and chain cache hit/miss counters"""
+    return {
+        "index_cache": index_cache.stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "answer_cache": answer_cache.stats(),
+        "chain_cache": chain_cache.stats()
+    }
+
+
 # Cleanup background task
+SESSION_GC_INTERVAL = float(os.getenv("SESSION_GC_INTERVAL", "300"))
+
+
+async def sweep_sessions_periodically():
+    """Evict idle sessions and enforce the session disk quota every SESSION_GC_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(SESSION_GC_INTERVAL)
+        try:
+            result = await run_blocking(io_executor, session_manager.cleanup_old_sessions)
+            if result["evicted_sessions"] or result["orphaned_dirs_removed"]:
+                print(f"Session cleanup: {result}")
+        except Exception as e:
+            print(f"Session cleanup failed: {str(e)}")
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application"""
     # Create sessions directory
     Path("sessions").mkdir(exist_ok=True)
+    
+    # Sessions persist across restarts; jobs that were running when the last
+    # process died will never finish, so surface them as failed (retryable)
+    interrupted = fail_interrupted_jobs()
+    if interrupted:
+        print(f"Marked {interrupted} interrupted ingestion job(s) as failed")
+    
+    if SESSION_GC_INTERVAL > 0:
+        app.state.session_sweeper = asyncio.create_task(sweep_sessions_periodically())
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on application shutdown"""
-    session_manager.cleanup_old_sessions()
+    # Eviction is left to the periodic sweep: sessions and shared documents
+    # outlive a restart or deploy
+    sweeper = getattr(app.state, "session_sweeper", None)
+    if sweeper is not None:
+        sweeper.cancel()
+    await close_llm_clients()
+    shutdown_executors()
 
 
 if __name__ == "__main__":
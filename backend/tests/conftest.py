@@ -0,0 +1,102 @@
+"""Shared fixtures: the app runs offline on the fake embedding and chat backends"""
+import os
+import sys
+import shutil
+import asyncio
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+_workdir = None
+
+
+def pytest_configure(config):
+    # The app reads its configuration and creates its data directories at
+    # import time, so both have to be in place before core is imported
+    global _workdir
+    os.environ.update({
+        "EMBEDDING_BACKEND": "fake",
+        "HASHING_EMBEDDING_SIZE": "32",
+        "PDF_EXTRACT_WORKERS": "1",
+        "SESSION_GC_INTERVAL": "0",
+        "GOOGLE_API_KEY": "offline",
+        "GROQ_API_KEY": "offline",
+    })
+    _workdir = tempfile.mkdtemp(prefix="chatpdf_tests_")
+    os.chdir(_workdir)
+
+
+def pytest_unconfigure(config):
+    if _workdir is not None:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import main
+
+    asyncio.run(main.startup_event())
+    return main
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answer every chat request with a FakeChatModel"""
+    import core.chat_processor
+    from core.fakes import FakeChatModel
+
+    llm = FakeChatModel(answer_tokens=8)
+    monkeypatch.setattr(core.chat_processor, "get_llm", lambda model_name: llm)
+    return llm
+
+
+@pytest.fixture(scope="session")
+def sample_pdf(tmp_path_factory) -> Path:
+    from benchmarks.bench_e2e import make_synthetic_pdf
+
+    path = tmp_path_factory.mktemp("pdfs") / "manual.pdf"
+    make_synthetic_pdf(path, pages=4, seed=3)
+    return path
+
+
+@pytest.fixture
+def make_client(app_module):
+    """Build an AsyncClient that calls the app in-process
+
+    Clients are bound to an event loop, so each test creates its own inside
+    the asyncio.run call that drives it.
+    """
+    def factory() -> httpx.AsyncClient:
+        transport = httpx.ASGITransport(app=app_module.app)
+        return httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30)
+    return factory
+
+
+@pytest.fixture
+def upload():
+    return upload_and_wait
+
+
+async def upload_and_wait(http: httpx.AsyncClient, pdf_path: Path, timeout: float = 30.0) -> str:
+    """Upload a PDF and wait until its session is processed"""
+    with open(pdf_path, "rb") as pdf_file:
+        response = await http.post("/upload", files={"files": (pdf_path.name, pdf_file, "application/pdf")})
+    response.raise_for_status()
+    session_id = response.json()["session_id"]
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        status = (await http.get(f"/upload/{session_id}/status")).json()
+        if status["processed"]:
+            return session_id
+        job = status["job"] or {}
+        assert job.get("status") != "failed", job
+        assert loop.time() < deadline, f"ingest did not finish: {status}"
+        await asyncio.sleep(0.05)
@@ -0,0 +1,57 @@
+"""Answer cache reuse across sessions over the same documents"""
+import asyncio
+
+FOLLOW_UP = "And what about the second one?"
+
+
+async def ask(http, session_id: str, question: str, **options) -> dict:
+    response = await http.post(f"/chat/{session_id}", json={"question": question, **options})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_follow_up_after_different_histories_is_not_shared(make_client, upload, sample_pdf, fake_llm):
+    async def scenario():
+        async with make_client() as http:
+            first = await upload(http, sample_pdf)
+            second = await upload(http, sample_pdf)
+            await ask(http, first, "Which valves need inspection?")
+            await ask(http, second, "Who signs off the pressure test?")
+
+            answers = {
+                "first": await ask(http, first, FOLLOW_UP),
+                "second": await ask(http, second, FOLLOW_UP),
+                "without_history": await ask(http, second, FOLLOW_UP, use_chat_history=False),
+            }
+            await http.delete(f"/history/{first}")
+            answers["after_clear"] = await ask(http, first, FOLLOW_UP)
+            return answers
+
+    answers = asyncio.run(scenario())
+
+    first, second = answers["first"], answers["second"]
+    assert first["chat_context_used"] and second["chat_context_used"]
+    assert not first["cached"] and not second["cached"]
+    assert first["answer"] != second["answer"]
+
+    # Only the answer given without conversation context is reused
+    assert answers["without_history"]["cached"] is False
+    assert answers["without_history"]["answer"] not in (first["answer"], second["answer"])
+    assert answers["after_clear"]["cached"] is True
+    assert answers["after_clear"]["answer"] == answers["without_history"]["answer"]
+
+
+def test_answers_without_conversation_context_are_shared(make_client, upload, sample_pdf, fake_llm):
+    question = "List the maintenance intervals"
+
+    async def scenario():
+        async with make_client() as http:
+            first = await upload(http, sample_pdf)
+            second = await upload(http, sample_pdf)
+            return await ask(http, first, question), await ask(http, second, question)
+
+    fresh, reused = asyncio.run(scenario())
+
+    assert fresh["cached"] is False
+    assert reused["cached"] is True
+    assert reused["answer"] == fresh["answer"]
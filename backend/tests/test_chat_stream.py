@@ -0,0 +1,120 @@
+"""Streaming chat endpoint, driven through ASGITransport with the fake backends"""
+import json
+import asyncio
+from typing import Dict, List, Tuple
+
+from core.chat_manager import ChatHistoryManager
+from core.fakes import FakeChatModel
+
+
+async def stream_chat(http, session_id: str, question: str, **options) -> List[Tuple[str, Dict]]:
+    """POST to the stream endpoint and parse the Server-Sent Events it returns"""
+    events = []
+    async with http.stream("POST", f"/chat/{session_id}/stream", json={"question": question, **options}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join([chunk async for chunk in response.aiter_text()])
+    for block in body.split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class FailingChatModel(FakeChatModel):
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        raise RuntimeError("model unavailable")
+        yield
+
+
+def test_stream_emits_sources_then_tokens_then_done(make_client, upload, sample_pdf, fake_llm):
+    async def scenario():
+        async with make_client() as http:
+            session_id = await upload(http, sample_pdf)
+            return await stream_chat(http, session_id, "What does section 2 describe?", use_cache=False)
+
+    events = asyncio.run(scenario())
+    names = [name for name, _ in events]
+
+    assert names[0] == "sources"
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    assert len(names) == fake_llm.answer_tokens + 2
+
+    sources, done = events[0][1], events[-1][1]
+    assert sources["cached"] is False
+    assert sources["sources"] and all("manual.pdf" in source for source in sources["sources"])
+    assert done["cached"] is False
+    assert done["answer"] == "".join(data["token"] for name, data in events if name == "token")
+    assert {"retrieve", "llm", "total"} <= set(done["timings"])
+
+
+def test_history_is_updated_after_stream_completes(make_client, upload, sample_pdf, fake_llm):
+    question = "Which valve settings are listed?"
+
+    async def scenario():
+        async with make_client() as http:
+            session_id = await upload(http, sample_pdf)
+            before = (await http.get(f"/history/{session_id}")).json()["history"]
+            events = await stream_chat(http, session_id, question)
+            after = (await http.get(f"/history/{session_id}")).json()["history"]
+            return session_id, before, events, after
+
+    session_id, before, events, after = asyncio.run(scenario())
+    answer = events[-1][1]["answer"]
+
+    assert before == []
+    assert after == [
+        {"type": "user", "content": question},
+        {"type": "assistant", "content": answer},
+    ]
+    turns, _ = ChatHistoryManager(session_id).get_relevant_turns(question)
+    assert any(question in turn and answer in turn for turn in turns)
+
+
+def test_repeated_question_streams_cached_answer(make_client, upload, sample_pdf, fake_llm):
+    question = "Summarise the operator safety notes"
+
+    async def scenario():
+        async with make_client() as http:
+            session_id = await upload(http, sample_pdf)
+            first = await stream_chat(http, session_id, question, use_chat_history=False)
+            second = await stream_chat(http, session_id, question, use_chat_history=False)
+            history = (await http.get(f"/history/{session_id}")).json()["history"]
+            return first, second, history
+
+    first, second, history = asyncio.run(scenario())
+
+    assert [name for name, _ in second] == ["sources", "token", "done"]
+    assert second[-1][1]["cached"] is True
+    assert second[-1][1]["answer"] == first[-1][1]["answer"]
+    assert [entry["type"] for entry in history] == ["user", "assistant", "user", "assistant"]
+
+
+def test_stream_error_is_sent_as_event_and_history_unchanged(make_client, upload, sample_pdf, monkeypatch):
+    import core.chat_processor
+
+    monkeypatch.setattr(core.chat_processor, "get_llm", lambda model_name: FailingChatModel())
+
+    async def scenario():
+        async with make_client() as http:
+            session_id = await upload(http, sample_pdf)
+            events = await stream_chat(http, session_id, "Is this answered?", use_cache=False)
+            history = (await http.get(f"/history/{session_id}")).json()["history"]
+            return session_id, events, history
+
+    session_id, events, history = asyncio.run(scenario())
+
+    assert [name for name, _ in events] == ["sources", "error"]
+    assert "model unavailable" in events[-1][1]["detail"]
+    assert history == []
+    assert not ChatHistoryManager(session_id).has_history()
+
+
+def test_stream_unknown_session_is_404(make_client):
+    async def scenario():
+        async with make_client() as http:
+            return await http.post("/chat/missing/stream", json={"question": "hello"})
+
+    assert asyncio.run(scenario()).status_code == 404
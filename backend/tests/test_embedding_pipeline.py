@@ -0,0 +1,113 @@
+"""BatchEmbedder retry/backoff and checkpoint resume with FakeEmbeddings"""
+import numpy as np
+import pytest
+
+from core.embedding_pipeline import BatchEmbedder, is_retryable_error
+from core.fakes import FakeEmbeddings, FakeRateLimitError
+
+TEXTS = [f"chunk {index} about valve torque and pressure" for index in range(23)]
+BATCH_SIZE = 5
+
+
+def batches(texts, checkpoint_dir=None):
+    for number, start in enumerate(range(0, len(texts), BATCH_SIZE)):
+        batch_path = None if checkpoint_dir is None else checkpoint_dir / f"{number:06d}.npy"
+        yield texts[start:start + BATCH_SIZE], batch_path
+
+
+def embed_all(embedder, texts, checkpoint_dir=None):
+    results = list(embedder.embed_batches(batches(texts, checkpoint_dir), lambda text: text))
+    assert [text for items, _ in results for text in items] == texts
+    return np.concatenate([vectors for _, vectors in results])
+
+
+def expected_vectors(texts):
+    return np.asarray(FakeEmbeddings(size=16).embed_documents(texts), dtype=np.float32)
+
+
+def test_rate_limited_calls_are_retried_with_exponential_backoff():
+    delays = []
+    embeddings = FakeEmbeddings(size=16, fail_first_calls=3)
+    embedder = BatchEmbedder(
+        embeddings, batch_size=BATCH_SIZE, max_in_flight=1,
+        base_delay=1.0, max_delay=3.0, sleep=delays.append
+    )
+
+    vectors = embed_all(embedder, TEXTS)
+
+    np.testing.assert_array_equal(vectors, expected_vectors(TEXTS))
+    assert embedder.retries == 3
+    assert embeddings.calls == 5 + 3
+    # Full delays of 1, 2 and then 4 capped at 3, each with jitter in [0.5, 1.0]
+    assert len(delays) == 3
+    for delay, full_delay in zip(delays, [1.0, 2.0, 3.0]):
+        assert full_delay * 0.5 <= delay <= full_delay
+
+
+def test_retries_give_up_after_max_retries():
+    delays = []
+    embedder = BatchEmbedder(
+        FakeEmbeddings(size=16, fail_first_calls=10), batch_size=BATCH_SIZE,
+        max_in_flight=1, max_retries=2, sleep=delays.append
+    )
+
+    with pytest.raises(FakeRateLimitError):
+        embed_all(embedder, TEXTS)
+    assert len(delays) == 2
+
+
+def test_non_retryable_errors_fail_immediately():
+    delays = []
+    embeddings = FakeEmbeddings(size=16, fail_first_calls=1, error_factory=lambda: ValueError("bad request"))
+    embedder = BatchEmbedder(embeddings, batch_size=BATCH_SIZE, max_in_flight=1, sleep=delays.append)
+
+    with pytest.raises(ValueError):
+        embed_all(embedder, TEXTS)
+    assert delays == []
+    assert embedder.retries == 0
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (FakeRateLimitError("429 Resource exhausted"), True),
+    (TimeoutError("read timed out"), True),
+    (RuntimeError("Quota exceeded for requests per minute"), True),
+    (ValueError("invalid input"), False),
+])
+def test_is_retryable_error(error, retryable):
+    assert is_retryable_error(error) is retryable
+
+
+class FailingAfterEmbeddings(FakeEmbeddings):
+    def __init__(self, successful_calls: int, **kwargs):
+        super().__init__(**kwargs)
+        self.successful_calls = successful_calls
+
+    def embed_documents(self, texts):
+        if self.calls >= self.successful_calls:
+            raise FakeRateLimitError("429 Resource exhausted")
+        return super().embed_documents(texts)
+
+
+def test_resume_embeds_only_batches_missing_from_checkpoint(tmp_path):
+    checkpoint_dir = tmp_path / "checkpoint"
+    # The third batch fails for good, after the first two were saved
+    failing = FailingAfterEmbeddings(size=16, successful_calls=2)
+    embedder = BatchEmbedder(failing, batch_size=BATCH_SIZE, max_in_flight=1, max_retries=0, sleep=lambda delay: None)
+
+    with pytest.raises(FakeRateLimitError):
+        embed_all(embedder, TEXTS, checkpoint_dir)
+    assert sorted(path.name for path in checkpoint_dir.glob("*.npy")) == ["000000.npy", "000001.npy"]
+
+    resumed = FakeEmbeddings(size=16)
+    vectors = embed_all(BatchEmbedder(resumed, batch_size=BATCH_SIZE, max_in_flight=2), TEXTS, checkpoint_dir)
+
+    np.testing.assert_array_equal(vectors, expected_vectors(TEXTS))
+    assert resumed.texts_embedded == len(TEXTS) - 2 * BATCH_SIZE
+    assert len(list(checkpoint_dir.glob("*.npy"))) == 5
+
+    untouched = FakeEmbeddings(size=16)
+    embed_all(BatchEmbedder(untouched, batch_size=BATCH_SIZE), TEXTS, checkpoint_dir)
+    assert untouched.calls == 0
+
+    BatchEmbedder.clear_checkpoint(checkpoint_dir)
+    assert not checkpoint_dir.exists()
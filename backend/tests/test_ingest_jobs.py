@@ -0,0 +1,28 @@
+"""Background ingestion jobs"""
+import uuid
+import shutil
+
+from core.jobs import IngestJob
+from core.session_manager import session_manager
+
+
+def test_session_is_processed_before_job_reports_completed(app_module, sample_pdf, tmp_path, monkeypatch):
+    session_id = str(uuid.uuid4())
+    pdf_path = tmp_path / sample_pdf.name
+    shutil.copy(sample_pdf, pdf_path)
+    session_manager.create_session(session_id, [pdf_path.name], processed=False)
+
+    seen = []
+    update_job = session_manager.update_job
+
+    def recording_update_job(job_session_id, job):
+        if job["status"] == "completed":
+            seen.append(session_manager.is_session_processed(job_session_id))
+        update_job(job_session_id, job)
+
+    monkeypatch.setattr(session_manager, "update_job", recording_update_job)
+    IngestJob(session_id, [pdf_path]).run()
+
+    assert seen == [True]
+    assert session_manager.get_job(session_id)["status"] == "completed"
+    assert not pdf_path.exists()
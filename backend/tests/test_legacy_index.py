@@ -0,0 +1,61 @@
+"""Stores saved by FAISS.save_local before the chunk store format"""
+import json
+import uuid
+import asyncio
+from pathlib import Path
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from core.embeddings import get_embeddings
+from core.vector_index import load_vector_store
+
+DOCUMENTS = [
+    Document(page_content=f"Section {index}: torque the valve to {10 * index} Nm", metadata={"file": "old.pdf", "page": index})
+    for index in range(1, 7)
+]
+
+
+def save_legacy_store(path: Path) -> FAISS:
+    legacy = FAISS.from_documents(DOCUMENTS, get_embeddings("fake"))
+    legacy.save_local(str(path))
+    return legacy
+
+
+def test_pickled_store_is_converted_on_first_load(tmp_path):
+    path = tmp_path / "faiss_index"
+    legacy = save_legacy_store(path)
+    query = "valve torque for section 4"
+
+    vector_store = load_vector_store(path, get_embeddings("fake"), mmap=False)
+
+    assert (path / "chunks").is_dir()
+    assert [doc.page_content for doc in vector_store.similarity_search(query, k=3)] == [
+        doc.page_content for doc in legacy.similarity_search(query, k=3)
+    ]
+    assert vector_store.docstore.document(3).metadata == {"file": "old.pdf", "page": 4}
+
+    # Later loads read the chunk store only
+    (path / "index.pkl").unlink()
+    reloaded = load_vector_store(path, get_embeddings("fake"))
+    assert [doc.page_content for doc in reloaded.similarity_search(query, k=3)] == [
+        doc.page_content for doc in vector_store.similarity_search(query, k=3)
+    ]
+
+
+def test_chat_answers_from_session_with_pickled_index(app_module, make_client, fake_llm):
+    session_id = str(uuid.uuid4())
+    session_dir = Path("sessions") / session_id
+    save_legacy_store(session_dir / "faiss_index")
+    (session_dir / "manifest.json").write_text(json.dumps({"documents": [], "embedding_backend": "fake"}))
+    app_module.session_manager.create_session(session_id, ["old.pdf"], processed=True)
+
+    async def scenario():
+        async with make_client() as http:
+            return await http.post(f"/chat/{session_id}", json={"question": "How far is the valve torqued?"})
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 200, response.text
+    assert response.json()["sources"]
+    assert all("old.pdf" in source for source in response.json()["sources"])
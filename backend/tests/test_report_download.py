@@ -0,0 +1,59 @@
+"""Chat history report downloads"""
+import uuid
+import asyncio
+
+import pytest
+
+from core.report_generator import export_chat_history, invalidate_reports
+
+
+@pytest.fixture
+def session_with_history(app_module):
+    session_id = str(uuid.uuid4())
+    app_module.session_manager.create_session(session_id, ["manual.pdf"], processed=True)
+    for turn in range(3):
+        app_module.session_manager.add_to_history(session_id, "user", f"question {turn}")
+        app_module.session_manager.add_to_history(session_id, "assistant", f"answer {turn} " * 40)
+    return session_id
+
+
+async def read_body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_download_streams_whole_report(make_client, session_with_history):
+    async def scenario():
+        async with make_client() as http:
+            return await http.get(f"/download/{session_with_history}")
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert response.content.startswith(b"%PDF")
+
+
+@pytest.mark.parametrize("change", ["cleared", "regenerated"])
+def test_download_survives_report_removed_before_body_is_sent(app_module, session_with_history, change):
+    session_id = session_with_history
+
+    async def scenario():
+        response = await app_module.download_history(session_id)
+        report_path = export_chat_history(session_id, app_module.session_manager.get_history(session_id))
+
+        # Between the handler returning and the body being streamed
+        if change == "cleared":
+            invalidate_reports(session_id)
+        else:
+            app_module.session_manager.add_to_history(session_id, "user", "one more question")
+            export_chat_history(session_id, app_module.session_manager.get_history(session_id))
+        assert not report_path.exists()
+
+        return response, await read_body(response)
+
+    response, body = asyncio.run(scenario())
+
+    assert int(response.headers["content-length"]) == len(body)
+    assert body.startswith(b"%PDF")
+    assert body.rstrip().endswith(b"%%EOF")
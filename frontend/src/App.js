@@ -67,7 +67,20 @@ function App() {
         },
       });
 
-      setSessionId(response.data.session_id);
+      const newSessionId = response.data.session_id;
+
+      // Processing runs in the background; poll until the job finishes
+      let job = { status: response.data.status };
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const status = await axios.get(`${API_BASE_URL}/upload/${newSessionId}/status`);
+        job = status.data.job || { status: status.data.processed ? 'completed' : 'failed' };
+      }
+      if (job.status !== 'completed') {
+        throw new Error(job.error || 'Document processing failed');
+      }
+
+      setSessionId(newSessionId);
       setProcessed(true);
       setChatHistory([]);
       alert('Documents processed successfully!');